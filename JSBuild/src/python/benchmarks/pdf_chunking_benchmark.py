@@ -0,0 +1,143 @@
+"""
+PDF ingestion: whole-document extraction + word chunking vs. streaming
+page -> chunk generation (pdf_chunks).
+
+Builds synthetic text PDFs of increasing length and, for each, reports
+pages/sec, peak Python heap (tracemalloc) and how long it takes before the
+first chunk reaches the embedder, for:
+
+  - whole: the old extract_pdf_text (`text += page`) + chunk_text (split
+    the whole document into words, then slice);
+  - stream: pdf_pages + chunk_pages, bounded by all-MiniLM-L6-v2's own
+    tokenizer and max_seq_length (model_budget); without
+    sentence-transformers installed it falls back to estimate_tokens and
+    CHUNK_TOKENS, and says so.
+
+The streaming path holds one page and one chunk of text at a time; what
+still grows with the page count is pypdf's xref table and page index
+(about 3KB per page), not the document text.
+
+Usage (from JSBuild/src/python):
+    python benchmarks/pdf_chunking_benchmark.py --pages 100,1000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf      import PdfReader
+from pdf_chunks import pdf_pages, chunk_pages, model_budget, estimate_tokens, CHUNK_TOKENS
+from embedder   import Embedder
+
+WORDS = ("the station crew logged a minor pressure drift in module seven after the docking "
+         "sequence while engineering rerouted coolant through the secondary loop and asked "
+         "for a full diagnostic of valve assemblies before the next scheduled burn").split()
+
+
+def write_pdf(path, pages, lines_per_page=45, words_per_line=12, seed=0):
+    """A plain PDF with `pages` pages of Helvetica text, written without any PDF library."""
+    rng     = random.Random(seed)
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids    = []
+    for n in range(pages):
+        lines   = [" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines_per_page)]
+        content = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content.encode())
+        objects[page_id]    = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                               b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, objects[number]))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for number in sorted(objects):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+# ---------- the previous implementation ----------
+def extract_pdf_text(pdf_path):
+    reader = PdfReader(pdf_path)
+    text = ""
+
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+
+    return text
+
+
+def chunk_text(text, chunk_size=500, overlap=50):
+    words = text.split()
+    chunks = []
+
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = " ".join(words[i:i + chunk_size])
+        chunks.append(chunk)
+
+    return chunks
+
+
+def whole(path):
+    return iter(chunk_text(extract_pdf_text(path)))
+
+
+def budget():
+    """The embedding model's (count_tokens, max_tokens), or the estimate when the model is not available."""
+    try:
+        return model_budget(Embedder("all-MiniLM-L6-v2").model)
+    except ImportError:
+        print("sentence-transformers is not installed: counting with estimate_tokens")
+        return estimate_tokens, CHUNK_TOKENS
+
+
+def measure(chunker, path, count_tokens):
+    """Timed without tracing (tracemalloc slows pypdf several times over), then traced for the peak."""
+    start   = time.perf_counter()
+    chunks  = chunker(path)
+    first   = next(chunks)
+    ttfc    = time.perf_counter() - start
+    count   = 1 + sum(1 for _ in chunks)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    longest = max(count_tokens(chunk) for chunk in chunker(path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, ttfc, peak, count, longest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="100,1000")
+    args = parser.parse_args()
+
+    count_tokens, max_tokens = budget()
+    count_tokens("warm up the tokenizer")
+    stream = lambda path: chunk_pages(pdf_pages(path), max_tokens=max_tokens, count_tokens=count_tokens)
+    print(f"chunks of at most {max_tokens} tokens")
+    print(f"{'pages':>6} {'path':>7} {'pages/s':>8} {'first chunk':>12} {'peak heap':>10} {'chunks':>7} {'max tokens':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in (int(n) for n in args.pages.split(",")):
+            path = os.path.join(directory, f"{pages}.pdf")
+            write_pdf(path, pages)
+            for name, chunker in (("whole", whole), ("stream", stream)):
+                seconds, ttfc, peak, count, longest = measure(chunker, path, count_tokens)
+                print(f"{pages:6d} {name:>7} {pages / seconds:8.0f} {ttfc * 1000:10.0f}ms "
+                      f"{peak / 2**20:8.1f}MB {count:7d} {longest:11d}")
+
+
+if __name__ == "__main__":
+    main()
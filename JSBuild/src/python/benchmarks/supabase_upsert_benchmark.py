@@ -0,0 +1,283 @@
+"""
+Supabase embedding ingestion: per-row SELECT + INSERT/UPDATE vs. pipelined
+bulk upserts, against a local HTTP stand-in for Supabase's REST API.
+
+The stand-in speaks the PostgREST subset the Supabase client uses here
+(select with eq filters, insert, update, and upsert through
+`Prefer: resolution=merge-duplicates` + `on_conflict`) and sleeps
+`--rtt-ms` per request to model the network round trip. Rows carry
+384-d embeddings produced by a stand-in model that costs `--embed-ms` per
+batch, so pipelining has something to overlap with.
+
+Uses supabase-py's client when it is installed, otherwise a minimal
+httpx PostgREST client with the same call chain. Also checks that the
+table ends up identical both ways and that re-running an upsert adds
+nothing. With chromadb installed it also compares per-row `get`/`add`
+with batched `collection.upsert`.
+
+Usage (from JSBuild/src/python):
+    python benchmarks/supabase_upsert_benchmark.py --rows 5000 --rtt-ms 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from   http.server  import BaseHTTPRequestHandler, ThreadingHTTPServer
+from   urllib.parse import urlsplit, parse_qs
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_upsert import PipelinedUpserter, supabase_sender, chroma_sender, embed_in_batches
+
+
+# ---------- Supabase stand-in ----------
+class FakePostgrest(BaseHTTPRequestHandler):
+    tables = {}  # table -> {primary key: row}
+    key    = "memory_id"
+    lock   = threading.Lock()
+    rtt    = 0.0
+    calls  = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _parse(self):
+        url    = urlsplit(self.path)
+        table  = url.path.rsplit("/", 1)[-1]
+        query  = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body   = json.loads(self.rfile.read(length)) if length else None
+        time.sleep(self.rtt)
+        with self.lock:
+            type(self).calls += 1
+        return table, query, body
+
+    def _reply(self, status, payload=None):
+        data = json.dumps(payload if payload is not None else []).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def _filters(query):
+        return {key: value[3:] for key, value in query.items() if value.startswith("eq.")}
+
+    def do_GET(self):
+        table, query, _ = self._parse()
+        filters = self._filters(query)
+        with self.lock:
+            rows = [row for row in self.tables.get(table, {}).values()
+                    if all(str(row.get(key)) == value for key, value in filters.items())]
+        limit = int(query.get("limit", len(rows)))
+        self._reply(200, rows[:limit])
+
+    def do_POST(self):
+        table, query, body = self._parse()
+        rows   = body if isinstance(body, list) else [body]
+        upsert = "merge-duplicates" in self.headers.get("Prefer", "")
+        key    = query.get("on_conflict", self.key)
+        with self.lock:
+            stored = self.tables.setdefault(table, {})
+            for row in rows:
+                if row.get(key) in stored and not upsert:
+                    return self._reply(409, {"message": "duplicate key"})
+                stored[row.get(key)] = {**stored.get(row.get(key), {}), **row}
+        self._reply(201)
+
+    def do_PATCH(self):
+        table, query, body = self._parse()
+        filters = self._filters(query)
+        with self.lock:
+            for row in self.tables.get(table, {}).values():
+                if all(str(row.get(key)) == value for key, value in filters.items()):
+                    row.update(body)
+        self._reply(200)
+
+
+# ---------- clients ----------
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, http, table, method, body=None, params=None, headers=None):
+        self.http, self.table, self.method = http, table, method
+        self.body, self.params, self.headers = body, dict(params or {}), dict(headers or {})
+
+    def eq(self, column, value):
+        self.params[column] = f"eq.{value}"
+        return self
+
+    def limit(self, count):
+        self.params["limit"] = str(count)
+        return self
+
+    def execute(self):
+        response = self.http.request(self.method, f"/rest/v1/{self.table}", params=self.params,
+                                     json=self.body, headers=self.headers)
+        response.raise_for_status()
+        return _Response(response.json())
+
+
+class _Table:
+    def __init__(self, http, name):
+        self.http, self.name = http, name
+
+    def select(self, columns="*"):
+        return _Query(self.http, self.name, "GET", params={"select": columns})
+
+    def insert(self, rows):
+        return _Query(self.http, self.name, "POST", body=rows)
+
+    def update(self, row):
+        return _Query(self.http, self.name, "PATCH", body=row)
+
+    def upsert(self, rows, on_conflict=None):
+        return _Query(self.http, self.name, "POST", body=rows, params={"on_conflict": on_conflict} if on_conflict else {},
+                      headers={"Prefer": "resolution=merge-duplicates"})
+
+
+class RestClient:
+    """The slice of supabase-py's PostgREST call chain used by custom_embeddings_generator."""
+
+    def __init__(self, url, pool=16):
+        self.http = httpx.Client(base_url=url, limits=httpx.Limits(max_connections=pool))
+
+    def table(self, name):
+        return _Table(self.http, name)
+
+
+def make_client(url):
+    try:
+        from supabase import create_client
+    except ImportError:
+        return RestClient(url), "minimal httpx PostgREST client"
+    return create_client(url, "benchmark.service.key"), "supabase-py"
+
+
+# ---------- workloads ----------
+class StandInEmbedder:
+    def __init__(self, batch_ms, dim=384):
+        self.batch_s, self.dim = batch_ms / 1000, dim
+
+    def embed(self, texts):
+        time.sleep(self.batch_s)
+        return np.random.default_rng(len(texts)).standard_normal((len(texts), self.dim)).astype(np.float32)
+
+
+def legacy_ingest(client, embedder, items, user_hash):
+    """The old loop: embed everything, then SELECT + INSERT/UPDATE per row."""
+    embeddings = embedder.embed([text for _, text in items])
+    for (memory_id, text), embedding in zip(items, embeddings):
+        data = {"memory_id": memory_id, "user_id": user_hash, "text": text, "embedding": embedding.tolist()}
+        response = client.table("Embeddings").select("memory_id").eq("memory_id", memory_id).limit(1).execute()
+        if len(response.data) > 0:
+            client.table("Embeddings").update(data).eq("memory_id", memory_id).execute()
+        else:
+            client.table("Embeddings").insert(data).execute()
+
+
+def bulk_ingest(client, embedder, items, user_hash, batch_size, workers):
+    """What upsert_embeddings does."""
+    upserter = PipelinedUpserter(supabase_sender(client, "Embeddings", "memory_id"),
+                                 batch_size=batch_size, max_in_flight=workers, name="supabase")
+    with upserter:
+        for (memory_id, text), embedding in embed_in_batches(embedder, items, lambda item: item[1]):
+            upserter.add({"memory_id": memory_id, "user_id": user_hash, "text": text, "embedding": embedding.tolist()})
+    return upserter.stats()
+
+
+def snapshot():
+    with FakePostgrest.lock:
+        rows = FakePostgrest.tables.get("Embeddings", {})
+        return {key: (row["user_id"], row["text"]) for key, row in rows.items()}
+
+
+def reset():
+    with FakePostgrest.lock:
+        FakePostgrest.tables.clear()
+        FakePostgrest.calls = 0
+
+
+def chroma_comparison(rows):
+    try:
+        import chromadb
+    except ImportError:
+        print("\nchromadb not installed; skipping the Chroma comparison")
+        return
+    client     = chromadb.EphemeralClient()
+    ids        = [f"m{i}" for i in range(rows)]
+    texts      = [f"memory {i}" for i in range(rows)]
+    embeddings = np.random.default_rng(0).standard_normal((rows, 384)).astype(np.float32)
+
+    collection = client.create_collection("per_row")
+    start = time.perf_counter()
+    for id, text, embedding in zip(ids, texts, embeddings):
+        if not collection.get(ids=[id])["ids"]:
+            collection.add(ids=[id], documents=[text], embeddings=[embedding], metadatas=[{"source": id}])
+    per_row = rows / (time.perf_counter() - start)
+
+    collection = client.create_collection("batched")
+    upserter   = PipelinedUpserter(chroma_sender(collection), batch_size=min(1000, client.get_max_batch_size()),
+                                   max_in_flight=1, name="chroma")
+    with upserter:
+        for id, text, embedding in zip(ids, texts, embeddings):
+            upserter.add({"id": id, "document": text, "embedding": embedding, "metadata": {"source": id}})
+    print(f"\nChroma, {rows} rows: per-row get/add {per_row:8.0f} rows/s, "
+          f"batched upsert {upserter.stats()['rows_per_s']:8.0f} rows/s ({collection.count()} stored)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--legacy-rows", type=int, default=500, help="rows for the slow per-row baseline")
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--embed-ms", type=float, default=20.0, help="stand-in model time per 64-text batch")
+    parser.add_argument("--batches", default="100,500")
+    parser.add_argument("--workers", default="1,4")
+    args = parser.parse_args()
+
+    FakePostgrest.rtt = args.rtt_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePostgrest)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client, kind = make_client(f"http://127.0.0.1:{server.server_address[1]}")
+    embedder     = StandInEmbedder(args.embed_ms)
+    items        = [(f"user-1_pdf_{i}", f"chunk {i} of the uploaded PDF") for i in range(args.rows)]
+
+    print(f"Supabase stand-in with {args.rtt_ms}ms per request, {kind}; embedding {args.embed_ms}ms per 64 texts")
+    print(f"{'path':>24} {'rows':>6} {'requests':>9} {'rows/s':>9}")
+
+    reset()
+    start = time.perf_counter()
+    legacy_ingest(client, embedder, items[:args.legacy_rows], "user-1")
+    rate = args.legacy_rows / (time.perf_counter() - start)
+    print(f"{'per-row select+write':>24} {args.legacy_rows:6d} {FakePostgrest.calls:9d} {rate:9.0f}")
+    expected = snapshot()
+
+    for batch_size in (int(n) for n in args.batches.split(",")):
+        for workers in (int(n) for n in args.workers.split(",")):
+            reset()
+            stats = bulk_ingest(client, embedder, items, "user-1", batch_size, workers)
+            label = f"upsert x{batch_size}, {workers} in flight"
+            print(f"{label:>24} {stats['rows']:6d} {FakePostgrest.calls:9d} {stats['rows_per_s']:9.0f}")
+
+    first = snapshot()
+    bulk_ingest(client, embedder, items, "user-1", 500, 4)  # again: must update in place
+    same_rows  = {key: first[key] for key in expected} == expected
+    idempotent = snapshot() == first and len(first) == args.rows
+    print(f"\nsame rows as the per-row path: {same_rows}; re-run adds nothing: {idempotent}")
+
+    chroma_comparison(min(args.rows, 2000))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
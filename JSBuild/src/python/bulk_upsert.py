@@ -0,0 +1,145 @@
+import time
+import random
+import logging
+import threading
+from   concurrent.futures import ThreadPoolExecutor
+
+
+class PipelinedUpserter:
+    """
+    Sends rows in batches through `send(batch)` with up to `max_in_flight`
+    batches on the wire at once.
+
+    `add()` returns as soon as a full batch has been handed to the pool, so
+    the caller keeps embedding the next batch while earlier ones upload;
+    once `max_in_flight` batches are outstanding it waits for one to finish,
+    which bounds memory. Failed batches are retried with exponential backoff
+    and full jitter; batches that still fail are counted and logged.
+
+    Parameters:
+    - send (callable): Writes one list of rows (see supabase_sender / chroma_sender).
+    - batch_size (int): Rows per request.
+    - max_in_flight (int): Concurrent requests (1 keeps writes in order).
+    """
+
+    def __init__(self, send, batch_size=500, max_in_flight=4, retries=3, base_delay=0.5, name="upsert"):
+        self.send          = send
+        self.batch_size    = batch_size
+        self.retries       = retries
+        self.base_delay    = base_delay
+        self.name          = name
+        self._pending      = []
+        self._slots        = threading.BoundedSemaphore(max_in_flight)
+        self._pool         = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=name)
+        self._futures      = []
+        self._lock         = threading.Lock()
+        self._start        = None
+        self._end          = None
+
+        self.rows          = 0
+        self.batches       = 0
+        self.failed_rows   = 0
+        self.retried       = 0
+
+    def add(self, row):
+        if self._start is None:
+            self._start = time.perf_counter()
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._submit()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def _submit(self):
+        batch, self._pending = self._pending, []
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._send, batch))
+
+    def _send(self, batch):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.send(batch)
+                    with self._lock:
+                        self.rows    += len(batch)
+                        self.batches += 1
+                    return
+                except Exception as e:
+                    if attempt == self.retries:
+                        with self._lock:
+                            self.failed_rows += len(batch)
+                        logging.error(f"{self.name}: batch of {len(batch)} rows failed: {e}")
+                        return
+                    with self._lock:
+                        self.retried += 1
+                    time.sleep(random.uniform(0, self.base_delay * 2 ** attempt))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Send what is left, wait for every batch and return the stats."""
+        if self._pending:
+            self._submit()
+        for future in self._futures:
+            future.result()
+        self._pool.shutdown()
+        if self._start is not None and self._end is None:
+            self._end = time.perf_counter()
+        return self.stats()
+
+    def stats(self):
+        elapsed = (self._end or time.perf_counter()) - self._start if self._start is not None else 0.0
+        return {
+            "rows":        self.rows,
+            "batches":     self.batches,
+            "failed_rows": self.failed_rows,
+            "retried":     self.retried,
+            "seconds":     round(elapsed, 3),
+            "rows_per_s":  round(self.rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def supabase_sender(client, table, on_conflict):
+    """One `upsert` per batch; `on_conflict` must be a unique column (e.g. memory_id)."""
+    def send(rows):
+        client.table(table).upsert(rows, on_conflict=on_conflict).execute()
+    return send
+
+
+def chroma_sender(collection):
+    """One `collection.upsert` per batch of {"id", "document", "embedding", "metadata"} rows."""
+    def send(rows):
+        collection.upsert(
+            ids=[row["id"] for row in rows],
+            documents=[row["document"] for row in rows],
+            embeddings=[row["embedding"] for row in rows],
+            metadatas=[row["metadata"] for row in rows],
+        )
+    return send
+
+
+def chroma_batch_size(client, requested=1000):
+    """`requested`, capped at what the Chroma client accepts in one call."""
+    limit = getattr(client, "get_max_batch_size", None)
+    return min(requested, limit()) if limit is not None else requested
+
+
+def embed_in_batches(embedder, items, text_of, batch_size=64):
+    """Yield (item, embedding) pairs, embedding `batch_size` texts per call."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from zip(batch, embedder.embed([text_of(entry) for entry in batch]))
+            batch = []
+    if batch:
+        yield from zip(batch, embedder.embed([text_of(entry) for entry in batch]))
@@ -1,97 +1,105 @@
 
+import os
 import json
 from   json import JSONEncoder
 
 import chromadb
 import pandas as pd
-import supabase
+import supabase as S
 import numpy as np
-from   pypdf import PdfReader
-from   sentence_transformers import SentenceTransformer
 from   chromadb.utils import embedding_functions
 
-class NumpyArrayEncoder(JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return JSONEncoder.default(self, obj)
-    
-# Extract text from PDF
-def extract_pdf_text(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
+from   bulk_upsert import PipelinedUpserter, supabase_sender, chroma_sender, chroma_batch_size, embed_in_batches
+from   pdf_chunks  import pdf_pages, chunk_pages, model_budget
+from   embedder    import Embedder
 
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
+# Rows per Supabase upsert request and how many requests may be in flight at once
+UPSERT_BATCH   = int(os.getenv("SUPABASE_UPSERT_BATCH", 500))
+UPSERT_WORKERS = int(os.getenv("SUPABASE_UPSERT_WORKERS", 4))
 
-    return text
+_supabase = None
 
+def supabase_client():
+    """The Supabase client for SUPABASE_URL / SUPABASE_KEY, created on first use."""
+    global _supabase
+    if _supabase is None:
+        _supabase = S.create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return _supabase
 
-# Split text into chunks for embeddings
-def chunk_text(text, chunk_size=500, overlap=50):
-    words = text.split()
-    chunks = []
+# One all-MiniLM-L6-v2 for every function here, embedding in batches and
+# cached on disk by content hash; loaded on first use.
+embedder = Embedder.from_env('all-MiniLM-L6-v2')
 
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = " ".join(words[i:i + chunk_size])
-        chunks.append(chunk)
 
-    return chunks
+class ServiceEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """Lets ChromaDB embed queries with the shared embedder instead of loading the model again."""
+    def __call__(self, input):
+        return list(embedder.embed(input))
+
+class NumpyArrayEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return JSONEncoder.default(self, obj)
+    
+def upsert_embeddings(user_hash, items, batch_size=UPSERT_BATCH, workers=UPSERT_WORKERS):
+    """
+    Embed (memory_id, text) pairs and upsert them into the Embeddings table.
+
+    Texts are embedded in batches while earlier batches upload, and each
+    upload is one `upsert` of `batch_size` rows (memory_id must be unique)
+    instead of a SELECT plus an INSERT or UPDATE per row. Returns the
+    upserter's stats, including rows/sec.
+    """
+    upserter = PipelinedUpserter(supabase_sender(supabase_client(), "Embeddings", "memory_id"),
+                                 batch_size=batch_size, max_in_flight=workers, name="supabase")
+    with upserter:
+        for (memory_id, text), embedding in embed_in_batches(embedder, items, lambda item: item[1]):
+            upserter.add({
+                "memory_id": memory_id,
+                "user_id":   user_hash,
+                "text":      text,
+                "embedding": embedding.tolist(),  # JSON payload
+            })
+    return upserter.stats()
+
+def upsert_chroma(client, collection, ids, texts, embeddings, sources):
+    """Write rows to a Chroma collection with one batched `upsert` per client-sized batch."""
+    upserter = PipelinedUpserter(chroma_sender(collection), batch_size=chroma_batch_size(client),
+                                 max_in_flight=1, name="chroma")
+    with upserter:
+        for id, text, embedding, source in zip(ids, texts, embeddings, sources):
+            upserter.add({"id": id, "document": text, "embedding": embedding, "metadata": {"source": source}})
+    return upserter.stats()
 
 def create_embeddings_from_pdf(user_hash, pdf_path):
 
-    # Extract PDF text
-    text = extract_pdf_text(pdf_path)
+    # Read pages one at a time and cut them into overlapping chunks that fit the embedding
+    # model's input, counted with its own tokenizer; each chunk is embedded and uploaded
+    # while later pages are still being read
+    count_tokens, max_tokens = model_budget(embedder.model)
+    chunks = chunk_pages(pdf_pages(pdf_path), max_tokens=max_tokens, count_tokens=count_tokens)
+
+    # Embed and upsert in pipelined batches
+    stats = upsert_embeddings(user_hash, ((f"{user_hash}_pdf_{i}", chunk) for i, chunk in enumerate(chunks)))
 
-    if not text:
+    if not stats["rows"] and not stats["failed_rows"]:
         print("PDF had no readable text.")
         return
 
-    # Chunk text
-    chunks = chunk_text(text)
-
-    # Load embedding model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    # Generate embeddings
-    embeddings = model.encode(chunks)
-
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-
-        memory_id = f"{user_hash}_pdf_{i}"
-
-        data = {
-            "memory_id": memory_id,
-            "user_id": user_hash,
-            "text": chunk,
-            "embedding": embedding.tolist(),
-        }
-
-        response = supabase.table("Embeddings")\
-            .select("memory_id")\
-            .eq("memory_id", memory_id)\
-            .limit(1)\
-            .execute()
-
-        if len(response.data) > 0:
-            supabase.table("Embeddings")\
-                .update(data)\
-                .eq("memory_id", memory_id)\
-                .execute()
-        else:
-            supabase.table("Embeddings")\
-                .insert(data)\
-                .execute()
-
-    print(f"Processed {len(chunks)} chunks from PDF.")
+    print(f"Processed {stats['rows']} chunks from PDF: {stats['rows_per_s']} rows/s in {stats['batches']} upserts.")
+    if stats["failed_rows"]:
+        print(f"{stats['failed_rows']} rows failed to upload.")
+    return stats
 
 def chromadb_embeddings_creator(user_hash):
+    supabase = supabase_client()
+
     # Fetch data from Supabase
     response = supabase.table("MemoryRecommendationCollection").select("*").execute()
     df = pd.json_normalize(response.data)[1:]  # Convert to DataFrame and skip header
 
-    # Initialize model and ChromaDB client
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Initialize ChromaDB client
     client = chromadb.PersistentClient(path="chroma_data/")
     collection_name = "cdb_memories"
 
@@ -99,41 +107,28 @@ def chromadb_embeddings_creator(user_hash):
     try:
         collection = client.get_collection(name=collection_name)
     except:
-        embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name='all-MiniLM-L6-v2')
-        collection = client.create_collection(name=collection_name, embedding_function=embedding_function)
+        collection = client.create_collection(name=collection_name, embedding_function=ServiceEmbeddingFunction())
 
     # Prepare and encode memory texts
     ids = df["Id"].tolist()
     texts = df["Memory"].tolist()
-    embeddings = model.encode(texts)
+    embeddings = embedder.embed(texts)
 
-    # Store embeddings in Supabase
-    existing_embeddings = supabase.table("Embeddings").select("embedding_id").execute()
+    # Store embeddings in Supabase (one row per user, replaced in a single upsert)
     embeddings_json = json.dumps({"embeddings": embeddings.tolist()})
-    pyi = NumpyArrayEncoder()
-
-    if not existing_embeddings.data:
-        supabase.table("Embeddings").insert({"embedding_id": str(user_hash), "embeddings": embeddings_json}).execute()
-    else:
-        supabase.table("Embeddings").update({"embedding_id": str(user_hash), "embeddings": embeddings_json}).eq("embedding_id", user_hash).execute()
+    supabase.table("Embeddings").upsert({"embedding_id": str(user_hash), "embeddings": embeddings_json},
+                                        on_conflict="embedding_id").execute()
 
     # Add embeddings to ChromaDB
-    for id, text, embedding in zip(ids, texts, embeddings):
-        if not collection.get(id):
-            collection.add(
-                documents=[text],
-                embeddings=[embedding.tolist()],
-                metadatas=[{"source": id}],
-                ids=[id]
-            )
+    stats = upsert_chroma(client, collection, ids, texts, embeddings, ids)
     
-    print(f"Memories have been successfully added to ChromaDB for {user_hash}")
+    print(f"Memories have been successfully added to ChromaDB for {user_hash} ({stats['rows_per_s']} rows/s)")
 
 
 #TBA: not completed and needs refactoring
 def create_embeddings_from_json(user_hash):
     # Fetch data from Supabase using the table name "UserMemories" and user_hash
-    memories = supabase.table("Memories").select("associated_data").eq("user_id", user_hash).execute()
+    memories = supabase_client().table("Memories").select("associated_data").eq("user_id", user_hash).execute()
 
     associated_data = json.loads(memories.data[0]['associated_data'])
 
@@ -144,47 +139,30 @@ def create_embeddings_from_json(user_hash):
 
     entries = associated_data['Entries']
 
-    # Initialize the SentenceTransformer model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
     #texts = [entry['summary'] for entry in entries]
     texts = [entry.get('summary') if entry.get('summary') not in [None, "", '', '\"', "\"", "None"] else 'No summary' for entry in entries]
     ids   = [entry['id'] for entry in entries]
 
-    # Compute embeddings for all memory texts
-    embeddings = model.encode(texts)
-
-    for text, embedding, id in zip(texts, embeddings, ids):
-        data = {
-            "memory_id": id,  # Generate a unique ID for the embedding entry
-            "user_id":   user_hash,  # Associate with the user
-            "text":      text,
-            "embedding": embedding.tolist(),  # Convert numpy array to list for JSON 
-        }
-        
-        response = supabase.table("Embeddings").select("memory_id").eq("memory_id", id).limit(1).execute()
-
-        if len(response.data) > 0:
-            supabase.table('Embeddings').update(data).eq('memory_id', id).execute()
-        else:
-            supabase.table('Embeddings').insert(data).execute()
+    # Embed and upsert in pipelined batches, keyed by the entry id
+    stats = upsert_embeddings(user_hash, zip(ids, texts))
+    print(f"Upserted {stats['rows']} memory embeddings for {user_hash}: {stats['rows_per_s']} rows/s")
+    return stats
 
 def chromadb_embeddings_creator_raw(user_hash, supabase_collection_name):
+    supabase = supabase_client()
+
     #pull memory collection, valid collection names: "MemoryRecommendationCollection", "CommunityActionsCollection", "GeneralCardsCollection"
     response = supabase.table(supabase_collection_name).select("*").execute() #GeneralRecommendationCollection
 
     #read response into dataframe
     df = pd.json_normalize(response)
 
-    # Initialize the SentenceTransformer model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
     # Initialize ChromaDB client
     client = chromadb.PersistentClient(path=f"chroma_data/")
 
     # Create a collection in ChromaDB
     collection_name = "categories"
-    embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name='all-MiniLM-L6-v2')
+    embedding_function = ServiceEmbeddingFunction()
 
     # Check if the collection exists
     try:
@@ -207,25 +185,11 @@ def chromadb_embeddings_creator_raw(user_hash, supabase_collection_name):
         texts.append(memory_text)
 
     # Compute embeddings for all memory texts
-    embeddings = model.encode(texts)
-    res = supabase.table("Embeddings").select("embedding_id").execute()
-    if(len(res.data) <= 0):
-        embeddings_json  = json.dumps({"embeddings": embeddings.tolist()})
-        (supabase.table("Embeddings").insert({"embedding_id": str(user_hash), "embeddings": str(embeddings_json)}).execute())
-    else:
-        embeddings_json  = json.dumps({"embeddings": embeddings.tolist()})
-        (supabase.table("Embeddings").update({"embedding_id": str(user_hash), "embeddings": str(embeddings_json)}).eq("embedding_id", user_hash).execute())
+    embeddings = embedder.embed(texts)
+    embeddings_json  = json.dumps({"embeddings": embeddings.tolist()})
+    supabase.table("Embeddings").upsert({"embedding_id": str(user_hash), "embeddings": str(embeddings_json)},
+                                        on_conflict="embedding_id").execute()
     
     # Store embeddings in ChromaDB
-    for id, text, embedding in zip(ids, texts, embeddings):
-        col = collection.get(id) 
-        if(col is not None):
-            continue
-        else:
-            collection.add(
-                documents=[text],
-                embeddings=[embedding.tolist()],
-                metadatas=[{"source": f"{id}"}],
-                ids=[id]
-            )
-    print("Activities have been successfully added to ChromaDB.")
\ No newline at end of file
+    upsert_chroma(client, collection, ids, texts, embeddings, [f"{id}" for id in ids])
+    print("Activities have been successfully added to ChromaDB.")
@@ -0,0 +1,99 @@
+import os
+import threading
+
+import numpy as np
+
+from   embedding_cache import EmbeddingCache, cached_dim, content_key, model_slug
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class Embedder:
+    """
+    One SentenceTransformer for the scripts in this folder, loaded on first use.
+
+    embed() answers texts it has embedded before from the on-disk cache and
+    encodes the rest (each distinct text once) in batches of `batch_size`.
+    The cache is embedding_cache.EmbeddingCache, the same memory-mapped
+    float16 format Cybel's EmbeddingService writes, so a cache directory
+    built by either can be read by the other. A warm cache is opened
+    without loading the model. Results are float32 numpy arrays.
+
+    Parameters:
+    - model_name (str): SentenceTransformer model.
+    - cache_dir (str | None): Root of the on-disk cache; None disables it.
+    - batch_size (int): Texts per model call.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache_dir=None, batch_size=64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_dir  = os.path.join(cache_dir, model_slug(model_name)) if cache_dir else None
+        self._model     = None
+        self._cache     = None
+        self._lock      = threading.Lock()
+
+        self.cache_hits = 0
+        self.encoded    = 0
+
+        dim = cached_dim(self.cache_dir) if self.cache_dir is not None else None
+        if dim is not None:
+            self._cache = EmbeddingCache(self.cache_dir, dim)
+
+    @classmethod
+    def from_env(cls, model_name=DEFAULT_MODEL):
+        """Cache under EMBEDDING_CACHE_DIR (default embedding_cache/, empty to disable), EMBED_BATCH texts per call."""
+        return cls(
+            model_name,
+            cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache/") or None,
+            batch_size=int(os.getenv("EMBED_BATCH", 64)),
+        )
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first access."""
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    def _encode(self, texts):
+        model = self.model
+        return np.concatenate([
+            model.encode(texts[i:i + self.batch_size], batch_size=self.batch_size, convert_to_numpy=True)
+            for i in range(0, len(texts), self.batch_size)
+        ]).astype(np.float32, copy=False)
+
+    def embed(self, texts):
+        """Embeddings of `texts` as an (n, dim) float32 array."""
+        texts  = list(texts)
+        keys   = [content_key(text) for text in texts]
+        cached = self._cache.get_many(keys) if self._cache is not None else {}
+
+        missing = list(dict.fromkeys(text for i, text in enumerate(texts) if i not in cached))
+        fresh   = {}
+        if missing:
+            vectors = self._encode(missing)
+            fresh   = dict(zip(missing, vectors))
+            if self.cache_dir is not None:
+                with self._lock:
+                    if self._cache is None:
+                        self._cache = EmbeddingCache(self.cache_dir, vectors.shape[1])
+                self._cache.put_many([content_key(text) for text in missing], vectors)
+
+        with self._lock:
+            self.cache_hits += len(cached)
+            self.encoded    += len(missing)
+        if not texts:
+            return np.zeros((0, self._cache.dim if self._cache is not None else 0), dtype=np.float32)
+        return np.stack([cached[i] if i in cached else fresh[text] for i, text in enumerate(texts)])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model":          self.model_name,
+                "cached_vectors": len(self._cache) if self._cache is not None else 0,
+                "cache_hits":     self.cache_hits,
+                "encoded":        self.encoded,
+            }
@@ -0,0 +1,106 @@
+import re
+import logging
+import functools
+from   collections import deque
+
+from   pypdf import PdfReader
+
+# Used when chunking without a model (see model_budget); all-MiniLM-L6-v2 reads 256 word pieces
+CHUNK_TOKENS  = 200
+CHUNK_OVERLAP = 30
+
+_WORD = re.compile(r"\S+")
+
+
+def estimate_tokens(word):
+    """Roughly one token per six characters; used when no tokenizer is passed in."""
+    return (len(word) + 5) // 6
+
+
+def model_budget(model):
+    """
+    (count_tokens, max_tokens) for chunking text a SentenceTransformer will embed.
+
+    Words are counted with the model's own tokenizer, and the budget is its
+    max_seq_length less the special tokens the tokenizer adds around every
+    input, so no chunk is truncated when it is embedded (short of a single
+    word longer than the whole budget).
+    """
+    tokenizer = model.tokenizer
+    special   = len(tokenizer("")["input_ids"])  # e.g. [CLS] and [SEP]
+
+    def count_tokens(word):
+        return len(tokenizer.tokenize(word))
+
+    return count_tokens, model.max_seq_length - special
+
+
+def pdf_pages(pdf_path):
+    """
+    Yield the text of each page of a PDF as it is read.
+
+    Pages that fail to extract are logged and skipped. The file is read
+    through an open handle (given a path, pypdf loads the whole file into
+    memory) and the reader's object cache is cleared after every page, so
+    only the page index grows with the length of the document.
+    """
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        for number, page in enumerate(reader.pages):
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                logging.warning(f"Skipping page {number + 1} of {pdf_path}: {e}")
+                text = None
+            reader.resolved_objects.clear()
+            if text:
+                yield text
+
+
+def chunk_pages(pages, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP, count_tokens=None):
+    """
+    Yield overlapping chunks of at most `max_tokens` tokens from an iterable of page texts.
+
+    Chunks break between words and may span pages. Each chunk starts with
+    the last `overlap` tokens of the one before it. Only the chunk being
+    built is held in memory, so chunks come out while later pages are
+    still being read.
+
+    Parameters:
+    - pages (iterable of str): Page texts, e.g. pdf_pages(path).
+    - max_tokens (int): Token budget per chunk. A word that does not fit
+      after the overlap starts its chunk without one; a single word longer
+      than the budget becomes a chunk of its own.
+    - overlap (int): Tokens repeated from the end of the previous chunk.
+    - count_tokens (callable | None): Tokens in one word; defaults to estimate_tokens.
+      Pass model_budget(model) for the model the chunks are embedded with.
+    """
+    if overlap >= max_tokens:
+        raise ValueError(f"overlap ({overlap}) must be smaller than max_tokens ({max_tokens})")
+    # Words repeat a lot, so count each distinct one once. Counting words
+    # on their own slightly overestimates the joined text, which keeps
+    # chunks under budget.
+    count  = functools.lru_cache(maxsize=1 << 16)(count_tokens or estimate_tokens)
+    window = deque()  # (word, tokens) of the chunk being built
+    size   = 0
+    fresh  = False    # whether the window holds words not yet emitted
+
+    for text in pages:
+        for match in _WORD.finditer(text):
+            word   = match.group()
+            tokens = count(word)
+            if size + tokens > max_tokens:
+                if fresh:
+                    yield " ".join(w for w, _ in window)
+                    while window and size > overlap:
+                        size -= window.popleft()[1]
+                    fresh = False
+                if size + tokens > max_tokens:  # too long to follow the overlap: start clean
+                    window.clear()
+                    size = 0
+            window.append((word, tokens))
+            size  += tokens
+            fresh  = True
+
+    if fresh:
+        yield " ".join(w for w, _ in window)
@@ -1,36 +1,114 @@
+import gc
+import os
+import logging
+
 import torch
 from diffusers import StableDiffusionPipeline
 
+# "full" keeps the whole pipeline on the device. "attention_slicing" computes attention in
+# slices and decodes one image at a time (lower peak memory, a little slower). "sequential_offload"
+# keeps weights in RAM and moves each submodule to the GPU only while it runs; without CUDA it
+# falls back to attention_slicing.
+MEMORY_MODES = ("full", "attention_slicing", "sequential_offload")
+
 
 class ImageGenerator:
-    def __init__(self, model_name="runwayml/stable-diffusion-v1-5"):
-        self.model_name = model_name
-        self.pipe = None
+    def __init__(self, model_name="runwayml/stable-diffusion-v1-5", memory_mode="full", pipe=None):
+        if memory_mode not in MEMORY_MODES:
+            raise ValueError(f"Unknown memory mode {memory_mode!r}; expected one of {MEMORY_MODES}")
+        self.model_name  = model_name
+        self.memory_mode = memory_mode
+        self.pipe        = None
+        if pipe is not None:  # an already built pipeline (e.g. a tiny one for tests)
+            self._place(pipe)
+
+    @classmethod
+    def from_env(cls):
+        """Model from CYBEL_IMAGE_MODEL, memory mode from CYBEL_IMAGE_MEMORY (default full)."""
+        return cls(
+            os.environ.get("CYBEL_IMAGE_MODEL", "runwayml/stable-diffusion-v1-5"),
+            memory_mode=os.environ.get("CYBEL_IMAGE_MEMORY", "full"),
+        )
 
     def load_model(self):
         if self.pipe is None:
             print("Loading model...")
-            self.pipe = StableDiffusionPipeline.from_pretrained(
+            pipe = StableDiffusionPipeline.from_pretrained(
                 self.model_name,
                 torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
             )
-            self.pipe = self.pipe.to("cuda" if torch.cuda.is_available() else "cpu")
-            self.pipe.safety_checker = None  # Disable safety checker for uncensored generation
+            pipe.safety_checker = None  # Disable safety checker for uncensored generation
+            self._place(pipe)
             print("Model loaded.")
 
-    def generate_image(self, prompt, output_path="generated_image.png", num_inference_steps=50, guidance_scale=7.5):
+    def _place(self, pipe):
+        """Move the pipeline to its device and apply the memory mode."""
+        mode = self.memory_mode
+        if mode == "sequential_offload" and not torch.cuda.is_available():
+            logging.warning("sequential_offload needs a CUDA device; using attention_slicing on CPU")
+            mode = "attention_slicing"
+        if mode == "sequential_offload":
+            pipe.enable_sequential_cpu_offload()
+        else:
+            pipe = pipe.to("cuda" if torch.cuda.is_available() else "cpu")
+        if mode != "full":
+            pipe.enable_attention_slicing()
+            pipe.vae.enable_slicing()  # pipe.enable_vae_slicing() is gone from newer diffusers
+        self.pipe = pipe
+
+    def unload(self):
+        """Drop the pipeline and free its memory; the next call loads it again."""
+        self.pipe = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def generate_batch(self, prompts, width=None, height=None, num_inference_steps=50, guidance_scale=7.5,
+                       seeds=None, on_step=None):
+        """
+        Run the pipeline once for several prompts that share size and settings.
+
+        Parameters:
+        - prompts (list[str]): One image per prompt.
+        - width, height (int | None): Image size; None uses the model's native size.
+        - seeds (list[int] | None): One seed per prompt. A prompt gives the
+          same image with the same seed whether or not it is batched.
+        - on_step (callable | None): Called with the number of finished steps
+          after each denoising step; returning False stops the run early.
+
+        Returns the list of PIL images.
+        """
         if self.pipe is None:
             self.load_model()
+        kwargs = {}
+        if seeds is not None:
+            kwargs["generator"] = [torch.Generator("cpu").manual_seed(seed) for seed in seeds]
+        if on_step is not None:
+            def step_end(pipe, step, timestep, callback_kwargs):
+                if on_step(step + 1) is False:
+                    pipe._interrupt = True  # diffusers skips the remaining steps
+                return callback_kwargs
+            kwargs["callback_on_step_end"] = step_end
+        return self.pipe(
+            list(prompts),
+            width=width,
+            height=height,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            **kwargs
+        ).images
+
+    def generate_image(self, prompt, output_path="generated_image.png", num_inference_steps=50, guidance_scale=7.5):
         try:
             print(f"Generating image for prompt: {prompt}")
-            image = self.pipe(
-                prompt,
+            image = self.generate_batch(
+                [prompt],
                 num_inference_steps=num_inference_steps,
                 guidance_scale=guidance_scale
-            ).images[0]
+            )[0]
             image.save(output_path)
             print(f"Image saved to {output_path}")
             return output_path
         except Exception as e:
             print(f"Error generating image: {e}")
-            return None
\ No newline at end of file
+            return None
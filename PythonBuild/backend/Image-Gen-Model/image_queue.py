@@ -0,0 +1,350 @@
+import os
+import time
+import uuid
+import random
+import logging
+import itertools
+import threading
+
+from generator import ImageGenerator
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+
+class QueueFull(RuntimeError):
+    """Raised by ImageQueue.submit when `max_pending` jobs are already waiting."""
+
+
+class JobCancelled(RuntimeError):
+    """Raised by ImageJob.result for a job that was cancelled."""
+
+
+class ImageJob:
+    """
+    One prompt waiting in (or served by) an ImageQueue.
+
+    `step` / `steps` track denoising progress while the job runs. Wait for
+    the job with result(); cancel() takes it out of the queue, or stops its
+    batch early if every job in that batch is cancelled.
+    """
+
+    def __init__(self, queue, prompt, width, height, steps, guidance_scale, seed, priority, output_path, on_progress):
+        self.id             = uuid.uuid4().hex
+        self.prompt         = prompt
+        self.width          = width
+        self.height         = height
+        self.steps          = steps
+        self.guidance_scale = guidance_scale
+        self.seed           = seed
+        self.priority       = priority
+        self.output_path    = output_path
+        self.on_progress    = on_progress
+        self.status         = QUEUED
+        self.step           = 0
+        self.image          = None
+        self.error          = None
+        self.submitted      = time.perf_counter()
+        self.started        = None
+        self.finished       = None
+        self._queue         = queue
+        self._done          = threading.Event()
+        self._callbacks     = []
+        self._cancelled     = False
+        self._order         = None
+
+    @property
+    def batch_key(self):
+        """Jobs with the same key can share one pipeline call."""
+        return (self.width, self.height, self.steps, self.guidance_scale)
+
+    def cancel(self):
+        """Cancel the job; False if it has already finished."""
+        return self._queue.cancel(self)
+
+    def cancelled(self):
+        return self.status == CANCELLED
+
+    def done(self):
+        return self._done.is_set()
+
+    def add_done_callback(self, fn):
+        """Call `fn(job)` once the job finishes (at once if it already has); runs on the worker thread."""
+        with self._queue._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def result(self, timeout=None):
+        """The output path if one was given, else the PIL image; raises if the job failed or was cancelled."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Image job {self.id} is still {self.status}")
+        if self.status == CANCELLED:
+            raise JobCancelled(f"Image job {self.id} was cancelled")
+        if self.status == FAILED:
+            raise self.error
+        return self.output_path or self.image
+
+    def _finish(self, status, image=None, error=None):
+        with self._queue._lock:
+            self.status, self.image, self.error = status, image, error
+            self.finished = time.perf_counter()
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                logging.error(f"Image job callback failed: {e}")
+
+
+class ImageQueue:
+    """
+    Job queue in front of one ImageGenerator.
+
+    A single worker thread owns the pipeline, so it is loaded once, stays
+    resident between jobs, and is never run by two threads at once. The
+    worker takes the highest-priority job (oldest first among equals),
+    waits up to `max_wait_ms` for more work, and runs up to `max_batch`
+    queued jobs with the same size, steps and guidance in one pipeline call.
+    Every job gets its own seed, so its image does not depend on what it
+    was batched with. Progress is reported after every denoising step
+    through each job's `on_progress(job)`.
+
+    Parameters:
+    - generator (ImageGenerator): Model owner; loaded on the worker thread.
+    - max_batch (int): Most prompts per pipeline call.
+    - max_wait_ms (float): How long to wait for compatible jobs before running a partial batch.
+    - max_pending (int): Queued jobs allowed before submit() raises QueueFull.
+    - idle_unload_s (float): Unload the model after this long without work; 0 keeps it resident.
+    """
+
+    def __init__(self, generator=None, max_batch=4, max_wait_ms=50.0, max_pending=64, idle_unload_s=0):
+        self.generator     = generator or ImageGenerator.from_env()
+        self.max_batch     = max_batch
+        self.max_wait      = max_wait_ms / 1000
+        self.max_pending   = max_pending
+        self.idle_unload   = idle_unload_s
+        self._pending      = []
+        self._lock         = threading.Lock()
+        self._wake         = threading.Condition(self._lock)
+        self._order        = itertools.count()
+        self._running      = []
+        self._thread       = None
+        self._closing      = False
+
+        self.submitted     = 0
+        self.completed     = 0
+        self.cancelled     = 0
+        self.failed        = 0
+        self.batches       = 0
+        self.images        = 0
+        self.busy_seconds  = 0.0
+        self.unloads       = 0
+
+    @classmethod
+    def from_env(cls, generator=None):
+        """Batching per CYBEL_IMAGE_BATCH / CYBEL_IMAGE_WAIT_MS, bounds per CYBEL_IMAGE_MAX_PENDING / CYBEL_IMAGE_IDLE_UNLOAD_S."""
+        return cls(
+            generator,
+            max_batch=int(os.environ.get("CYBEL_IMAGE_BATCH", 4)),
+            max_wait_ms=float(os.environ.get("CYBEL_IMAGE_WAIT_MS", 50)),
+            max_pending=int(os.environ.get("CYBEL_IMAGE_MAX_PENDING", 64)),
+            idle_unload_s=float(os.environ.get("CYBEL_IMAGE_IDLE_UNLOAD_S", 0)),
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cybel-image-worker", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, prompt, width=None, height=None, steps=50, guidance_scale=7.5, seed=None, priority=0,
+               output_path=None, on_progress=None):
+        """
+        Queue one prompt and return its ImageJob.
+
+        Parameters:
+        - priority (int): Higher runs first.
+        - seed (int | None): Fixed seed for a reproducible image; random when None.
+        - output_path (str | None): Save the image here when done.
+        - on_progress (callable | None): `on_progress(job)` after every step, on the worker thread.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        job = ImageJob(self, prompt, width, height, steps, guidance_scale, seed, priority, output_path, on_progress)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("ImageQueue is closed")
+            if len(self._pending) >= self.max_pending:
+                raise QueueFull(f"{len(self._pending)} image jobs are already waiting")
+            job._order = next(self._order)
+            self._pending.append(job)
+            self.submitted += 1
+            self._wake.notify()
+        self.start()
+        return job
+
+    def cancel(self, job):
+        with self._lock:
+            if job._done.is_set():
+                return False
+            job._cancelled = True
+            queued = job in self._pending
+            if queued:
+                self._pending.remove(job)
+        if queued:
+            self._cancel(job)
+        return True  # a running job is dropped when its batch ends, or stops it if the whole batch is cancelled
+
+    def _cancel(self, job):
+        with self._lock:
+            self.cancelled += 1
+        job._finish(CANCELLED)
+
+    def position(self, job):
+        """How many queued jobs run before `job` (0 once it is running)."""
+        with self._lock:
+            if job not in self._pending:
+                return 0
+            return sum(1 for other in self._pending if self._rank(other) < self._rank(job))
+
+    @staticmethod
+    def _rank(job):
+        return (-job.priority, job._order)
+
+    # ---------- worker ----------
+    def _next_batch(self):
+        """Wait for work and take the next batch off the queue; None once closed."""
+        with self._lock:
+            idle_since = time.perf_counter()
+            while not self._pending:
+                if self._closing:
+                    return None
+                timeout = None
+                if self.idle_unload and self.generator.pipe is not None:
+                    timeout = max(0.0, idle_since + self.idle_unload - time.perf_counter())
+                    if timeout == 0.0:
+                        self.generator.unload()
+                        self.unloads += 1
+                        logging.info("Image model unloaded after being idle")
+                        continue
+                self._wake.wait(timeout)
+
+            head     = min(self._pending, key=self._rank)
+            deadline = time.perf_counter() + self.max_wait
+            while not self._closing:
+                matching = sum(1 for job in self._pending if job.batch_key == head.batch_key)
+                remaining = deadline - time.perf_counter()
+                if matching >= self.max_batch or remaining <= 0:
+                    break
+                self._wake.wait(remaining)
+                if head not in self._pending:  # cancelled while we waited
+                    return []
+
+            batch = sorted((job for job in self._pending if job.batch_key == head.batch_key), key=self._rank)
+            batch = batch[:self.max_batch]
+            for job in batch:
+                self._pending.remove(job)
+                job.status  = RUNNING
+                job.started = time.perf_counter()
+            self._running = batch
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        first = batch[0]
+
+        def on_step(step):
+            for job in batch:
+                job.step = step
+                if job.on_progress is not None and not job._cancelled:
+                    try:
+                        job.on_progress(job)
+                    except Exception as e:
+                        logging.error(f"Image progress callback failed: {e}")
+            return not all(job._cancelled for job in batch)
+
+        start = time.perf_counter()
+        try:
+            images = self.generator.generate_batch(
+                [job.prompt for job in batch],
+                width=first.width,
+                height=first.height,
+                num_inference_steps=first.steps,
+                guidance_scale=first.guidance_scale,
+                seeds=[job.seed for job in batch],
+                on_step=on_step,
+            )
+        except Exception as e:
+            logging.error(f"Image batch of {len(batch)} failed: {e}")
+            with self._lock:
+                self._running = []
+            for job in batch:
+                if job._cancelled:
+                    self._cancel(job)
+                else:
+                    self._fail(job, e)
+            return
+        with self._lock:
+            self.busy_seconds += time.perf_counter() - start
+            self.batches      += 1
+            self.images       += len(batch)
+            self._running      = []
+
+        for job, image in zip(batch, images):
+            if job._cancelled:
+                self._cancel(job)
+                continue
+            try:
+                if job.output_path:
+                    image.save(job.output_path)
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            with self._lock:
+                self.completed += 1
+            job._finish(DONE, image=image)
+
+    def _fail(self, job, error):
+        with self._lock:
+            self.failed += 1
+        job._finish(FAILED, error=error)
+
+    def close(self, cancel_pending=True, timeout=None):
+        """Stop the worker; queued jobs are cancelled, or run first when cancel_pending is False."""
+        with self._lock:
+            self._closing = True
+            dropped = list(self._pending) if cancel_pending else []
+            for job in dropped:
+                job._cancelled = True
+                self._pending.remove(job)
+            self._wake.notify_all()
+        for job in dropped:
+            self._cancel(job)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending":      len(self._pending),
+                "running":      len(self._running),
+                "submitted":    self.submitted,
+                "completed":    self.completed,
+                "cancelled":    self.cancelled,
+                "failed":       self.failed,
+                "batches":      self.batches,
+                "mean_batch":   round(self.images / self.batches, 2) if self.batches else 0.0,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "resident":     self.generator.pipe is not None,
+                "unloads":      self.unloads,
+            }
@@ -1,65 +1,122 @@
 # api.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-import weaviate
-from weaviate.classes.init import Auth
-import weaviate.classes as wvc
 import os
+import json
+import time
+import asyncio
+import logging
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
 
 import main
+from automat_llm          import core
+from automat_llm.registry import registry
+from automat_llm.core     import install_executor, time_to_first_token, local_memory_store, response_cache_stats, VECTOR_BACKEND
+from automat_llm.core     import request_stages
+from automat_llm.ingest   import IngestionWorker
+from automat_llm.metrics  import RequestTimer, prometheus_histogram, prometheus_counter
 
 load_dotenv()
 
 # Global client reference
-weaviate_client = None
+weaviate_client  = None
+ingestion_worker = None
+
+# Weaviate, the documents and the models load in the background after the
+# server starts listening; /health reports progress and chat routes answer
+# 503 until the state is "ready".
+startup = {"state": "starting", "error": None, "seconds": None}
+
+
+def _start_system():
+    """Blocking startup work, run in the executor so the event loop stays free."""
+    global weaviate_client, ingestion_worker
+
+    # Create Weaviate client
+    weaviate_client = main.connect_weaviate()
+
+    # Initialize the system with the connected client (also drains the pre-journal chat log)
+    main.initialize_system(weaviate_client)
+
+    # Move new conversations from the journal into long-term memory while the server runs
+    ingestion_worker = IngestionWorker(
+        weaviate_client,
+        main.journal.path,
+        interval=float(os.environ.get("CYBEL_INGEST_INTERVAL", 30)),
+        max_pairs=int(os.environ.get("CYBEL_INGEST_PAIRS", 20)),
+        collection=local_memory_store() if VECTOR_BACKEND == "faiss" else None,
+        index=core.memory_index
+    ).start()
+    # Rotation must not drop journal files the worker has not uploaded yet
+    main.journal.retain = ingestion_worker.pending_upload
+
+
+async def _warm_up():
+    start = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _start_system)
+        startup["state"] = "ready"
+        print(f"✅ Application startup complete in {time.perf_counter() - start:.1f}s")
+    except BaseException as e:  # initialize_system exit()s on missing input
+        startup["state"], startup["error"] = "failed", repr(e)
+        logging.exception("Startup failed")
+        print(f"❌ Application startup failed: {e!r}")
+    finally:
+        startup["seconds"] = round(time.perf_counter() - start, 3)
+
+
+def _not_ready():
+    """503 for chat routes until the background startup has finished."""
+    if startup["state"] == "ready":
+        return None
+    return JSONResponse({"error": f"Cybel is {startup['state']}", "startup": startup}, status_code=503)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle: startup and shutdown."""
-    global weaviate_client
     
     # ==================== STARTUP ====================
-    weaviate_url = os.environ.get("WEAVIATE_URL")
-    weaviate_api_key = os.environ.get("WEAVIATE_API_KEY")
-    
     print("🚀 Starting application...")
     
-    # Create Weaviate client
-    if os.environ.get("LOCAL_WEAVIATE") == "1":
-        weaviate_client = weaviate.connect_to_local(
-            additional_config=wvc.init.AdditionalConfig(
-                timeout=wvc.init.Timeout(init=60, query=30, insert=120)
-            )
-        )
-    else:
-        weaviate_client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=Auth.api_key(weaviate_api_key),
-        )
-    
-    # Initialize the system with the connected client
-    main.initialize_system(weaviate_client)
+    # Bounded pool for the blocking embedding/search work done inside ainvoke
+    executor = install_executor()
     
-    print("✅ Application startup complete")
+    # Connect, load documents and warm the models without holding up /health
+    warm_up = asyncio.create_task(_warm_up())
     
     yield  # Application runs here
     
     # ==================== SHUTDOWN ====================
     print("🛑 Shutting down application...")
     
-    # Upload logs to Weaviate before closing
-    log_filepath = os.path.join(main.current_dir, 'Logs/chatbot_logs.txt')
-    print(f"📤 Uploading logs from {log_filepath} to Weaviate...")
-    main.upload_logs_to_weaviate(weaviate_client, log_filepath)
+    # A startup still in progress cannot be interrupted; let it finish first
+    await warm_up
+    
+    # Write out queued turns, then upload whatever the background worker has not picked up yet
+    if getattr(main, "journal", None) is not None:
+        main.journal.close()
+    if ingestion_worker is not None:
+        print(f"📤 Uploading remaining conversations from {ingestion_worker.log_filepath} to Weaviate...")
+        ingestion_worker.stop(flush=True)
+    
+    # Write the final user interactions snapshot
+    if getattr(main, "user_interactions", None) is not None:
+        main.user_interactions.close()
+    
+    # Close the LLM backends' HTTP clients (the async ones belong to this event loop)
+    await registry.aclose()
     
     # Close Weaviate client
     if weaviate_client is not None:
         weaviate_client.close()
         print("✅ Weaviate client closed")
     
+    executor.shutdown(wait=False)
     print("👋 Shutdown complete")
 
 
@@ -68,12 +125,35 @@ app = FastAPI(lifespan=lifespan)
 
 
 # ==================== REQUEST MODELS ====================
+# Safe to put in log lines and vector store filters
+USER_ID_PATTERN = r"^[A-Za-z0-9_.@:-]{1,128}$"
+
+
+class RetrievalOptions(BaseModel):
+    """Per-request memory search settings; unset fields keep the server defaults."""
+    mode: Optional[Literal["hybrid", "vector", "lexical"]] = None
+    k: Optional[int] = Field(default=None, ge=1, le=50)
+    rrf_k: Optional[float] = Field(default=None, gt=0)
+    vector_weight: Optional[float] = Field(default=None, ge=0)
+    lexical_weight: Optional[float] = Field(default=None, ge=0)
+
+
 class ChatRequest(BaseModel):
     message: str
+    # Whose history, rudeness score and memories to use; the CLI's single user when omitted
+    user_id: Optional[str] = Field(default=None, pattern=USER_ID_PATTERN)
+    # Return where this request spent its time (history, embedding, vector_search, llm, ...)
+    timings: bool = False
+    # How to search long-term memory for this message (keyword + vector fusion by default)
+    retrieval: Optional[RetrievalOptions] = None
+
+    def retrieval_options(self):
+        return self.retrieval.model_dump(exclude_none=True) if self.retrieval else None
 
 
 class ChatResponse(BaseModel):
     response: str
+    timings: Optional[dict] = None
 
 
 # ==================== ROUTES ====================
@@ -82,24 +162,141 @@ async def root():
     return {"message": "Cybel Chatbot API is running", "status": "healthy"}
 
 
-@app.post("/chat", response_model=ChatResponse)
+@app.post("/chat", response_model=ChatResponse, response_model_exclude_none=True)
 async def chat(request: ChatRequest):
     """
     Chat endpoint - sends message to the chatbot and returns response.
     """
+    if (busy := _not_ready()) is not None:
+        return busy
     try:
-        response = main.chat_once(request.message)
-        return ChatResponse(response=response)
+        timer    = RequestTimer()
+        response = await main.achat_once(request.message, request.user_id, timer, request.retrieval_options())
+        ingestion_worker.notify()
+        return ChatResponse(response=response, timings=timer.breakdown() if request.timings else None)
     except Exception as e:
         return ChatResponse(response=f"Error: {str(e)}")
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint - sends response text as Server-Sent Events while it is generated.
+    """
+    if (busy := _not_ready()) is not None:
+        return busy
+
+    async def events():
+        timer = RequestTimer()
+        try:
+            async for chunk in main.astream_once(request.message, request.user_id, timer, request.retrieval_options()):
+                yield f"data: {json.dumps({'token': chunk})}\n\n"
+            ingestion_worker.notify()
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'timings': timer.breakdown()} if request.timings else {})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.websocket("/chat/stream")
+async def chat_stream_ws(websocket: WebSocket, user_id: Optional[str] = Query(default=None, pattern=USER_ID_PATTERN),
+                         timings: bool = False, retrieval_mode: Optional[Literal["hybrid", "vector", "lexical"]] = None):
+    """
+    WebSocket chat - each text frame is a message; replies stream back as
+    {"token": ...} frames followed by {"done": true}. Connect with
+    `?user_id=...` to chat as that user, `&timings=true` to get each
+    reply's stage timings in its done frame and `&retrieval_mode=...` to
+    pick how memories are searched.
+    """
+    retrieval = {"mode": retrieval_mode} if retrieval_mode else None
+    await websocket.accept()
+    if startup["state"] != "ready":
+        await websocket.send_json({"error": f"Cybel is {startup['state']}"})
+        await websocket.close(code=1013)  # try again later
+        return
+    try:
+        while True:
+            message = await websocket.receive_text()
+            timer   = RequestTimer()
+            async for chunk in main.astream_once(message, user_id, timer, retrieval):
+                await websocket.send_json({"token": chunk})
+            await websocket.send_json({"done": True, **({"timings": timer.breakdown()} if timings else {})})
+            ingestion_worker.notify()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/metrics/ingestion")
+async def ingestion_metrics():
+    """Background memory ingestion progress and lag."""
+    if ingestion_worker is None:
+        return {"running": False}
+    return ingestion_worker.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request stage latencies, LLM backends, cache and ingestion counters in Prometheus text format."""
+    lines = prometheus_histogram(
+        "cybel_request_stage_seconds", "Time chat requests spent in each stage.",
+        [({"stage": stage}, snapshot) for stage, snapshot in sorted(request_stages.snapshot().items())]
+    )
+    lines += prometheus_histogram(
+        "cybel_time_to_first_token_seconds", "Time from a streamed request to its first token.",
+        [({}, time_to_first_token.snapshot())]
+    )
+
+    backends = registry.stats()["llm_backends"]
+    if backends is not None:
+        lines += prometheus_histogram(
+            "cybel_llm_backend_seconds", "Successful LLM call latency per backend.",
+            [({"backend": name}, backend["latency"]) for name, backend in backends["backends"].items()]
+        )
+        lines += prometheus_counter(
+            "cybel_llm_backend_failures_total", "Failed LLM calls per backend.",
+            [({"backend": name}, backend["failures"]) for name, backend in backends["backends"].items()]
+        )
+        lines += prometheus_counter("cybel_llm_fallbacks_total", "Requests answered by the local fallback.",
+                                    [({}, backends["fallbacks"])])
+
+    cache = response_cache_stats()
+    if cache["enabled"]:
+        lines += prometheus_counter("cybel_response_cache_lookups_total", "Response cache lookups by result.",
+                                    [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+
+    if ingestion_worker is not None:
+        ingestion = ingestion_worker.stats()
+        lines += prometheus_counter("cybel_ingestion_uploaded_total", "Conversations uploaded to long-term memory.",
+                                    [({}, ingestion["uploaded_total"])])
+        lines += prometheus_counter("cybel_ingestion_lag_bytes", "Conversation journal bytes not uploaded yet.",
+                                    [({}, ingestion["lag_bytes"])], kind="gauge")
+
+    if getattr(main, "journal", None) is not None:
+        journal = main.journal.stats()
+        lines += prometheus_counter("cybel_journal_records_total", "Conversation turns written to the journal.",
+                                    [({}, journal["records"])])
+        lines += prometheus_counter("cybel_journal_rotations_total", "Times the conversation journal was rotated.",
+                                    [({}, journal["rotations"])])
+
+    lines += prometheus_counter("cybel_ready", "1 once background startup has finished.",
+                                [({}, int(startup["state"] == "ready"))], kind="gauge")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "weaviate_connected": weaviate_client is not None
+        "ready": startup["state"] == "ready",
+        "startup": startup,
+        "weaviate_connected": weaviate_client is not None,
+        "models": registry.stats(),
+        "time_to_first_token": time_to_first_token.snapshot(),
+        "response_cache": response_cache_stats(),
+        "memory_index": core.memory_index.stats() if core.memory_index is not None else None,
+        "journal": main.journal.stats() if getattr(main, "journal", None) is not None else None
     }
 
 
@@ -0,0 +1,122 @@
+import time
+import asyncio
+import logging
+from   collections import namedtuple
+
+from   automat_llm.metrics import NULL_TIMER
+
+# What the retrieval step produced: the query embedding and the documents it found
+Retrieval = namedtuple("Retrieval", ["vector", "docs"])
+
+
+class CybelRagChain:
+    """
+    Retrieval-augmented chain with its retrieval and generation steps exposed.
+
+    Produces the same shape as LangChain's `create_retrieval_chain` —
+    `invoke`/`ainvoke` return {"input", "conversation_history", "context",
+    "answer"} and `stream`/`astream` yield the context before the answer
+    chunks — but the query is embedded exactly once and callers can run
+    `retrieve()` themselves, inspect the result, and hand it back in so the
+    work is not repeated.
+
+    Every step takes an optional RequestTimer and records its "embedding",
+    "vector_search", "context" and "llm" spans on it ("executor_wait" too
+    for async retrieval). For streams "llm" only
+    counts time spent waiting on the model, not on the consumer.
+
+    Parameters:
+    - embeddings: Object with `embed_query(text)`.
+    - search (callable): `search(query, vector, k, user_id)` -> list of
+      Documents; `user_id` comes from `inputs["user_id"]` (None if absent)
+      and limits the search to that user's memories. When the turn carries
+      per-query `inputs["retrieval"]` options they are passed as a fifth
+      argument (see lexical.HybridSearch); their "k" overrides `k`.
+    - llm_chain: Runnable taking the prompt inputs plus "context".
+    - k (int): Number of memories to retrieve.
+    - context_builder: Optional ContextBuilder fitting history and memories
+      into a token budget; without one the documents are passed as-is.
+    """
+
+    def __init__(self, embeddings, search, llm_chain, k=10, context_builder=None):
+        self.embeddings      = embeddings
+        self.search          = search
+        self.llm_chain       = llm_chain
+        self.k               = k
+        self.context_builder = context_builder
+
+    # ---------- steps ----------
+    def retrieve(self, inputs, timer=NULL_TIMER):
+        with timer.span("embedding"):
+            vector = self.embeddings.embed_query(inputs["input"])
+        options = inputs.get("retrieval")
+        with timer.span("vector_search"):
+            if options:
+                docs = self.search(inputs["input"], vector, options.get("k") or self.k, inputs.get("user_id"), options)
+            else:
+                docs = self.search(inputs["input"], vector, self.k, inputs.get("user_id"))
+        return Retrieval(vector, docs)
+
+    async def aretrieve(self, inputs, timer=NULL_TIMER):
+        # Embedding and vector search are blocking; run them in the loop's (bounded) executor
+        submitted = time.perf_counter()
+
+        def run():
+            timer.add("executor_wait", time.perf_counter() - submitted)  # queued behind other requests
+            return self.retrieve(inputs, timer)
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    def _prompt_inputs(self, inputs, retrieval, timer=NULL_TIMER):
+        if self.context_builder is None:
+            return {**inputs, "context": retrieval.docs}
+        with timer.span("context"):
+            history, context, stats = self.context_builder.build(inputs["input"], inputs["conversation_history"], retrieval.docs)
+        logging.info(
+            f"Prompt tokens: {stats['total_tokens']} (query {stats['query_tokens']}, history {stats['history_tokens']}, "
+            f"memories {stats['memory_tokens']}; kept {stats['memories_kept']}/{stats['memories_retrieved']} memories, "
+            f"{stats['memories_retrieved'] - stats['memories_unique']} duplicates)"
+        )
+        return {**inputs, "conversation_history": history, "context": context}
+
+    # ---------- runnable-style API ----------
+    def invoke(self, inputs, retrieval=None, timer=NULL_TIMER):
+        retrieval     = retrieval or self.retrieve(inputs, timer)
+        prompt_inputs = self._prompt_inputs(inputs, retrieval, timer)
+        with timer.span("llm"):
+            answer = self.llm_chain.invoke(prompt_inputs)
+        return {**inputs, "context": retrieval.docs, "answer": answer}
+
+    async def ainvoke(self, inputs, retrieval=None, timer=NULL_TIMER):
+        retrieval     = retrieval or await self.aretrieve(inputs, timer)
+        prompt_inputs = self._prompt_inputs(inputs, retrieval, timer)
+        with timer.span("llm"):
+            answer = await self.llm_chain.ainvoke(prompt_inputs)
+        return {**inputs, "context": retrieval.docs, "answer": answer}
+
+    def stream(self, inputs, retrieval=None, timer=NULL_TIMER):
+        yield {"input": inputs["input"]}
+        retrieval = retrieval or self.retrieve(inputs, timer)
+        yield {"context": retrieval.docs}
+        chunks = iter(self.llm_chain.stream(self._prompt_inputs(inputs, retrieval, timer)))
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            timer.add("llm", time.perf_counter() - start)
+            if chunk is None:
+                return
+            yield {"answer": chunk}
+
+    async def astream(self, inputs, retrieval=None, timer=NULL_TIMER):
+        yield {"input": inputs["input"]}
+        retrieval = retrieval or await self.aretrieve(inputs, timer)
+        yield {"context": retrieval.docs}
+        chunks = self.llm_chain.astream(self._prompt_inputs(inputs, retrieval, timer)).__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                timer.add("llm", time.perf_counter() - start)
+            yield {"answer": chunk}
@@ -0,0 +1,152 @@
+import os
+import re
+import zlib
+import logging
+import functools
+
+import numpy as np
+
+# Tokenizer used to count prompt tokens; o200k_base matches the gpt-oss models served by Groq
+TOKENIZER = os.environ.get("CYBEL_TOKENIZER", "o200k_base")
+
+_WORD_RE    = re.compile(r"\w+|[^\w\s]")
+_MESSAGE_RE = re.compile(r"\n(?=(?:User|Cybel): )")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """The tiktoken encoding, or None when tiktoken or its (cached) BPE file is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER)
+    except Exception as e:
+        logging.warning(f"Tokenizer {TOKENIZER} unavailable ({type(e).__name__}), estimating token counts")
+        return None
+
+
+def count_tokens(text):
+    """Number of tokens in `text`; a word/punctuation estimate when no tokenizer is available."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly one token per short word or symbol, more for long words
+    return sum((len(piece) + 5) // 6 for piece in _WORD_RE.findall(text))
+
+
+def _lexical_vectors(texts, dim=512):
+    """Unit bag-of-hashed-words vectors, enough to spot near-identical memories without re-embedding."""
+    vectors = np.zeros((len(texts), dim), dtype="float32")
+    for i, text in enumerate(texts):
+        for word in _WORD_RE.findall(text.lower()):
+            vectors[i, zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def format_memories(docs):
+    """Render retrieved memories for the {context} slot, one block per memory."""
+    return "\n\n".join(doc.page_content.strip() for doc in docs)
+
+
+class ContextBuilder:
+    """
+    Fits recent history and retrieved memories into a token budget.
+
+    History keeps its newest messages within `history_share` of the budget;
+    memories get the rest (plus whatever history left unused). Memories are
+    ordered by maximal marginal relevance, near-identical ones (lexical
+    cosine >= `duplicate_threshold` to one already kept) are dropped, and if
+    they still do not fit the lowest-scoring ones go first.
+
+    Parameters:
+    - max_tokens (int): Budget for history + memories (CYBEL_CONTEXT_TOKENS).
+    - history_share (float): Part of the budget reserved for history.
+    - mmr_lambda (float): Relevance vs. diversity trade-off for MMR.
+    - duplicate_threshold (float): Similarity above which a memory is a duplicate.
+    """
+
+    def __init__(self, max_tokens=None, history_share=0.35, mmr_lambda=0.7, duplicate_threshold=0.9):
+        self.max_tokens          = max_tokens or int(os.environ.get("CYBEL_CONTEXT_TOKENS", 1500))
+        self.history_share       = history_share
+        self.mmr_lambda          = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    # ---------- history ----------
+    def fit_history(self, history, budget):
+        """Keep the newest whole messages of a formatted history that fit in `budget` tokens."""
+        if not history:
+            return "", 0
+        kept, used = [], 0
+        for message in reversed(_MESSAGE_RE.split(history)):
+            tokens = count_tokens(message) + 1
+            if used + tokens > budget:
+                break
+            kept.append(message)
+            used += tokens
+        return "\n".join(reversed(kept)), used
+
+    # ---------- memories ----------
+    @staticmethod
+    def _relevance(docs):
+        """Retrieval scores scaled to [0, 1]; rank order when the store gave none."""
+        scores = [doc.metadata.get("score") for doc in docs]
+        if any(score is None for score in scores):
+            return np.linspace(1.0, 0.5, num=len(docs)) if docs else np.zeros(0)
+        scores = np.asarray(scores, dtype="float32")
+        spread = float(scores.max() - scores.min())
+        return (scores - scores.min()) / spread if spread > 0 else np.ones(len(docs), dtype="float32")
+
+    def select_memories(self, docs):
+        """MMR order over `docs` with near-duplicates removed. Returns (docs, relevance) in that order."""
+        if not docs:
+            return [], []
+        relevance  = self._relevance(docs)
+        similarity = _lexical_vectors([doc.page_content for doc in docs])
+        similarity = similarity @ similarity.T
+
+        remaining = list(range(len(docs)))
+        chosen    = []
+        while remaining:
+            if chosen:
+                redundancy = similarity[np.ix_(remaining, chosen)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+            mmr  = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(mmr))
+            index = remaining.pop(best)
+            if redundancy[best] < self.duplicate_threshold:
+                chosen.append(index)
+        return [docs[i] for i in chosen], [float(relevance[i]) for i in chosen]
+
+    def fit_memories(self, docs, budget):
+        selected, relevance = self.select_memories(docs)
+        tokens = [count_tokens(doc.page_content) + 2 for doc in selected]
+        keep   = list(range(len(selected)))
+        # Over budget: drop the lowest-scoring memories first
+        for i in sorted(keep, key=lambda i: relevance[i]):
+            if sum(tokens[j] for j in keep) <= budget:
+                break
+            keep.remove(i)
+        return [selected[i] for i in keep], sum(tokens[i] for i in keep), len(selected)
+
+    # ---------- prompt ----------
+    def build(self, query, history, docs):
+        """
+        Returns (history_text, context_text, stats) for the prompt. `stats`
+        holds the token counts that end up in the prompt and how many
+        memories were retrieved, de-duplicated and kept.
+        """
+        history_text, history_tokens = self.fit_history(history, int(self.max_tokens * self.history_share))
+        kept, memory_tokens, unique  = self.fit_memories(docs, self.max_tokens - history_tokens)
+        stats = {
+            "query_tokens":       count_tokens(query),
+            "history_tokens":     history_tokens,
+            "memory_tokens":      memory_tokens,
+            "memories_retrieved": len(docs),
+            "memories_unique":    unique,
+            "memories_kept":      len(kept),
+        }
+        stats["total_tokens"] = stats["query_tokens"] + history_tokens + memory_tokens
+        return history_text, format_memories(kept), stats
@@ -1,99 +1,185 @@
 import os
 import json
+import time
+import asyncio
 import logging
-from   langchain_huggingface            import HuggingFaceEmbeddings, HuggingFacePipeline
-from   langchain_community.vectorstores import FAISS
-from   langchain_core.prompts.chat      import ChatPromptTemplate
-from   langchain.chains.retrieval       import create_retrieval_chain
-from   langchain.docstore.document      import Document
-from   langchain.schema.document        import Document
-from   langchain_groq                   import ChatGroq
-from   langchain_weaviate.vectorstores  import WeaviateVectorStore
+import weakref
+from   concurrent.futures               import ThreadPoolExecutor
+from   automat_llm.memory               import ShardedConversationStore, format_conversation_history
+from   automat_llm.registry             import registry, DEFAULT_EMBEDDING_MODEL, DEFAULT_LLM_MODEL
+from   automat_llm.metrics              import LatencyHistogram, RequestTimer, StageMetrics, NULL_TIMER
+from   automat_llm.journal              import ConversationJournal, turn_record
+from   automat_llm.lexical              import LexicalIndex, HybridSearch
+from   automat_llm.corpus               import parse_corpus
+from   automat_llm.chain                import CybelRagChain
+from   automat_llm.etiquette            import Personality, as_matcher, dialogue_index, DEFAULT_APOLOGY_KEYWORDS, \
+                                               APOLOGY_PROMPTS, RUDE_PROMPTS, DEFAULT_APOLOGY_REPLY, DEFAULT_RUDE_REPLY
+from   automat_llm.interactions         import InteractionStore, SQLiteInteractionStore, apply_interaction, write_json_atomic
+
+# LangChain, Weaviate, FAISS and numpy are imported where they are first
+# used, so importing this module (and starting the API) stays fast.
 
 current_dir = os.getcwd()
 
-conversation_histories = {}  
+# "weaviate" (default) or "faiss" for the local on-disk index next to Input_JSON
+VECTOR_BACKEND  = os.environ.get("CYBEL_VECTOR_BACKEND", "weaviate")
+FAISS_INDEX_DIR = os.path.join(current_dir, "Faiss_Index")
+
+# The single-user CLI's id. Its memory search is not filtered by user, so it
+# keeps seeing conversations uploaded before memories were tagged per user.
+DEFAULT_USER_ID = "Automat-User-Id"
+
+# Bounded per-user history, sharded by user id so different users do not share
+# a lock; swap in a differently configured store (e.g. one with a SQLiteSpill
+# tier) through set_conversation_store().
+conversation_histories = ShardedConversationStore(shards=int(os.environ.get("CYBEL_HISTORY_SHARDS", 16)))
+
+def set_conversation_store(store):
+    """Replace the process-wide conversation history store"""
+    global conversation_histories
+    conversation_histories = store
 
 def get_conversation_history(user_id, max_messages=10):
     """Get the last N messages from conversation history"""
-    if user_id not in conversation_histories:
-        conversation_histories[user_id] = []
-    return conversation_histories[user_id][-max_messages:]
+    return conversation_histories.get(user_id, max_messages)
 
 def add_to_conversation_history(user_id, role, content):
     """Add a message to conversation history"""
-    if user_id not in conversation_histories:
-        conversation_histories[user_id] = []
-    conversation_histories[user_id].append({"role": role, "content": content})
-
-def format_conversation_history(history):
-    """Format conversation history as a readable string"""
-    formatted = []
-    for msg in history:
-        if msg["role"] == "user":
-            formatted.append(f"User: {msg['content']}")
-        else:
-            formatted.append(f"Cybel: {msg['content']}")
-    return "\n".join(formatted)
-
-
-def load_json_as_documents(client, directory):
-    documents = []
-    collection = client.collections.use("MyCollection") #TBA: use(f"{user_id}_Collection")
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            path = os.path.join(directory, filename)
-            with open(path, 'r', encoding='utf-8') as f:
-                try:
-                    raw_content = f.read()
-                    # Optionally, reformat it as pretty-printed JSON
-                    parsed = json.loads(raw_content)
-                    pretty_json = json.dumps(parsed, indent=2)
-                    documents.append(Document(page_content=pretty_json, metadata={"source": filename}))
-                except Exception as e:
-                    print(f"Skipping {filename} due to error: {e}")
-
-    # Extract list of 'Entry' strings if the JSON is a list of dicts
-    entries = [item['Entry'] for item in documents if 'Entry' in item]
-
-    with collection.batch.fixed_size(batch_size=200) as batch:
-        for d in entries:
-            print(d)
-            batch.add_object(
-                {
-                    "entry": d
-                }
-            )
+    conversation_histories.add(user_id, role, content)
+
+
+UPLOAD_BATCH_SIZE = 200
+
+def _load_manifest(manifest_file):
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest_file, manifest):
+    tmp_path = f"{manifest_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_file)
+
+def _entry_uuid(filename, entry):
+    """Deterministic object id, so re-uploading an unchanged entry is an upsert not a duplicate"""
+    from weaviate.util import generate_uuid5
+    return generate_uuid5(entry, filename)
+
+def load_json_as_documents(client, directory, manifest_file=None, workers=None):
+    """
+    Load every JSON file in `directory` as a Document and sync their 'Entry'
+    strings into MyCollection.
 
-            with open("uploaded_docs_log.json", "a", encoding="utf-8") as log_f:
-                log_f.write(json.dumps({
-                    "entry": d,
-                    "timestamp": time.time()
-                }) + "\n")
+    A manifest of path -> SHA-256 (plus the object ids each file produced) is
+    kept in `manifest_file`. Unchanged files are not uploaded again; changed
+    files only upsert their new entries and delete the ones that disappeared,
+    and entries of files that were removed are deleted.
+
+    Files are parsed by parse_corpus (a process pool for large corpora,
+    orjson when available) and documents keep the file text as-is.
+    """
+    from weaviate.classes.query     import Filter
+    from langchain_core.documents   import Document
+
+    manifest_file = manifest_file or f"{current_dir}/ingest_manifest.json"
+    manifest      = _load_manifest(manifest_file)
+    documents     = []
+    changed       = {}  # path -> (sha256, filename, {uuid: entry})
+
+    collection = client.collections.use("MyCollection")  # shared reference corpus; per-user memories live in SampleData
+    results, stats = parse_corpus(directory, workers)
+    print(f"Parsed {stats['files']} files ({stats['megabytes']} MB) in {stats['seconds']}s: "
+          f"{stats['files_per_s']} files/s, {stats['mb_per_s']} MB/s")
+
+    for path, digest, text, entries, error in results:
+        filename = os.path.basename(path)
+        if error:
+            print(f"Skipping {filename} due to error: {error}")
+            continue
+        documents.append(Document(page_content=text, metadata={"source": filename, "sha256": digest}))
+
+        if manifest.get(path, {}).get("sha256") == digest:
+            continue
+        changed[path] = (digest, filename, {_entry_uuid(filename, entry): entry for entry in entries})
+
+    removed = [path for path in manifest if path not in changed and not os.path.exists(path)]
+    if not changed and not removed:
+        print("Input_JSON unchanged, skipping upload.")
+        return documents
+
+    stale = [uuid for path in removed for uuid in manifest[path].get("uuids", [])]
+    for path, (_, _, objects) in changed.items():
+        stale.extend(uuid for uuid in manifest.get(path, {}).get("uuids", []) if uuid not in objects)
+    if stale:
+        collection.data.delete_many(where=Filter.by_id().contains_any(stale))
+        print(f"Removed {len(stale)} stale entries.")
+
+    uploaded, aborted = 0, False
+    with collection.batch.fixed_size(batch_size=UPLOAD_BATCH_SIZE) as batch, \
+         open("uploaded_docs_log.json", "a", encoding="utf-8") as log_f:
+        pending_log = []
+        for path, (_, filename, objects) in changed.items():
+            known = set(manifest.get(path, {}).get("uuids", []))
+            for uuid, entry in objects.items():
+                if uuid in known:
+                    continue
+                batch.add_object({"entry": entry}, uuid=uuid)
+                uploaded += 1
+                pending_log.append(json.dumps({"entry": entry, "timestamp": time.time()}))
+
+                # One buffered write per batch instead of reopening the log per entry
+                if len(pending_log) >= UPLOAD_BATCH_SIZE:
+                    log_f.write("\n".join(pending_log) + "\n")
+                    pending_log = []
 
             if batch.number_errors > 10:
                 print("Batch import stopped due to excessive errors.")
+                aborted = True
                 break
+        if pending_log:
+            log_f.write("\n".join(pending_log) + "\n")
 
     failed_objects = collection.batch.failed_objects
+    failed_uuids   = {str(obj.object_.uuid) for obj in failed_objects}
     if failed_objects:
         print(f"Number of failed imports: {len(failed_objects)}")
         print(f"First failed object: {failed_objects[0]}")
 
+    # Only record files that made it in completely; the rest are retried next startup
+    for path in removed:
+        manifest.pop(path, None)
+    for path, (digest, _, objects) in changed.items():
+        if not aborted and not failed_uuids.intersection(objects):
+            manifest[path] = {"sha256": digest, "uuids": sorted(objects)}
+    _save_manifest(manifest_file, manifest)
 
+    print(f"Uploaded {uploaded} new entries from {len(changed)} changed file(s).")
     return documents
 
-def init_interactions():
-    # Load or initialize user interactions
-    try:
-        user_interactions_file = f"{current_dir}/user_interactions.json"
-        with open(user_interactions_file, 'r', encoding='utf-8') as f:
-            user_interactions = json.load(f)
-            return user_interactions
-    except FileNotFoundError:
-        user_interactions = {"users": {}}
-        with open(user_interactions_file, 'w', encoding='utf-8') as f:
-            json.dump(user_interactions, f, indent=4)
+def init_interactions(backend=None):
+    """
+    Open the user interaction store (rudeness scores and pending apologies).
+
+    The default keeps interactions in memory and snapshots them to
+    user_interactions.json in the background; CYBEL_INTERACTIONS_BACKEND=sqlite
+    stores them in user_interactions.db instead (importing the JSON file the first time).
+    """
+    backend = backend or os.environ.get("CYBEL_INTERACTIONS_BACKEND", "json")
+    user_interactions_file = f"{current_dir}/user_interactions.json"
+
+    if backend == "sqlite":
+        db_file = f"{current_dir}/user_interactions.db"
+        is_new  = not os.path.exists(db_file)
+        store   = SQLiteInteractionStore(db_file)
+        if is_new and os.path.exists(user_interactions_file):
+            store.import_json(user_interactions_file)
+        return store
+
+    flush_interval = float(os.environ.get("CYBEL_INTERACTIONS_FLUSH", 5))
+    return InteractionStore(user_interactions_file, flush_interval=flush_interval).start()
 
 
 def load_personality_file():
@@ -101,7 +187,8 @@ def load_personality_file():
     try:
         personality_file = f"{current_dir}/robot_personality.json"
         with open(personality_file, 'r', encoding='utf-8') as f:
-            personality_data = json.load(f)
+            # Personality builds the example_dialogue index and keyword matchers once
+            personality_data = Personality(json.load(f))
             return personality_data
     except FileNotFoundError:
         print(f"Personality file not found at {personality_file}. Please create robot_personality.json.")
@@ -109,26 +196,135 @@ def load_personality_file():
         exit(1)
 
 
-def create_rag_chain(client, user_id, documents):
+def local_memory_store(embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """The shared local FAISS memory index used when CYBEL_VECTOR_BACKEND=faiss"""
+    from automat_llm.faiss_store import open_store
+    return open_store(FAISS_INDEX_DIR, registry.get_embeddings(embedding_model))
+
+def memory_scope(user_id):
+    """The user id long-term memory search is restricted to, or None for the unfiltered (single-user) scope"""
+    if user_id is None or user_id == DEFAULT_USER_ID:
+        return None
+    return user_id
+
+def _faiss_search(store):
+    """Vector search over a LocalFaissStore, returning Documents like the Weaviate store does"""
+    from langchain_core.documents import Document
+
+    def search(query, vector, k, user_id=None):
+        return [
+            Document(page_content=text, metadata={**metadata, "score": score})
+            for text, metadata, score in store.search_by_vector(vector, k, memory_scope(user_id))
+        ]
+    return search
+
+def _weaviate_search(vector_store):
+    """Hybrid search with a precomputed query vector, keeping Weaviate's score in the metadata"""
+    from langchain_core.documents import Document
+
+    def search(query, vector, k, user_id=None):
+        scope  = memory_scope(user_id)
+        kwargs = {}
+        if scope is not None:
+            from weaviate.classes.query import Filter
+            kwargs["filters"] = Filter.by_property("user_id").equal(scope)
+        try:
+            results = vector_store.similarity_search_with_score(query, k=k, vector=vector, **kwargs)
+        except Exception as e:
+            # A collection nothing per-user was ever stored in has no user_id property to filter on
+            if scope is not None and "no such prop" in str(e).lower():
+                return []
+            raise
+        return [Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score}) for doc, score in results]
+    return search
+
+def _ensure_user_property(client, collection):
+    """Add the `user_id` text property per-user memory search filters on, when the collection lacks it"""
+    try:
+        from weaviate.classes.config import Property, DataType
+
+        handle = client.collections.get(collection)
+        if not any(prop.name == "user_id" for prop in handle.config.get().properties):
+            handle.config.add_property(Property(name="user_id", data_type=DataType.TEXT))
+            logging.info(f"Added the user_id property to {collection}")
+    except Exception as e:
+        logging.warning(f"Could not check {collection} for a user_id property: {e}")
+
+# BM25 index over the same memories as the vector store, fused with vector
+# hits by reciprocal rank fusion (CYBEL_RETRIEVAL=vector turns it off).
+# Seeded from the store when the first chain is built, then kept current by
+# the ingestion worker.
+memory_index = None
+
+def _memory_texts(client, collection, backend, embedding_model):
+    """(text, metadata) of every memory already stored, to seed the lexical index"""
+    if backend == "faiss":
+        yield from local_memory_store(embedding_model).iter_docs()
+        return
+    for obj in client.collections.get(collection).iterator(return_properties=["text", "user_id"]):
+        if obj.properties.get("text"):
+            user_id = obj.properties.get("user_id")
+            yield obj.properties["text"], {"user_id": user_id} if user_id is not None else {}
+
+def _hybrid(search, client, collection, backend, embedding_model):
+    global memory_index
+    if os.environ.get("CYBEL_RETRIEVAL", "hybrid") == "vector":
+        return search
+    if memory_index is None:
+        start = time.perf_counter()
+        index = LexicalIndex()
+        index.add_many(_memory_texts(client, collection, backend, embedding_model))
+        memory_index = index
+        print(f"Indexed {len(index)} memories for keyword search in {time.perf_counter() - start:.1f}s")
+    return HybridSearch.from_env(search, memory_index, scope=memory_scope)
+
+def create_rag_chain(client, user_id, documents, collection="SampleData", k=10,
+                     embedding_model=DEFAULT_EMBEDDING_MODEL, llm_model=DEFAULT_LLM_MODEL, backend=None):
     """
     Create a RAG chain that searches the SampleData collection during active conversations.
     This allows the AI to retrieve past conversations and remember things like your name.
+
+    The chain is shared by all users; each turn's search is filtered to the
+    asking user's memories (see memory_scope), so `user_id` is not part of
+    the cache key.
+
+    Chains are cached in the process-wide model registry keyed by
+    (embedding model, LLM model, collection, k), so repeated calls for other
+    users or personalities reuse the loaded weights and the built chain.
+    `backend` picks Weaviate or the local FAISS index (CYBEL_VECTOR_BACKEND).
     """
-    from weaviate.classes.config import Configure
+    backend = backend or VECTOR_BACKEND
+    key = (embedding_model, llm_model, collection, k, backend, id(client))
+    return registry.get_chain(key, lambda: _build_rag_chain(client, collection, k, embedding_model, llm_model, backend))
+
+def _build_rag_chain(client, collection, k, embedding_model, llm_model, backend="weaviate"):
+    from langchain_core.prompts.chat import ChatPromptTemplate
+    from automat_llm.context         import ContextBuilder
+
     try:
         print("Step 1: Connecting to conversation memory...")
         
         # Use HuggingFace embeddings - same model used for storing conversations
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        embeddings = registry.get_embeddings(embedding_model)
         
-        # Connect to SampleData collection where conversation logs are already stored
-        # No need to upload anything - conversations are uploaded on shutdown
-        vector_store = WeaviateVectorStore(
-            client=client,
-            index_name="SampleData",
-            text_key="text",
-            embedding=embeddings
-        )
+        if backend == "faiss":
+            # Local memory-mapped index, filled by the same log uploader
+            search = _faiss_search(local_memory_store(embedding_model))
+        else:
+            # Connect to SampleData collection where conversation logs are already stored
+            # No need to upload anything - conversations are uploaded on shutdown
+            from langchain_weaviate.vectorstores import WeaviateVectorStore
+            vector_store = WeaviateVectorStore(
+                client=client,
+                index_name=collection,
+                text_key="text",
+                embedding=embeddings
+            )
+            _ensure_user_property(client, collection)
+            search = _weaviate_search(vector_store)
+
+        # Exact names and identifiers come from keyword search, fused with the vector hits
+        search = _hybrid(search, client, collection, backend, embedding_model)
         
         print("Step 2: Setting up the language model...")
        
@@ -154,22 +350,16 @@ def create_rag_chain(client, user_id, documents):
         ])
         
         
-        llm = ChatGroq(
-            temperature=0.5,
-            model="openai/gpt-oss-20b",
-            max_tokens=5000,
-            api_key=os.environ.get("GROQ_API_KEY")
-        )
+        llm = registry.get_llm(llm_model, temperature=0.5, max_tokens=5000)
 
         llm_chain = prompt | llm
         print("Language model set up.")
 
         # Create retrieval chain that searches SampleData collection
-        # k=10 means retrieve top 10 most relevant past conversations
-        rag_chain = create_retrieval_chain(
-            vector_store.as_retriever(search_kwargs={"k": 10}),
-            llm_chain
-        )
+        # k=10 (default) means retrieve top 10 most relevant past conversations.
+        # The query is embedded once and the vector reused for search and the response cache.
+        # History and memories are fitted into a token budget (CYBEL_CONTEXT_TOKENS) before the LLM call.
+        rag_chain = CybelRagChain(embeddings, search, llm_chain, k=k, context_builder=ContextBuilder())
         print("Cybel's memory is ready!")
         return rag_chain
 
@@ -181,93 +371,400 @@ def create_rag_chain(client, user_id, documents):
 
 # Function to update user interactions
 def update_user_interactions(user_id, user_interactions_file, user_interactions, is_rude=False, apologized=False):
-    if user_id not in user_interactions["users"]:
-        user_interactions["users"][user_id] = {"rudeness_score": 0, "requires_apology": False}
-    
-    user_data = user_interactions["users"][user_id]
-    if is_rude:
-        user_data["rudeness_score"] += 1
-        if user_data["rudeness_score"] >= 2:  # Threshold for requiring an apology
-            user_data["requires_apology"] = True
-    elif apologized:
-        user_data["rudeness_score"] = 0
-        user_data["requires_apology"] = False
-    
-    with open(user_interactions_file, 'w', encoding='utf-8') as f:
-        json.dump(user_interactions, f, indent=4)
-
-def generate_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain):
     """
-    Generate a response using the RetrievalQA chain with conversation history.
+    Record a rude message or an apology. Interaction stores persist it
+    themselves (write-behind); a plain dict is still rewritten to
+    `user_interactions_file` for older callers.
+    """
+    if not isinstance(user_interactions, dict):
+        return user_interactions.update(user_id, is_rude=is_rude, apologized=apologized)
 
-    Parameters:
-    - user_id (str): Identifier for the user.
-    - user_input (str): The user's input text.
+    user_data = user_interactions["users"].setdefault(user_id, {"rudeness_score": 0, "requires_apology": False})
+    apply_interaction(user_data, is_rude, apologized)
+    write_json_atomic(user_interactions_file, user_interactions)
+    return user_data
 
-    Returns:
-    - str: The AI-generated response.
+def _interaction_state(user_interactions, user_id):
+    if isinstance(user_interactions, dict):
+        return user_interactions["users"].get(user_id, {"rudeness_score": 0, "requires_apology": False})
+    return user_interactions.get_user(user_id)
+
+def _etiquette_reply(user_id, user_interactions, user_input, rude_keywords, personality_data):
+    """
+    Return a canned reply if the user owes an apology or is being rude, otherwise None.
+
+    `rude_keywords` may be a KeywordMatcher or a plain list (compiled once and
+    cached); canned replies come from the personality's example_dialogue index.
     """
-    input_lower = user_input.lower()
-    
+    dialogue = dialogue_index(personality_data)
+
     # Check if user requires an apology
-    user_data = user_interactions["users"].get(user_id, {"rudeness_score": 0, "requires_apology": False})
+    user_data = _interaction_state(user_interactions, user_id)
     if user_data.get("requires_apology", False):
-        if "sorry" in input_lower or "apologize" in input_lower:
+        apology = getattr(personality_data, "apology", None)
+        if user_input in (apology if apology is not None else as_matcher(DEFAULT_APOLOGY_KEYWORDS)):
             update_user_interactions(user_id, user_interactions_file=f"{current_dir}/user_interactions.json", 
                                    user_interactions=user_interactions, apologized=True)
-            return next(item['response'] for item in personality_data['example_dialogue'] if item['user'].lower() == "i'm sorry for being rude.")
+            return dialogue.first(APOLOGY_PROMPTS, DEFAULT_APOLOGY_REPLY)
         return "I'm waiting for an apology, sweetie. I don't respond to rudeness without respect."
 
     # Check for rudeness
-    is_rude = any(keyword in input_lower for keyword in rude_keywords)
-    if is_rude:
+    if user_input in as_matcher(rude_keywords):
         update_user_interactions(user_id, user_interactions_file=f"{current_dir}/user_interactions.json",
                                user_interactions=user_interactions, is_rude=True)
-        return next(
-            item['response']
-            for item in personality_data['example_dialogue']
-            if item['user'].lower() == "just do what i say, you stupid robot!"
-        )
+        return dialogue.first(RUDE_PROMPTS, DEFAULT_RUDE_REPLY)
+    return None
 
-    try:
-      
-        add_to_conversation_history(user_id, "user", user_input)
-        history = get_conversation_history(user_id, max_messages=8)  # Last 8 messages (4 exchanges)
-        formatted_history = format_conversation_history(history[:-1])  # Exclude current message from history display
-        
-        
-        result = rag_chain.invoke({
-            "input": user_input,
-            "conversation_history": formatted_history  # Pass current conversation
-        })
-  
-        answer = result.get("answer") or result.get("result")
-        if hasattr(answer, "content"):
-            response = answer.content
-        else:
-            response = str(answer)
+def _extract_answer(result):
+    answer = result.get("answer") or result.get("result")
+    if hasattr(answer, "content"):
+        return answer.content
+    return str(answer)
 
+# Structured record of every turn (see automat_llm.journal); opened by init_journal()
+conversation_journal = None
 
-        
+def set_conversation_journal(journal):
+    """Use `journal` (a ConversationJournal, or None to stop recording turns)."""
+    global conversation_journal
+    conversation_journal = journal
+
+def init_journal(path=None):
+    """
+    Open the conversation journal Logs/conversations.jsonl (or CYBEL_JOURNAL)
+    and start its background writer. Ingestion and analytics read it directly.
+    """
+    journal = ConversationJournal.from_env(path or f"{current_dir}/Logs/conversations.jsonl").start()
+    set_conversation_journal(journal)
+    return journal
+
+def _log_turn(user_id, user_input, response, result, timer=NULL_TIMER, cached=False):
+    # Queued for the journal's writer thread, so this never waits on the disk
+    if conversation_journal is None:
+        return
+    conversation_journal.record(
+        turn_record(user_id, user_input, response, result.get("context", []), timer.breakdown(), cached)
+    )
+
+# Opt-in semantic cache of answers (CYBEL_RESPONSE_CACHE=1); None when disabled.
+# Only imported when enabled since it pulls in numpy.
+response_cache = None
+if os.environ.get("CYBEL_RESPONSE_CACHE", "0").lower() in ("1", "true", "yes", "on"):
+    from automat_llm.response_cache import SemanticResponseCache
+    response_cache = SemanticResponseCache.from_env()
+
+def set_response_cache(cache):
+    """Replace (or with None, disable) the process-wide response cache"""
+    global response_cache
+    response_cache = cache
+
+def response_cache_stats():
+    """Hit rate and time saved by the response cache, for /health"""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+def _turn_inputs(user_id, user_input, retrieval_options=None):
+    add_to_conversation_history(user_id, "user", user_input)
+    # Last 8 messages (4 exchanges), excluding the current message from history display
+    inputs = {
+        "input": user_input,
+        "user_id": user_id,
+        "conversation_history": conversation_histories.format(user_id, max_messages=8, exclude_last=True)
+    }
+    if retrieval_options:
+        inputs["retrieval"] = retrieval_options  # per-query search settings, see lexical.HybridSearch
+    return inputs
+
+def _cache_probe(user_id, inputs, retrieval, timer):
+    """Look the turn up in the response cache once retrieval has run. Returns (context key, cached answer)."""
+    if retrieval is None:
+        return None, None
+    with timer.span("cache"):
+        key = response_cache.context_key(retrieval.docs)
+        return key, response_cache.get(user_id, retrieval.vector, key)
+
+def _cache_store(user_id, retrieval, key, response, seconds):
+    if retrieval is not None and response_cache is not None and response:
+        response_cache.put(user_id, retrieval.vector, key, response, seconds)
+
+def _caching(rag_chain):
+    # Only CybelRagChain lets us see the retrieved context before the LLM runs
+    return response_cache is not None and isinstance(rag_chain, CybelRagChain)
+
+# Where each chat request spends its time (history, embedding, vector_search,
+# context, llm, postprocess, logging, ...), exported on /metrics
+request_stages = StageMetrics()
+
+def _invoke(rag_chain, inputs, retrieval, timer):
+    if isinstance(rag_chain, CybelRagChain):
+        return rag_chain.invoke(inputs, retrieval, timer)
+    with timer.span("chain"):  # other chains are timed as a whole
+        return rag_chain.invoke(inputs)
+
+async def _ainvoke(rag_chain, inputs, retrieval, timer):
+    if isinstance(rag_chain, CybelRagChain):
+        return await rag_chain.ainvoke(inputs, retrieval, timer)
+    with timer.span("chain"):
+        return await rag_chain.ainvoke(inputs)
+
+def _retrieve(rag_chain, inputs, timer):
+    return rag_chain.retrieve(inputs, timer) if _caching(rag_chain) else None
+
+async def _aretrieve(rag_chain, inputs, timer):
+    return await rag_chain.aretrieve(inputs, timer) if _caching(rag_chain) else None
+
+def generate_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer=None,
+                      retrieval_options=None):
+    """
+    Generate a response using the RetrievalQA chain with conversation history.
 
-        add_to_conversation_history(user_id, "assistant", response)
+    With the response cache enabled, retrieval runs first and a cached answer
+    to a near-identical question grounded in the same memories skips the LLM call.
 
+    Parameters:
+    - user_id (str): Identifier for the user.
+    - user_input (str): The user's input text.
+    - timer (RequestTimer | None): Pass one to read this request's stage timings afterwards.
+    - retrieval_options (dict | None): Per-query memory search settings (mode, k, rrf_k, weights; see lexical.HybridSearch).
 
+    Returns:
+    - str: The AI-generated response.
+    """
+    timer = timer or RequestTimer()
+    try:
+        with timer.span("etiquette"):
+            canned = _etiquette_reply(user_id, user_interactions, user_input, rude_keywords, personality_data)
+        if canned is not None:
+            return canned
+
+        with timer.span("history"):
+            inputs = _turn_inputs(user_id, user_input, retrieval_options)
+        retrieval = _retrieve(rag_chain, inputs, timer)
+        key, cached = _cache_probe(user_id, inputs, retrieval, timer)
+
+        if cached is not None:
+            response, result = cached, {"context": retrieval.docs}
+        else:
+            start  = time.perf_counter()
+            result = _invoke(rag_chain, inputs, retrieval, timer)
+            with timer.span("postprocess"):
+                response = _extract_answer(result)
+                _cache_store(user_id, retrieval, key, response, time.perf_counter() - start)
+
+        with timer.span("postprocess"):
+            add_to_conversation_history(user_id, "assistant", response)
+        with timer.span("logging"):
+            _log_turn(user_id, user_input, response, result, timer, cached is not None)
+        return response
 
-        logging.info(f"User: {user_input}")
-        logging.info(f"Bot: {response}")
-        logging.info("Retrieved Memories:")
+    except Exception as e:
+        print(f"Error generating response: {e}")
+        logging.error(f"Error generating response: {e}", exc_info=True)
+        return "I'm sorry, I couldn't process your request."
+    finally:
+        request_stages.record(timer)
+
+# Locks serialising history updates per user; entries disappear once no
+# request for that user holds a reference to the lock.
+_user_locks = weakref.WeakValueDictionary()
+
+def _user_lock(user_id):
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+def install_executor(loop=None, max_workers=None):
+    """
+    Bound the thread pool the event loop uses for blocking work.
 
+    LangChain runs sync-only steps such as HuggingFace embeddings and the
+    Weaviate search through the loop's default executor inside `ainvoke`, so
+    capping it keeps CPU-bound embedding work from spawning a thread per request.
+    """
+    loop        = loop or asyncio.get_running_loop()
+    max_workers = max_workers or int(os.environ.get("CYBEL_EMBED_WORKERS", 4))
+    executor    = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cybel-embed")
+    loop.set_default_executor(executor)
+    return executor
+
+async def agenerate_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer=None,
+                             retrieval_options=None):
+    """
+    Coroutine variant of generate_response for async servers.
 
-        docs = result.get("context", [])
-        for doc in docs:
-            page_info = doc.metadata.get("page") or doc.metadata.get("source") or "past conversation"
-            logging.info(f"- [{page_info}] {doc.page_content[:200]}")  # first 200 chars
+    Retrieval and the LLM call run through `rag_chain.ainvoke`, so the event
+    loop stays free while Groq generates. Requests for the same user are
+    serialised so their history stays in order; different users run
+    concurrently. Time spent waiting for that is the "user_lock" stage.
+    """
+    timer = timer or RequestTimer()
+    try:
+        with timer.span("etiquette"):
+            canned = _etiquette_reply(user_id, user_interactions, user_input, rude_keywords, personality_data)
+        if canned is not None:
+            return canned
+
+        lock = _user_lock(user_id)
+        with timer.span("user_lock"):
+            await lock.acquire()
+        try:
+            with timer.span("history"):
+                inputs = _turn_inputs(user_id, user_input, retrieval_options)
+            retrieval = await _aretrieve(rag_chain, inputs, timer)
+            key, cached = _cache_probe(user_id, inputs, retrieval, timer)
+
+            if cached is not None:
+                response, result = cached, {"context": retrieval.docs}
+            else:
+                start  = time.perf_counter()
+                result = await _ainvoke(rag_chain, inputs, retrieval, timer)
+                with timer.span("postprocess"):
+                    response = _extract_answer(result)
+                    _cache_store(user_id, retrieval, key, response, time.perf_counter() - start)
+
+            with timer.span("postprocess"):
+                add_to_conversation_history(user_id, "assistant", response)
+            with timer.span("logging"):
+                _log_turn(user_id, user_input, response, result, timer, cached is not None)
+            return response
+        finally:
+            lock.release()
 
-        logging.info("")
-        return response
+    except Exception as e:
+        print(f"Error generating response: {e}")
+        logging.error(f"Error generating response: {e}", exc_info=True)
+        return "I'm sorry, I couldn't process your request."
+    finally:
+        request_stages.record(timer)
+
+# Time from request to the first streamed token, reported by the API
+time_to_first_token = LatencyHistogram()
+
+def _chunk_text(chunk):
+    """Pull the answer text out of one chunk of a retrieval chain stream."""
+    answer = chunk.get("answer")
+    if answer is None:
+        return ""
+    return answer.content if hasattr(answer, "content") else str(answer)
+
+def _finish_stream(user_id, user_input, parts, context, timer, cached=None):
+    """Record a streamed turn, including a partial one if the client went away."""
+    response = "".join(parts)
+    if response:
+        with timer.span("postprocess"):
+            add_to_conversation_history(user_id, "assistant", response)
+        with timer.span("logging"):
+            _log_turn(user_id, user_input, response, {"context": context}, timer, cached is not None)
+    request_stages.record(timer)
+
+def _stream_chunks(rag_chain, inputs, retrieval, timer):
+    if isinstance(rag_chain, CybelRagChain):
+        return rag_chain.stream(inputs, retrieval, timer)
+    return rag_chain.stream(inputs)
+
+def _astream_chunks(rag_chain, inputs, retrieval, timer):
+    if isinstance(rag_chain, CybelRagChain):
+        return rag_chain.astream(inputs, retrieval, timer)
+    return rag_chain.astream(inputs)
+
+def stream_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer=None,
+                    retrieval_options=None):
+    """
+    Generate a response like generate_response, yielding text as it is produced.
 
+    Retrieved memories arrive from `rag_chain.stream` before the first answer
+    token; the finished turn is appended to the conversation history and the
+    conversation journal once the stream ends. A response cache hit is yielded in one piece.
+    Stage timings go to `timer` like generate_response's, once the stream ends.
+    """
+    timer = timer or RequestTimer()
+    with timer.span("etiquette"):
+        canned = _etiquette_reply(user_id, user_interactions, user_input, rude_keywords, personality_data)
+    if canned is not None:
+        request_stages.record(timer)
+        yield canned
+        return
+
+    start, parts, context, cached = time.perf_counter(), [], [], None
+    try:
+        with timer.span("history"):
+            inputs = _turn_inputs(user_id, user_input, retrieval_options)
+        retrieval = _retrieve(rag_chain, inputs, timer)
+        key, cached = _cache_probe(user_id, inputs, retrieval, timer)
+        if cached is not None:
+            context = retrieval.docs
+            time_to_first_token.observe(time.perf_counter() - start)
+            parts.append(cached)
+            yield cached
+            return
+
+        llm_start = time.perf_counter()
+        for chunk in _stream_chunks(rag_chain, inputs, retrieval, timer):
+            context = chunk.get("context", context)
+            text    = _chunk_text(chunk)
+            if text:
+                if not parts:
+                    time_to_first_token.observe(time.perf_counter() - start)
+                parts.append(text)
+                yield text
+        with timer.span("postprocess"):
+            _cache_store(user_id, retrieval, key, "".join(parts), time.perf_counter() - llm_start)
+    except Exception as e:
+        print(f"Error generating response: {e}")
+        logging.error(f"Error generating response: {e}", exc_info=True)
+        if not parts:
+            yield "I'm sorry, I couldn't process your request."
+    finally:
+        _finish_stream(user_id, user_input, parts, context, timer, cached)
+
+async def astream_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer=None,
+                           retrieval_options=None):
+    """Async variant of stream_response built on `rag_chain.astream`."""
+    timer = timer or RequestTimer()
+    with timer.span("etiquette"):
+        canned = _etiquette_reply(user_id, user_interactions, user_input, rude_keywords, personality_data)
+    if canned is not None:
+        request_stages.record(timer)
+        yield canned
+        return
+
+    lock = _user_lock(user_id)
+    with timer.span("user_lock"):
+        await lock.acquire()
+    start, parts, context, cached = time.perf_counter(), [], [], None
+    try:
+        with timer.span("history"):
+            inputs = _turn_inputs(user_id, user_input, retrieval_options)
+        retrieval = await _aretrieve(rag_chain, inputs, timer)
+        key, cached = _cache_probe(user_id, inputs, retrieval, timer)
+        if cached is not None:
+            context = retrieval.docs
+            time_to_first_token.observe(time.perf_counter() - start)
+            parts.append(cached)
+            yield cached
+            return
+
+        llm_start = time.perf_counter()
+        async for chunk in _astream_chunks(rag_chain, inputs, retrieval, timer):
+            context = chunk.get("context", context)
+            text    = _chunk_text(chunk)
+            if text:
+                if not parts:
+                    time_to_first_token.observe(time.perf_counter() - start)
+                parts.append(text)
+                yield text
+        with timer.span("postprocess"):
+            _cache_store(user_id, retrieval, key, "".join(parts), time.perf_counter() - llm_start)
     except Exception as e:
         print(f"Error generating response: {e}")
         logging.error(f"Error generating response: {e}", exc_info=True)
-        return "I'm sorry, I couldn't process your request."
\ No newline at end of file
+        if not parts:
+            yield "I'm sorry, I couldn't process your request."
+    finally:
+        try:
+            _finish_stream(user_id, user_input, parts, context, timer, cached)
+        finally:
+            lock.release()
@@ -0,0 +1,132 @@
+"""
+On-disk embedding cache shared by PythonBuild/backend (automat_llm.embedding_service)
+and JSBuild/src/python (embedder), so both trees read and write one format.
+
+The two copies of this file are identical; neither tree can import the
+other, so change them together. Only the standard library and numpy are
+used here.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+KEY_BYTES     = 20  # sha1 of the text
+KEYS_FILE     = "keys.bin"
+VECTORS_FILE  = "vectors.f16"
+META_FILE     = "meta.json"
+
+
+def content_key(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def model_slug(model_name):
+    """Directory name for a model's cache; "sentence-transformers/x" and "x" share one."""
+    name = model_name.split("/", 1)[1] if model_name.startswith("sentence-transformers/") else model_name
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def cached_dim(directory):
+    """Embedding size of the cache in `directory`, or None if there is none yet (read without the model)."""
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f)["dim"]
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by content hash.
+
+    Vectors are rows of a float16 matrix memory-mapped from `vectors.f16`, so
+    opening the cache reads nothing but the keys and lookups only touch the
+    pages they need. `keys.bin` holds one 20-byte SHA-1 per row, in row
+    order. A row is written and flushed before its key is appended, so a
+    crash can leave an unused row but never a key pointing at garbage.
+    The matrix grows by doubling. One EmbeddingCache (in one process) may
+    write a directory at a time.
+
+    Parameters:
+    - directory (str): Where the cache files live (one directory per model).
+    - dim (int): Embedding size; a cache built for another size is an error.
+    """
+
+    def __init__(self, directory, dim, initial_rows=1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dim       = dim
+        self._lock     = threading.Lock()
+
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["dim"] != dim:
+                raise ValueError(f"Embedding cache {directory} holds {meta['dim']}-d vectors, not {dim}-d")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "dtype": "float16"}, f)
+
+        keys_path = os.path.join(directory, KEYS_FILE)
+        with open(keys_path, "ab+") as f:
+            f.seek(0)
+            raw = f.read()
+        raw        = raw[:len(raw) - len(raw) % KEY_BYTES]  # drop a torn trailing key
+        self._rows = {raw[i:i + KEY_BYTES]: i // KEY_BYTES for i in range(0, len(raw), KEY_BYTES)}
+        self._keys = open(keys_path, "ab")
+        if self._keys.tell() != len(raw):
+            self._keys.truncate(len(raw))
+
+        self._path   = os.path.join(directory, VECTORS_FILE)
+        rows         = max(initial_rows, len(self._rows))
+        current_rows = os.path.getsize(self._path) // (2 * dim) if os.path.exists(self._path) else 0
+        self._matrix = self._map(max(rows, current_rows))
+
+    def _map(self, rows):
+        """(Re)map the matrix file with room for `rows` rows, extending the file if needed."""
+        size = rows * self.dim * 2
+        with open(self._path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(self._path, dtype=np.float16, mode="r+", shape=(rows, self.dim))
+
+    def get_many(self, keys):
+        """{index into keys: float32 vector} for the keys that are cached."""
+        with self._lock:
+            rows = {i: self._rows[key] for i, key in enumerate(keys) if key in self._rows}
+            if not rows:
+                return {}
+            block = self._matrix[list(rows.values())].astype(np.float32)
+        return {i: block[n] for n, i in enumerate(rows)}
+
+    def put_many(self, keys, vectors):
+        """Store vectors (one row each) for keys not cached yet."""
+        vectors = np.asarray(vectors)
+        with self._lock:
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+            if not new:
+                return 0
+            start = len(self._rows)
+            if start + len(new) > self._matrix.shape[0]:
+                self._matrix.flush()
+                self._matrix = self._map(max(2 * self._matrix.shape[0], start + len(new)))
+            self._matrix[start:start + len(new)] = np.stack([vector for _, vector in new]).astype(np.float16)
+            self._matrix.flush()
+            self._keys.write(b"".join(key for key, _ in new))
+            self._keys.flush()
+            for offset, (key, _) in enumerate(new):
+                self._rows[key] = start + offset
+            return len(new)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def close(self):
+        with self._lock:
+            self._matrix.flush()
+            self._keys.close()
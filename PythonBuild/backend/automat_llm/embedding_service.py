@@ -0,0 +1,228 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+import numpy as np
+
+from   automat_llm.embedding_cache import EmbeddingCache, cached_dim, content_key, model_slug
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class _Request:
+    __slots__ = ("texts", "vectors", "error", "done")
+
+    def __init__(self, texts):
+        self.texts   = texts
+        self.vectors = None
+        self.error   = None
+        self.done    = threading.Event()
+
+
+class EmbeddingService:
+    """
+    One embedding model shared by every caller in the process.
+
+    Texts whose embedding is already in the on-disk cache are answered from
+    it. The rest are queued; a single worker thread gathers queued requests
+    from all callers for up to `max_wait_ms` (or until `max_batch` texts are
+    waiting), encodes the distinct texts in one model call and hands every
+    caller its rows. embed() returns float32 numpy arrays.
+
+    Works as a LangChain embeddings object (`embed_query` /
+    `embed_documents`), so the RAG chain, the FAISS store and Weaviate use it
+    directly; embed_documents returns a list of rows, as that interface
+    expects (LangChain stores test `if embeddings`, which an array fails).
+
+    Parameters:
+    - model_name (str): SentenceTransformer model to load on first use.
+    - cache_dir (str | None): Root of the on-disk cache; None disables it.
+    - encoder (callable | None): `encoder(list_of_texts) -> 2-D array`, used
+      instead of loading SentenceTransformer (e.g. for a stand-in model).
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache_dir=None, max_batch=64, max_wait_ms=5.0, encoder=None):
+        self.model_name  = model_name
+        self.cache_dir   = cache_dir
+        self.max_batch   = max_batch
+        self.max_wait    = max_wait_ms / 1000
+        self._encoder    = encoder
+        self._model      = None
+        self._cache      = None
+        self._dim        = None
+        self._init_lock  = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queue      = queue.Queue()
+        self._worker     = None
+
+        self.requests       = 0
+        self.texts          = 0
+        self.cache_hits     = 0
+        self.batches        = 0
+        self.encoded        = 0
+        self.encode_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, model_name=DEFAULT_MODEL):
+        """Cache under CYBEL_EMBEDDING_CACHE (default ./Embedding_Cache, empty to disable), batching per CYBEL_EMBED_BATCH / CYBEL_EMBED_WAIT_MS."""
+        cache_dir = os.environ.get("CYBEL_EMBEDDING_CACHE", os.path.join(os.getcwd(), "Embedding_Cache"))
+        return cls(
+            model_name,
+            cache_dir=cache_dir or None,
+            max_batch=int(os.environ.get("CYBEL_EMBED_BATCH", 64)),
+            max_wait_ms=float(os.environ.get("CYBEL_EMBED_WAIT_MS", 5)),
+        )
+
+    # ---------- model ----------
+    def load(self):
+        """Load the model (once) and open its cache; called on first use if not before."""
+        if self._encoder is not None or self._model is not None:
+            return self
+        with self._init_lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise ImportError("EmbeddingService needs sentence-transformers (pip install sentence-transformers).") from e
+                model = SentenceTransformer(self.model_name)
+                self._open_cache(model.get_sentence_embedding_dimension())
+                self._model = model
+        return self
+
+    def _encode(self, texts):
+        if self._encoder is not None:
+            return np.asarray(self._encoder(texts), dtype=np.float32)
+        self.load()
+        return self._model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True).astype(np.float32, copy=False)
+
+    def _ensure_started(self):
+        if self._worker is not None:
+            return
+        with self._init_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="cybel-embed-batcher", daemon=True)
+                self._worker.start()
+
+    def _open_cache(self, dim):
+        # Callers hold _init_lock, so only one EmbeddingCache ever appends to the files.
+        # _dim is set last: embed() skips probing for the cache once it is set.
+        dim = self._dim or dim
+        if self.cache_dir is not None and self._cache is None:
+            self._cache = EmbeddingCache(os.path.join(self.cache_dir, model_slug(self.model_name)), dim)
+        self._dim = dim
+
+    # ---------- batching ----------
+    def _run(self):
+        while True:
+            batch  = [self._queue.get()]
+            count  = len(batch[0].texts)
+            expiry = time.perf_counter() + self.max_wait
+            while count < self.max_batch:
+                remaining = expiry - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                count += len(request.texts)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        unique = list(dict.fromkeys(text for request in batch for text in request.texts))
+        try:
+            start   = time.perf_counter()
+            vectors = np.concatenate([self._encode(unique[i:i + self.max_batch]) for i in range(0, len(unique), self.max_batch)])
+            with self._stats_lock:
+                self.encode_seconds += time.perf_counter() - start
+                self.batches        += 1
+                self.encoded        += len(unique)
+            if self._dim is None:
+                with self._init_lock:
+                    self._open_cache(vectors.shape[1])
+            if self._cache is not None:
+                self._cache.put_many([content_key(text) for text in unique], vectors)
+            rows = {text: i for i, text in enumerate(unique)}
+            for request in batch:
+                request.vectors = vectors[[rows[text] for text in request.texts]]
+        except Exception as e:
+            logging.error(f"Embedding batch of {len(unique)} texts failed: {e}")
+            for request in batch:
+                request.error = e
+        for request in batch:
+            request.done.set()
+
+    # ---------- public API ----------
+    def embed(self, texts):
+        """Embeddings of `texts` as an (n, dim) float32 array."""
+        texts = list(texts)
+        with self._stats_lock:
+            self.requests += 1
+            self.texts    += len(texts)
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+
+        cached = {}
+        if self._cache is None and self._dim is None and self.cache_dir is not None:
+            self._probe_cache()
+        if self._cache is not None:
+            cached = self._cache.get_many([content_key(text) for text in texts])
+            with self._stats_lock:
+                self.cache_hits += len(cached)
+        missing = [text for i, text in enumerate(texts) if i not in cached]
+        if not missing:
+            return np.stack([cached[i] for i in range(len(texts))])
+
+        self._ensure_started()
+        request = _Request(missing)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+
+        result = np.empty((len(texts), request.vectors.shape[1]), dtype=np.float32)
+        fresh  = iter(request.vectors)
+        for i in range(len(texts)):
+            result[i] = cached[i] if i in cached else next(fresh)
+        return result
+
+    def _probe_cache(self):
+        """Open an existing cache before the model is loaded, so a warm cache never loads it."""
+        dim = cached_dim(os.path.join(self.cache_dir, model_slug(self.model_name)))
+        if dim is not None:
+            with self._init_lock:
+                self._open_cache(dim)
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+    def embed_documents(self, texts):
+        return list(self.embed(texts))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model":          self.model_name,
+                "requests":       self.requests,
+                "texts":          self.texts,
+                "cache_hits":     self.cache_hits,
+                "cached_vectors": len(self._cache) if self._cache is not None else 0,
+                "batches":        self.batches,
+                "mean_batch":     round(self.encoded / self.batches, 1) if self.batches else 0.0,
+                "encode_ms":      round(self.encode_seconds * 1000, 1),
+            }
+
+
+_services      = {}
+_services_lock = threading.Lock()
+
+def get_service(model_name=DEFAULT_MODEL):
+    """The process-wide EmbeddingService for `model_name` (configured from the environment)."""
+    key = model_slug(model_name)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = EmbeddingService.from_env(model_name)
+            _services[key] = service
+        return service
@@ -0,0 +1,126 @@
+import re
+import functools
+
+DEFAULT_RUDE_KEYWORDS    = ("stupid", "idiot", "shut up", "useless", "dumb")
+DEFAULT_APOLOGY_KEYWORDS = ("sorry", "apologize", "apologise", "apologized", "apologised", "apologies")
+
+# example_dialogue prompts whose responses are the canned replies, most specific first
+APOLOGY_PROMPTS = ("i'm sorry for being rude", "sorry for being rude")
+RUDE_PROMPTS    = ("just do what i say, you stupid robot", "do what i say, robot")
+
+DEFAULT_APOLOGY_REPLY = "Apology accepted. Let's start over."
+DEFAULT_RUDE_REPLY    = "Careful. I help people who talk to me with respect."
+
+
+def _trie_pattern(words):
+    """
+    Regex source matching any of `words`, factored as a trie so matching
+    cost depends on keyword length rather than how many keywords there are.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of a keyword
+
+    def build(node):
+        ends     = "" in node
+        branches = [(r"\s+" if ch == " " else re.escape(ch)) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if ends else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive whole-word matcher for a list of keywords or phrases,
+    compiled once into a single regex. "dumb" matches "so dumb!" but not
+    "dumbbell", and multi-word phrases tolerate extra whitespace.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(sorted({" ".join(k.lower().split()) for k in keywords if k and k.strip()}))
+        if self.keywords:
+            self._regex = re.compile(r"(?<!\w)(?:" + _trie_pattern(self.keywords) + r")(?!\w)", re.IGNORECASE)
+        else:
+            self._regex = None
+
+    def search(self, text):
+        """Return the first keyword found in `text`, or None."""
+        if self._regex is None:
+            return None
+        match = self._regex.search(text)
+        return " ".join(match.group(0).lower().split()) if match else None
+
+    def __contains__(self, text):
+        return self.search(text) is not None
+
+    def __len__(self):
+        return len(self.keywords)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+def as_matcher(keywords):
+    """Accept a KeywordMatcher or a plain keyword list (compiled once and cached)."""
+    if isinstance(keywords, KeywordMatcher):
+        return keywords
+    return _cached_matcher(tuple(keywords))
+
+
+def normalise_prompt(text):
+    """Key for example_dialogue lookups: case, curly quotes, spacing and end punctuation ignored."""
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    return " ".join(text.split()).rstrip(".!?… ")
+
+
+class DialogueIndex:
+    """Dict index over a personality's example_dialogue: normalised user line -> response."""
+
+    def __init__(self, example_dialogue):
+        self._responses = {}
+        for item in example_dialogue or ():
+            self._responses.setdefault(normalise_prompt(item["user"]), item["response"])
+
+    def response(self, user_line, default=None):
+        return self._responses.get(normalise_prompt(user_line), default)
+
+    def first(self, user_lines, default=None):
+        """Response for the first of `user_lines` the personality has an example for."""
+        for user_line in user_lines:
+            response = self._responses.get(normalise_prompt(user_line))
+            if response is not None:
+                return response
+        return default
+
+    def __len__(self):
+        return len(self._responses)
+
+
+class Personality(dict):
+    """
+    A loaded personality file: still the plain dict everything indexes into,
+    plus the lookups built once at load time — `dialogue` (DialogueIndex) and
+    the `rude` / `apology` keyword matchers, configurable through optional
+    "rude_keywords" / "apology_keywords" lists in the file.
+    """
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.dialogue = DialogueIndex(self.get("example_dialogue"))
+        self.rude     = KeywordMatcher(self.get("rude_keywords", DEFAULT_RUDE_KEYWORDS))
+        self.apology  = KeywordMatcher(self.get("apology_keywords", DEFAULT_APOLOGY_KEYWORDS))
+
+
+def dialogue_index(personality_data):
+    """The personality's DialogueIndex, built on the spot for plain dicts."""
+    index = getattr(personality_data, "dialogue", None)
+    return index if index is not None else DialogueIndex(personality_data.get("example_dialogue"))
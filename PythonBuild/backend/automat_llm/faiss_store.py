@@ -0,0 +1,285 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # only needed when the local backend is selected
+    faiss = None
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE  = "docs.db"
+SQL_CHUNK  = 500  # ids per "IN (...)" query, well under SQLite's variable limit
+
+# Zero-copy mapping of flat vector codes needs IO_FLAG_MMAP_IFC (faiss >= 1.8);
+# older releases only honour IO_FLAG_MMAP for inverted lists.
+MMAP_FLAGS = (getattr(faiss, "IO_FLAG_MMAP_IFC", 0) or faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY if faiss else 0
+
+
+def text_id(text, user_id=None):
+    """Deterministic 63-bit id for a memory, so re-adding the same text (for the same user) is a no-op."""
+    key = text if user_id is None else f"{user_id}\x00{text}"
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+
+class _FaissBatch:
+    """
+    Minimal stand-in for a Weaviate collection batch so the log uploader can
+    write to the local index through the same `batch.fixed_size()` calls.
+    """
+
+    def __init__(self, store):
+        self.store          = store
+        self.failed_objects = []
+        self._texts         = []
+        self._metadatas     = []
+        self._batch_size    = 100
+
+    def fixed_size(self, batch_size=100):
+        self._batch_size = batch_size
+        return self
+
+    dynamic = fixed_size
+
+    def __enter__(self):
+        self.failed_objects = []
+        return self
+
+    def add_object(self, properties, **kwargs):
+        metadata = properties.get("metadata") or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        if properties.get("user_id") is not None:
+            metadata = {**metadata, "user_id": properties["user_id"]}
+        self._texts.append(properties["text"])
+        self._metadatas.append(metadata)
+        if len(self._texts) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._texts:
+            try:
+                self.store.add_texts(self._texts, self._metadatas)
+            except Exception as e:
+                self.failed_objects.extend({"text": text, "error": str(e)} for text in self._texts)
+            self._texts, self._metadatas = [], []
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        self.store.save()
+        return False
+
+
+class LocalFaissStore:
+    """
+    On-disk FAISS index of Cybel's long-term memory.
+
+    Vectors live in `<index_dir>/index.faiss` (an ID-mapped inner-product
+    index over normalised embeddings, i.e. cosine similarity) and the memory
+    text in a SQLite side table, so neither has to be parsed on startup. The
+    index is memory-mapped read-only when it is opened and only copied into
+    RAM the first time something is added or removed. Memory text is
+    committed as it is added, but the index is only written by save(); on
+    open, memories whose vectors never reached the index (a crash in
+    between) are embedded again.
+
+    Memories whose metadata has a "user_id" are owned by that user, and
+    `search_by_vector(..., user_id=...)` only considers that user's ids.
+
+    Parameters:
+    - index_dir (str): Directory holding the index and document files.
+    - embeddings: Any object with `embed_documents` / `embed_query`.
+    - mmap (bool): Memory-map the index on load instead of reading it.
+    """
+
+    def __init__(self, index_dir, embeddings, mmap=True):
+        if faiss is None:
+            raise ImportError("The local vector backend needs faiss-cpu (pip install faiss-cpu).")
+
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir  = index_dir
+        self.index_path = os.path.join(index_dir, INDEX_FILE)
+        self.embeddings = embeddings
+        self.index      = None
+        self.batch      = _FaissBatch(self)
+        self._mmapped   = False
+        self._dirty     = False
+        self._lock      = threading.RLock()
+
+        self._docs = sqlite3.connect(os.path.join(index_dir, DOCS_FILE), check_same_thread=False)
+        self._docs.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT)")
+        if "user_id" not in {row[1] for row in self._docs.execute("PRAGMA table_info(docs)")}:
+            self._docs.execute("ALTER TABLE docs ADD COLUMN user_id TEXT")  # stores from before per-user memories
+        self._docs.execute("CREATE INDEX IF NOT EXISTS docs_user ON docs (user_id)")
+        self._docs.commit()
+
+        if os.path.exists(self.index_path):
+            self._load(mmap)
+        self._repair()
+
+    # ---------- internals ----------
+    def _load(self, mmap):
+        if mmap:
+            try:
+                self.index    = faiss.read_index(self.index_path, MMAP_FLAGS)
+                self._mmapped = True
+                return
+            except RuntimeError:
+                pass  # index type without mmap support, read it normally
+        self.index = faiss.read_index(self.index_path)
+
+    def _repair(self):
+        """Re-add vectors for docs rows the saved index is missing, and save it."""
+        stored = self._docs.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        if stored == len(self):
+            return
+        indexed = set(faiss.vector_to_array(self.index.id_map).tolist()) if self.index is not None else set()
+        missing = [row for row in self._docs.execute("SELECT id, text FROM docs") if row[0] not in indexed]
+        if not missing:
+            return
+        logging.warning(f"{len(missing)} memories in {DOCS_FILE} have no vector in {INDEX_FILE}; embedding them again")
+        for i in range(0, len(missing), SQL_CHUNK):
+            chunk   = missing[i:i + SQL_CHUNK]
+            vectors = self._normalised(self.embeddings.embed_documents([text for _, text in chunk]))
+            self._writable(vectors.shape[1]).add_with_ids(vectors, np.array([memory_id for memory_id, _ in chunk], dtype="int64"))
+        self._dirty = True
+        self.save()
+
+    def _writable(self, dim):
+        """Return an index that accepts writes, creating it or pulling it into RAM if needed."""
+        if self.index is None:
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        elif self._mmapped:
+            self.index    = faiss.read_index(self.index_path)
+            self._mmapped = False
+        return self.index
+
+    def _existing_ids(self, ids):
+        found = set()
+        for i in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[i:i + SQL_CHUNK]
+            query = f"SELECT id FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+            found.update(row[0] for row in self._docs.execute(query, chunk))
+        return found
+
+    def _normalised(self, vectors):
+        vectors = np.array(vectors, dtype="float32")  # a copy: normalize_L2 works in place
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    # ---------- public API ----------
+    def add_texts(self, texts, metadatas=None):
+        """Embed and add memories, skipping ones already stored. Returns their ids."""
+        texts     = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids       = [text_id(text, metadata.get("user_id")) for text, metadata in zip(texts, metadatas)]
+
+        with self._lock:
+            seen = self._existing_ids(ids)
+            keep = []
+            for i, memory_id in enumerate(ids):
+                if memory_id not in seen:
+                    seen.add(memory_id)
+                    keep.append(i)
+            if not keep:
+                return ids
+
+            vectors = self._normalised(self.embeddings.embed_documents([texts[i] for i in keep]))
+            index   = self._writable(vectors.shape[1])
+            index.add_with_ids(vectors, np.array([ids[i] for i in keep], dtype="int64"))
+            self._docs.executemany(
+                "INSERT OR REPLACE INTO docs (id, text, metadata, user_id) VALUES (?, ?, ?, ?)",
+                [(ids[i], texts[i], json.dumps(metadatas[i]), metadatas[i].get("user_id")) for i in keep]
+            )
+            self._docs.commit()
+            self._dirty = True
+        return ids
+
+    def delete(self, ids):
+        """Remove memories by id. Returns how many vectors were removed."""
+        ids = [int(memory_id) for memory_id in ids]
+        with self._lock:
+            if self.index is None or not ids:
+                return 0
+            index   = self._writable(self.index.d)
+            removed = index.remove_ids(np.array(ids, dtype="int64"))
+            for i in range(0, len(ids), SQL_CHUNK):
+                chunk = ids[i:i + SQL_CHUNK]
+                self._docs.execute(f"DELETE FROM docs WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self._docs.commit()
+            self._dirty = True
+            return removed
+
+    def search(self, query, k=10, user_id=None):
+        """Return up to `k` (text, metadata, score) tuples, most similar first."""
+        vector = self._normalised(self.embeddings.embed_query(query))
+        return self.search_by_vector(vector, k, user_id)
+
+    def search_by_vector(self, vector, k=10, user_id=None):
+        """Like `search`; with `user_id` only that user's memories are candidates."""
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            params = None
+            if user_id is not None:
+                owned = [row[0] for row in self._docs.execute("SELECT id FROM docs WHERE user_id = ?", (user_id,))]
+                if not owned:
+                    return []
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(owned, dtype="int64")))
+            scores, ids = self.index.search(self._normalised(vector), k, params=params)
+
+            hits = [(int(memory_id), float(score)) for memory_id, score in zip(ids[0], scores[0]) if memory_id != -1]
+            rows = {}
+            for i in range(0, len(hits), SQL_CHUNK):
+                chunk = [memory_id for memory_id, _ in hits[i:i + SQL_CHUNK]]
+                query = f"SELECT id, text, metadata FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+                rows.update((row[0], row[1:]) for row in self._docs.execute(query, chunk))
+
+        return [
+            (rows[memory_id][0], json.loads(rows[memory_id][1] or "{}"), score)
+            for memory_id, score in hits if memory_id in rows
+        ]
+
+    def iter_docs(self):
+        """Every stored memory as (text, metadata), e.g. to build a keyword index."""
+        with self._lock:
+            rows = self._docs.execute("SELECT text, metadata FROM docs").fetchall()
+        for text, metadata in rows:
+            yield text, json.loads(metadata or "{}")
+
+    def save(self):
+        """Write the index to disk if it changed (atomically, so readers never see half a file)."""
+        with self._lock:
+            if not self._dirty or self.index is None:
+                return
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def close(self):
+        self.save()
+        self._docs.close()
+
+    def __len__(self):
+        return self.index.ntotal if self.index is not None else 0
+
+
+_stores      = {}
+_stores_lock = threading.Lock()
+
+def open_store(index_dir, embeddings, mmap=True):
+    """Return the process-wide LocalFaissStore for `index_dir`, opening it on first use."""
+    with _stores_lock:
+        store = _stores.get(index_dir)
+        if store is None:
+            store = LocalFaissStore(index_dir, embeddings, mmap=mmap)
+            _stores[index_dir] = store
+        return store
@@ -0,0 +1,423 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from   datetime import datetime
+
+from   automat_llm.core    import memory_scope
+from   automat_llm.journal import JournalReader
+
+USER_MARKER = " - INFO - User"
+BOT_MARKER  = " - INFO - Bot: "
+# "User: text" (single-user logs) or "User [user_id]: text"
+USER_LINE   = re.compile(r" - INFO - User(?: \[(?P<user_id>[^\]]*)\])?: (?P<text>.*)")
+HEAD_BYTES  = 256  # bytes hashed to recognise a log file after truncation/rotation
+
+JOURNAL_STATE_FILE = "journal_upload_state.json"
+
+
+class ConversationLogReader:
+    """
+    Streaming User/Bot pair parser over a binary chat log.
+
+    Iterating yields `(user_input, bot_response, user_id)` tuples starting
+    from `offset`; `user_id` is None for lines written before turns were
+    tagged with their user. After (or during) iteration, `offset` is the byte position it is
+    safe to resume from: the end of the last complete pair, so a User line
+    whose Bot reply has not been written yet is re-read on the next run, and a
+    trailing line without a newline is never consumed half-written.
+    """
+
+    def __init__(self, f, offset=0):
+        self.f      = f
+        self.offset = offset
+
+    def __iter__(self):
+        self.f.seek(self.offset)
+        position     = self.offset
+        pending_user = None
+        user_id      = None
+
+        for raw in self.f:
+            if not raw.endswith(b"\n"):
+                break  # still being written
+            line_start = position
+            position  += len(raw)
+            line       = raw.decode("utf-8", errors="replace").strip()
+
+            match = USER_LINE.search(line) if USER_MARKER in line else None
+            if match:
+                pending_user = match.group("text").strip()
+                user_id      = match.group("user_id")
+                self.offset  = line_start
+            elif BOT_MARKER in line and pending_user:
+                bot_response = line.split(BOT_MARKER, 1)[1].strip()
+                self.offset  = position
+                yield pending_user, bot_response, user_id
+                pending_user = None
+            elif pending_user is None:
+                self.offset = position
+
+
+def _head_hash(path, length=HEAD_BYTES):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def fingerprint(f, offset):
+    """
+    State recorded after an upload: where to resume and how to recognise the file again.
+
+    Taken from the open file `f` that was read, not its path, so a log
+    rotated in the meantime cannot pair this offset with the new file.
+    """
+    st = os.fstat(f.fileno())
+    head_len = min(st.st_size, HEAD_BYTES)
+    f.seek(0)
+    return {
+        "offset":   offset,
+        "inode":    st.st_ino,
+        "size":     st.st_size,
+        "head_len": head_len,
+        "head":     hashlib.sha1(f.read(head_len)).hexdigest(),
+    }
+
+
+def load_upload_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_upload_state(state_file, state):
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_file)
+
+
+def _offset_of_line(path, line_number):
+    """Byte offset of `line_number`, used once to migrate the old line-count state."""
+    offset = 0
+    with open(path, "rb") as f:
+        for i, raw in enumerate(f):
+            if i >= line_number:
+                break
+            offset += len(raw)
+    return offset
+
+
+def _same_file(path, state):
+    st = os.stat(path)
+    return (
+        st.st_ino == state.get("inode")
+        and st.st_size >= state.get("offset", 0)
+        and _head_hash(path, state.get("head_len", HEAD_BYTES)) == state.get("head")
+    )
+
+
+def resume_plan(log_filepath, state):
+    """
+    Work out which (path, offset) ranges still need uploading.
+
+    Normally that is the current log from the saved offset. If the log was
+    rotated (RotatingFileHandler and ConversationJournal rename it to
+    `<log>.1`, shifting older files to `.2`, ...), the remainder of the file
+    last read comes first, then every newer file from the start; if it was
+    truncated or replaced, the log is read from the start.
+    """
+    if "offset" not in state:
+        return [(log_filepath, _offset_of_line(log_filepath, state.get("last_line", 0)))]
+
+    if _same_file(log_filepath, state):
+        return [(log_filepath, state["offset"])]
+
+    i = 1
+    while os.path.exists(f"{log_filepath}.{i}"):
+        if _same_file(f"{log_filepath}.{i}", state):
+            newer = [(f"{log_filepath}.{n}", 0) for n in range(i - 1, 0, -1)]
+            return [(f"{log_filepath}.{i}", state["offset"])] + newer + [(log_filepath, 0)]
+        i += 1
+    return [(log_filepath, 0)]
+
+
+def pending_upload(path, state_file=JOURNAL_STATE_FILE):
+    """
+    Whether rotated log `path` (`<log>.N`) still holds turns the saved state
+    has not got past: uploading resumes inside it, or in an older file.
+    """
+    state = load_upload_state(state_file)
+    if "offset" not in state:
+        return False
+    base, _, number = path.rpartition(".")
+    i = int(number)
+    while os.path.exists(f"{base}.{i}"):
+        if _same_file(f"{base}.{i}", state):
+            return i > int(number) or state["offset"] < os.path.getsize(path)
+        i += 1
+    return False
+
+
+def conversation_object(user_input, bot_response, source="chatbot_logs", user_id=None):
+    properties = {
+        "text": f"User: {user_input}\nBot: {bot_response}",
+        "metadata": json.dumps({
+            "type": "conversation_log",
+            "source": source,
+            "uploaded_at": datetime.now().isoformat()
+        })
+    }
+    if user_id is not None:
+        properties["user_id"] = user_id  # what per-user memory search filters on
+    return properties
+
+
+def _upload(collection, log_filepath, state_file, batch_size, max_pairs, read, index=None):
+    """
+    Resume from `state_file` and batch everything `read(f, offset)` yields
+    into `collection`; the reader yields `(properties, uuid)` pairs and keeps
+    a safe resume `offset`. Uploaded memories are also added to `index`
+    (a LexicalIndex) when one is given, once the batch has been committed.
+
+    If any object fails, the saved state is left where it was and an error
+    is raised, so the whole range is retried (objects carry deterministic
+    uuids, so the retry overwrites what did get through).
+    """
+    state    = load_upload_state(state_file)
+    uploaded = 0
+    indexed  = []  # (text, metadata) for `index`, added only after the batch commits
+    resume   = None
+
+    with collection.batch.fixed_size(batch_size=batch_size) as batch:
+        for path, start in resume_plan(log_filepath, state):
+            with open(path, "rb") as f:
+                reader = read(f, start)
+                for properties, object_uuid in reader:
+                    batch.add_object(properties=properties, uuid=object_uuid)
+                    if index is not None:
+                        indexed.append((properties["text"], {"user_id": properties["user_id"]} if "user_id" in properties else {}))
+                    uploaded += 1
+                    if max_pairs is not None and uploaded >= max_pairs:
+                        break
+                resume = fingerprint(f, reader.offset)
+            if max_pairs is not None and uploaded >= max_pairs:
+                break
+
+    failed_objects = collection.batch.failed_objects
+    if failed_objects:
+        raise RuntimeError(f"{len(failed_objects)} of {uploaded} memories failed to upload, keeping the previous "
+                           f"resume point (first failure: {failed_objects[0]})")
+
+    if index is not None:
+        index.add_many(indexed)
+    if resume is not None:
+        save_upload_state(state_file, resume)
+    return uploaded
+
+
+class _LogObjects(ConversationLogReader):
+    def __iter__(self):
+        from weaviate.util import generate_uuid5
+
+        for user_input, bot_response, user_id in super().__iter__():
+            # Keyed by content so a range retried after a failed batch replaces itself instead of duplicating
+            yield (conversation_object(user_input, bot_response, user_id=user_id),
+                   generate_uuid5(f"{user_id}\n{user_input}\n{bot_response}"))
+
+
+def upload_logs(client, log_filepath, state_file="upload_state.json", batch_size=100, collection_name="SampleData",
+                max_pairs=None, collection=None, index=None):
+    """
+    Upload conversations appended to a text chat log since the last run.
+
+    Seeks straight to the saved byte offset and streams User/Bot pairs into
+    the vector store in fixed-size batches while parsing. With `max_pairs`,
+    stops after that many conversations and leaves the rest for the next
+    call. `collection` overrides the Weaviate collection, e.g. with a
+    LocalFaissStore, and `index` is a LexicalIndex kept in step with it.
+    Turns logged with a user id are stored with a `user_id` property.
+    Returns the number of conversations uploaded.
+
+    New conversations are written to the journal instead (see upload_journal);
+    this reads chatbot_logs.txt files from before it.
+    """
+    collection = collection if collection is not None else client.collections.get(collection_name)
+    return _upload(collection, log_filepath, state_file, batch_size, max_pairs, _LogObjects, index)
+
+
+def journal_object(record):
+    """Vector store properties for one journal record."""
+    return conversation_object(record["user"], record["response"], source="conversation_journal",
+                               user_id=memory_scope(record.get("user_id")))
+
+
+class _JournalObjects(JournalReader):
+    def __iter__(self):
+        from weaviate.util import generate_uuid5
+
+        for record in super().__iter__():
+            # Keyed by turn so a record re-read after a crash replaces itself instead of duplicating
+            yield journal_object(record), generate_uuid5(record["turn_id"])
+
+
+def upload_journal(client, journal_path, state_file=JOURNAL_STATE_FILE, batch_size=100, collection_name="SampleData",
+                   max_pairs=None, collection=None, index=None):
+    """
+    Upload turns appended to the conversation journal since the last run.
+
+    Works like upload_logs, but each turn is one JSON record, so nothing is
+    re-parsed and multi-line responses survive intact. Returns the number of
+    turns uploaded (0 while no journal exists yet).
+    """
+    if not os.path.exists(journal_path):
+        return 0
+    collection = collection if collection is not None else client.collections.get(collection_name)
+    return _upload(collection, journal_path, state_file, batch_size, max_pairs, _JournalObjects, index)
+
+
+def ingestion_lag_bytes(log_filepath, state_file=JOURNAL_STATE_FILE):
+    """How many bytes of the journal (or chat log) have not been uploaded yet."""
+    if not os.path.exists(log_filepath):
+        return 0
+    size  = os.path.getsize(log_filepath)
+    state = load_upload_state(state_file)
+    if "offset" in state and os.stat(log_filepath).st_ino == state.get("inode"):
+        return max(size - state["offset"], 0)
+    return size
+
+
+class IngestionWorker:
+    """
+    Background thread that moves new conversations into long-term memory.
+
+    Wakes every `interval` seconds, or sooner once `max_pairs` turns have been
+    reported through `notify()`, and uploads at most `batch_size` pairs per
+    call until it has caught up with the log. That caps how much work a single
+    cycle can do (the log itself is the buffer, so nothing is dropped while
+    it is behind). Failed uploads are retried with exponential backoff and
+    full jitter.
+
+    `log_filepath` is the conversation journal; pass `upload=upload_logs`
+    (and its state file) to follow a text chat log instead. Uploaded
+    memories are added to `index` too, so keyword search sees them at once.
+    """
+
+    def __init__(self, client, log_filepath, state_file=JOURNAL_STATE_FILE, interval=30.0, max_pairs=20,
+                 batch_size=100, max_retries=5, base_delay=1.0, max_delay=60.0, collection=None, upload=None,
+                 index=None):
+        self.client       = client
+        self.index        = index
+        self.upload       = upload or upload_journal
+        self.collection   = collection
+        self.log_filepath = log_filepath
+        self.state_file   = state_file
+        self.interval     = interval
+        self.max_pairs    = max_pairs
+        self.batch_size   = batch_size
+        self.max_retries  = max_retries
+        self.base_delay   = base_delay
+        self.max_delay    = max_delay
+
+        self._wake    = threading.Event()
+        self._stop    = threading.Event()
+        self._lock    = threading.Lock()
+        self._thread  = None
+        self._pending = 0
+        self._flush_on_stop = True
+
+        self.uploaded_total       = 0
+        self.cycles               = 0
+        self.failures             = 0
+        self.consecutive_failures = 0
+        self.last_success         = None
+        self.last_error           = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cybel-ingest", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True, timeout=None):
+        """Stop the worker, uploading whatever is left first when `flush` is set."""
+        self._flush_on_stop = flush
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self, turns=1):
+        """Report newly logged turns; wakes the worker early once `max_pairs` are pending."""
+        with self._lock:
+            self._pending += turns
+            if self._pending >= self.max_pairs:
+                self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._drain()
+        if self._flush_on_stop:
+            self._drain()
+
+    def _drain(self):
+        self.cycles += 1
+        while True:
+            uploaded = self._upload_with_retry()
+            if uploaded is None or uploaded < self.batch_size:
+                break
+
+    def _upload_with_retry(self):
+        for attempt in range(self.max_retries):
+            try:
+                uploaded = self.upload(self.client, self.log_filepath, self.state_file,
+                                       batch_size=self.batch_size, max_pairs=self.batch_size,
+                                       collection=self.collection, index=self.index)
+            except Exception as e:
+                self.failures             += 1
+                self.consecutive_failures += 1
+                self.last_error            = f"{type(e).__name__}: {e}"
+                logging.error(f"Memory ingestion failed (attempt {attempt + 1}): {e}")
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if self._stop.wait(delay):
+                    return None
+                continue
+
+            with self._lock:
+                self._pending = max(self._pending - uploaded, 0)
+            self.uploaded_total       += uploaded
+            self.consecutive_failures  = 0
+            self.last_success          = time.time()
+            return uploaded
+        return None
+
+    def pending_upload(self, path):
+        """Whether rotated file `path` still has turns this worker has not uploaded (see ConversationJournal.retain)."""
+        return pending_upload(path, self.state_file)
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            "running":              self._thread is not None and self._thread.is_alive(),
+            "pending_turns":        pending,
+            "lag_bytes":            ingestion_lag_bytes(self.log_filepath, self.state_file),
+            "seconds_since_upload": round(time.time() - self.last_success, 1) if self.last_success else None,
+            "uploaded_total":       self.uploaded_total,
+            "cycles":               self.cycles,
+            "failures":             self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error":           self.last_error,
+        }
@@ -0,0 +1,262 @@
+import os
+import json
+import atexit
+import shutil
+import sqlite3
+import logging
+import threading
+
+DEFAULT_STATE = {"rudeness_score": 0, "requires_apology": False}
+APOLOGY_THRESHOLD = 2  # rude messages before Cybel wants an apology
+
+
+def apply_interaction(user_data, is_rude=False, apologized=False):
+    """Update one user's etiquette state in place for a rude message or an apology."""
+    if is_rude:
+        user_data["rudeness_score"] += 1
+        if user_data["rudeness_score"] >= APOLOGY_THRESHOLD:
+            user_data["requires_apology"] = True
+    elif apologized:
+        user_data["rudeness_score"] = 0
+        user_data["requires_apology"] = False
+    return user_data
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over `path`, so readers never see half a file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class InteractionStore:
+    """
+    In-memory user_interactions with write-behind persistence.
+
+    Updates only touch memory and append one line (the user's new state) to
+    `<path>.journal`. A background thread writes the full snapshot to `path`
+    atomically every `flush_interval` seconds when something changed, then
+    discards the journal. On startup the snapshot is loaded and the journal
+    replayed, so a crash loses nothing that reached the journal. Journal
+    records are whole-user states, which makes replaying them idempotent.
+    """
+
+    def __init__(self, path, flush_interval=5.0):
+        self.path           = path
+        self.journal_path   = f"{path}.journal"
+        self.flush_interval = flush_interval
+
+        self._lock       = threading.Lock()
+        self._flush_lock = threading.Lock()  # one snapshot at a time
+        self._stop       = threading.Event()
+        self._thread     = None
+        self._dirty      = False
+        self._users      = self._recover()
+        self._journal    = open(self.journal_path, "a", encoding="utf-8")
+
+        self.flushes = 0
+
+    # ---------- recovery ----------
+    def _recover(self):
+        users = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                users = json.load(f).get("users", {})
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logging.error(f"Unreadable interactions snapshot {self.path}: {e}")
+
+        replayed = 0
+        # .1 is a journal rotated out by a flush that did not finish
+        for journal in (f"{self.journal_path}.1", self.journal_path):
+            if not os.path.exists(journal):
+                continue
+            with open(journal, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from a crash mid-append
+                    users[record.pop("user")] = record
+                    replayed += 1
+
+        if replayed:
+            # Fold the journals into a fresh snapshot before anything new is written
+            write_json_atomic(self.path, {"users": users})
+            for journal in (f"{self.journal_path}.1", self.journal_path):
+                if os.path.exists(journal):
+                    os.remove(journal)
+        return users
+
+    # ---------- public API ----------
+    def get_user(self, user_id):
+        with self._lock:
+            return dict(self._users.get(user_id, DEFAULT_STATE))
+
+    def update(self, user_id, is_rude=False, apologized=False):
+        """Apply a rude message or an apology for `user_id` and journal the result."""
+        with self._lock:
+            user_data = self._users.setdefault(user_id, dict(DEFAULT_STATE))
+            apply_interaction(user_data, is_rude, apologized)
+            self._journal.write(json.dumps({"user": user_id, **user_data}) + "\n")
+            self._journal.flush()
+            self._dirty = True
+            return dict(user_data)
+
+    def flush(self):
+        """
+        Write a snapshot now if anything changed since the last one.
+
+        If writing it fails the store stays dirty and the rotated journal
+        stays on disk; the next flush appends to it rather than replacing it.
+        """
+        rotated = f"{self.journal_path}.1"
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                snapshot = {"users": {user_id: dict(data) for user_id, data in self._users.items()}}
+                # Later updates go to a fresh journal while the snapshot is written
+                self._journal.close()
+                try:
+                    if os.path.exists(rotated):  # left by a failed flush: keep its records, ahead of these
+                        with open(self.journal_path, "r", encoding="utf-8") as src, open(rotated, "a", encoding="utf-8") as dst:
+                            shutil.copyfileobj(src, dst)
+                            dst.flush()
+                            os.fsync(dst.fileno())
+                        os.remove(self.journal_path)
+                    else:
+                        os.replace(self.journal_path, rotated)
+                finally:
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._dirty = False
+
+            try:
+                write_json_atomic(self.path, snapshot)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+            os.remove(rotated)
+            self.flushes += 1
+            return True
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cybel-interactions", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # keep flushing: the store stays dirty and the next pass retries
+                logging.exception("Failed to snapshot user interactions")
+
+    def close(self):
+        """Stop the flusher and write the final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            self._journal.close()
+        atexit.unregister(self.close)
+
+    def __getitem__(self, key):
+        # Read-only view in the old {"users": {...}} shape
+        if key != "users":
+            raise KeyError(key)
+        with self._lock:
+            return {user_id: dict(data) for user_id, data in self._users.items()}
+
+    def __len__(self):
+        return len(self._users)
+
+
+class SQLiteInteractionStore:
+    """
+    user_interactions kept in a SQLite table instead of a JSON file.
+
+    Every update is a single-row upsert (WAL mode), so there is nothing to
+    snapshot and concurrent processes can share the file. Same interface as
+    InteractionStore; `start()`/`flush()` exist so callers need not care.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "user_id TEXT PRIMARY KEY, rudeness_score INTEGER NOT NULL, requires_apology INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def _row(self, user_id):
+        row = self._db.execute(
+            "SELECT rudeness_score, requires_apology FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return dict(DEFAULT_STATE)
+        return {"rudeness_score": row[0], "requires_apology": bool(row[1])}
+
+    def get_user(self, user_id):
+        with self._lock:
+            return self._row(user_id)
+
+    def update(self, user_id, is_rude=False, apologized=False):
+        with self._lock:
+            user_data = apply_interaction(self._row(user_id), is_rude, apologized)
+            self._db.execute(
+                "INSERT INTO users (user_id, rudeness_score, requires_apology) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET rudeness_score = excluded.rudeness_score, "
+                "requires_apology = excluded.requires_apology",
+                (user_id, user_data["rudeness_score"], int(user_data["requires_apology"]))
+            )
+            self._db.commit()
+            return user_data
+
+    def import_json(self, json_path):
+        """One-off migration of an existing user_interactions.json."""
+        with open(json_path, "r", encoding="utf-8") as f:
+            users = json.load(f).get("users", {})
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO users (user_id, rudeness_score, requires_apology) VALUES (?, ?, ?)",
+                [(user_id, data.get("rudeness_score", 0), int(data.get("requires_apology", False)))
+                 for user_id, data in users.items()]
+            )
+            self._db.commit()
+        return len(users)
+
+    def start(self):
+        return self
+
+    def flush(self):
+        return False
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __getitem__(self, key):
+        if key != "users":
+            raise KeyError(key)
+        with self._lock:
+            rows = self._db.execute("SELECT user_id, rudeness_score, requires_apology FROM users").fetchall()
+        return {user_id: {"rudeness_score": score, "requires_apology": bool(apology)} for user_id, score, apology in rows}
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
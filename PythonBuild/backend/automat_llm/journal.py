@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import hashlib
+import logging
+import threading
+from   collections import Counter
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUPS   = 3
+
+
+def doc_id(doc):
+    """Stable id of a retrieved memory: its store id when it has one, otherwise a hash of its text."""
+    metadata = getattr(doc, "metadata", None) or {}
+    for key in ("uuid", "id", "sha256"):
+        if metadata.get(key):
+            return str(metadata[key])
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def turn_record(user_id, user_input, response, docs=(), timings=None, cached=False):
+    """One conversation turn as a journal record."""
+    return {
+        "turn_id":  uuid.uuid4().hex,
+        "ts":       round(time.time(), 3),
+        "user_id":  user_id,
+        "user":     user_input,
+        "response": response,
+        "docs":     [doc_id(doc) for doc in docs],
+        "timings":  timings or {},
+        "cached":   cached,
+    }
+
+
+class ConversationJournal:
+    """
+    Append-only JSONL journal of conversation turns.
+
+    `record()` only appends to an in-memory buffer; a writer thread turns the
+    buffer into one write every `flush_interval` seconds, so the request path
+    never waits on the disk. If more than `max_pending` records are waiting
+    the caller writes them itself instead of letting the buffer grow. One
+    record per line, so multi-line responses need no special parsing.
+
+    Once the file would exceed `max_bytes` it is rotated to `<path>.1` (older
+    files shift up to `<path>.<backups>`), the same naming the ingestion
+    resume logic already understands. `retain(path)`, when set, says whether
+    a rotated file still holds turns that have not been uploaded; such a
+    file is shifted further up instead of being dropped.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, flush_interval=0.2, max_pending=4096,
+                 retain=None):
+        self.path           = path
+        self.max_bytes      = max_bytes
+        self.backups        = backups
+        self.flush_interval = flush_interval
+        self.max_pending    = max_pending
+        self.retain         = retain
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file       = open(path, "ab")
+        self._size       = self._file.tell()
+        self._pending    = []
+        self._lock       = threading.Lock()  # guards _pending
+        self._write_lock = threading.Lock()  # one writer (and rotation) at a time
+        self._stop       = threading.Event()
+        self._thread     = None
+
+        self.records       = 0
+        self.bytes_written = 0
+        self.rotations     = 0
+        self.inline_writes = 0
+        self.write_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, path):
+        """Journal at CYBEL_JOURNAL (or `path`), rotating at CYBEL_JOURNAL_MAX_MB and keeping CYBEL_JOURNAL_BACKUPS files."""
+        return cls(
+            os.environ.get("CYBEL_JOURNAL", path),
+            max_bytes=int(float(os.environ.get("CYBEL_JOURNAL_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+            backups=int(os.environ.get("CYBEL_JOURNAL_BACKUPS", DEFAULT_BACKUPS)),
+        )
+
+    # ---------- writing ----------
+    def record(self, record):
+        """Queue one turn for writing."""
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._pending.append(line)
+            overflow = len(self._pending) >= self.max_pending
+        if overflow or self._thread is None:
+            # Writer is behind (or not running): pay for the write here rather than buffer without bound
+            self.inline_writes += overflow
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far."""
+        with self._write_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return 0
+            start = time.perf_counter()
+            data  = b"".join(lines)
+            if self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size         += len(data)
+            self.records       += len(lines)
+            self.bytes_written += len(data)
+            self.write_seconds += time.perf_counter() - start
+            return len(lines)
+
+    def _rotate(self):
+        self._file.close()
+        # <path>.<backups> normally falls off the end; while it (or an older file
+        # kept earlier) has not been uploaded yet, keep it and shift past it
+        last = self.backups
+        while last and self.retain is not None and os.path.exists(f"{self.path}.{last}") and self.retain(f"{self.path}.{last}"):
+            last += 1
+        if last > self.backups:
+            logging.warning(f"Memory ingestion is behind the journal; keeping {last} rotated files instead of {self.backups}")
+        for i in range(last - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        extra = last + 1
+        while os.path.exists(f"{self.path}.{extra}"):  # kept earlier, uploaded since
+            os.remove(f"{self.path}.{extra}")
+            extra += 1
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self.rotations += 1
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cybel-journal", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logging.error(f"Failed to write conversation journal: {e}")
+
+    def close(self):
+        """Stop the writer, write what is left and sync it to disk."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
+        atexit.unregister(self.close)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "path":          self.path,
+            "records":       self.records,
+            "pending":       pending,
+            "bytes":         self._size,
+            "bytes_written": self.bytes_written,
+            "rotations":     self.rotations,
+            "inline_writes": self.inline_writes,
+            "write_ms":      round(self.write_seconds * 1000, 2),
+        }
+
+
+class JournalReader:
+    """
+    Streaming reader over a binary journal file.
+
+    Iterating yields record dicts starting at byte `offset`. Afterwards
+    `offset` is the position after the last complete line, so a record still
+    being written is read again next time rather than half-parsed. Lines that
+    are complete but not valid JSON are logged and skipped.
+    """
+
+    def __init__(self, f, offset=0):
+        self.f       = f
+        self.offset  = offset
+        self.skipped = 0
+
+    def __iter__(self):
+        self.f.seek(self.offset)
+        for raw in self.f:
+            if not raw.endswith(b"\n"):
+                break  # still being written
+            self.offset += len(raw)
+            try:
+                yield json.loads(raw)
+            except ValueError:
+                self.skipped += 1
+                logging.warning(f"Skipping unreadable journal line ending at byte {self.offset}")
+
+
+def journal_files(path):
+    """The journal and its rotated backups, oldest first."""
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        backups.append(f"{path}.{i}")
+        i += 1
+    return list(reversed(backups)) + ([path] if os.path.exists(path) else [])
+
+
+def read_journal(path):
+    """Every record in the journal and its backups, oldest first."""
+    for file_path in journal_files(path):
+        with open(file_path, "rb") as f:
+            yield from JournalReader(f)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)] if ordered else 0.0
+
+
+def summarize(records, top=10):
+    """Turn counts, per-stage latency percentiles and the most retrieved memories of a journal."""
+    turns, cached, response_chars = 0, 0, 0
+    users, docs = Counter(), Counter()
+    stages      = {}
+    first = last = None
+
+    for record in records:
+        turns          += 1
+        cached         += bool(record.get("cached"))
+        response_chars += len(record.get("response") or "")
+        users[record.get("user_id")] += 1
+        docs.update(record.get("docs", ()))
+        for name, ms in (record.get("timings") or {}).items():
+            stages.setdefault(name[:-3] if name.endswith("_ms") else name, []).append(ms)
+        first = record["ts"] if first is None else first
+        last  = record["ts"]
+
+    for samples in stages.values():
+        samples.sort()
+    return {
+        "turns":               turns,
+        "users":               len(users),
+        "cached_turns":        cached,
+        "mean_response_chars": round(response_chars / turns, 1) if turns else 0.0,
+        "first_ts":            first,
+        "last_ts":             last,
+        "busiest_users":       users.most_common(top),
+        "top_docs":            docs.most_common(top),
+        "stages_ms": {
+            name: {"p50": round(_percentile(samples, 50), 2), "p99": round(_percentile(samples, 99), 2)}
+            for name, samples in sorted(stages.items(), key=lambda item: -_percentile(item[1], 99))
+        },
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(summarize(read_journal(sys.argv[1] if len(sys.argv) > 1 else "Logs/conversations.jsonl")), indent=2))
@@ -0,0 +1,217 @@
+import os
+import re
+import math
+import heapq
+import threading
+from   collections import Counter
+
+# Words, plus identifiers that keep their inner punctuation (user-42, a.b@c.io, v1.2)
+TOKEN      = re.compile(r"\w+(?:[-.@:']\w+)*")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by do for from has have i if in is it its me my of on or so that the "
+    "their them they this to was we were what when who will with you your".split()
+)
+
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+
+def tokenize(text):
+    """Lower-cased search terms of `text` (identifiers are kept whole, stop words dropped)."""
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over memory text.
+
+    Built incrementally: `add()` indexes one memory (a no-op if the same text
+    is already indexed for the same user), so the ingestion worker can feed it
+    as conversations are uploaded. Postings map each term to
+    {document number: term frequency}; a query only touches the postings of
+    its own terms.
+
+    Like the vector stores, memories carrying a "user_id" belong to that user
+    and `search(..., user_id=...)` only returns theirs; user_id=None searches
+    everything.
+
+    Parameters:
+    - k1 (float): BM25 term-frequency saturation.
+    - b (float): BM25 document-length normalisation.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b  = b
+
+        self._postings  = {}   # term -> {doc: tf}
+        self._texts     = []   # doc -> text
+        self._metadatas = []   # doc -> metadata
+        self._lengths   = []   # doc -> number of terms
+        self._total     = 0    # sum of _lengths
+        self._ids       = {}   # (user_id, text) -> doc
+        self._by_user   = {}   # user_id -> set of docs
+        self._lock      = threading.Lock()
+
+    def add(self, text, metadata=None):
+        """Index one memory. Returns False when it was already indexed."""
+        metadata = metadata or {}
+        key      = (metadata.get("user_id"), text)
+        terms    = Counter(tokenize(text))
+        with self._lock:
+            if key in self._ids:
+                return False
+            doc = len(self._texts)
+            self._ids[key] = doc
+            self._texts.append(text)
+            self._metadatas.append(metadata)
+            self._lengths.append(sum(terms.values()))
+            self._total += self._lengths[-1]
+            self._by_user.setdefault(key[0], set()).add(doc)
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc] = tf
+        return True
+
+    def add_many(self, items):
+        """Index (text, metadata) pairs. Returns how many were new."""
+        return sum(self.add(text, metadata) for text, metadata in items)
+
+    def search(self, query, k=10, user_id=None):
+        """Up to `k` (text, metadata, score) tuples, best BM25 match first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._texts)
+            if not terms or not count:
+                return []
+            allowed = self._by_user.get(user_id, set()) if user_id is not None else None
+            if allowed is not None and not allowed:
+                return []
+
+            average = self._total / count
+            scores  = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    if allowed is not None and doc not in allowed:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc] / average)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._texts[doc], self._metadatas[doc], score) for doc, score in best]
+
+    def __len__(self):
+        return len(self._texts)
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._texts), "terms": len(self._postings), "users": len(self._by_user)}
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60, weights=None):
+    """
+    Fuse ranked lists of keys: each key scores sum(weight / (rrf_k + rank))
+    over the lists it appears in (rank starts at 1). Returns (key, score)
+    pairs, best first. Only ranks are used, so BM25 and cosine scores never
+    have to be put on the same scale.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused   = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + weight / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class HybridSearch:
+    """
+    Memory search combining a vector search with a LexicalIndex.
+
+    Called like the plain searches CybelRagChain uses,
+    `search(query, vector, k, user_id)`, plus an optional `options` dict that
+    overrides the defaults for one query:
+
+    - "mode": "hybrid" (default), "vector" or "lexical"
+    - "rrf_k": reciprocal rank fusion constant (default 60)
+    - "vector_weight" / "lexical_weight": how much each ranking counts
+    - "candidates": hits taken from each side before fusing (default 2 * k)
+
+    Both sides run once per query on the embedding the chain already made;
+    hits are matched on their text, and each returned Document records its
+    "rrf_score", "vector_rank" and "lexical_rank" (None where a side missed).
+    Its "score" is the fused score (in lexical mode, BM25 divided by the
+    best hit's), so ContextBuilder never compares BM25 with cosine; the raw
+    values are kept as "vector_score" and "bm25_score".
+    `scope(user_id)` maps the asking user to the index's user filter, as
+    core.memory_scope does for the vector stores.
+    """
+
+    def __init__(self, vector_search, index, mode="hybrid", rrf_k=60, vector_weight=1.0, lexical_weight=1.0,
+                 candidates=None, scope=None):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        self.vector_search = vector_search
+        self.index         = index
+        self.scope         = scope or (lambda user_id: user_id)
+        self.defaults      = {
+            "mode":           mode,
+            "rrf_k":          rrf_k,
+            "vector_weight":  vector_weight,
+            "lexical_weight": lexical_weight,
+            "candidates":     candidates,
+        }
+
+    @classmethod
+    def from_env(cls, vector_search, index, scope=None):
+        """Defaults from CYBEL_RETRIEVAL (mode) and CYBEL_RRF_K."""
+        return cls(vector_search, index, mode=os.environ.get("CYBEL_RETRIEVAL", "hybrid"),
+                   rrf_k=float(os.environ.get("CYBEL_RRF_K", 60)), scope=scope)
+
+    def __call__(self, query, vector, k, user_id=None, options=None):
+        from langchain_core.documents import Document
+
+        settings = {**self.defaults, **{key: value for key, value in (options or {}).items() if value is not None}}
+        mode     = settings["mode"]
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        if mode == "vector":
+            return self.vector_search(query, vector, k, user_id)
+
+        candidates = settings["candidates"] or 2 * k
+        lexical    = self.index.search(query, candidates, self.scope(user_id))
+        if mode == "lexical":
+            best = lexical[0][2] if lexical else 1.0
+            return [Document(page_content=text, metadata={**metadata, "score": score / best, "bm25_score": score})
+                    for text, metadata, score in lexical[:k]]
+
+        dense    = self.vector_search(query, vector, candidates, user_id)
+        metadata = {}  # text -> metadata with the raw scores renamed
+        for doc in dense:
+            fields = dict(doc.metadata)
+            if "score" in fields:
+                fields["vector_score"] = fields.pop("score")
+            metadata.setdefault(doc.page_content, fields)
+        bm25 = {}
+        for text, fields, score in lexical:
+            metadata.setdefault(text, dict(fields))
+            bm25[text] = score
+
+        vector_ranks  = {doc.page_content: rank for rank, doc in enumerate(dense, start=1)}
+        lexical_ranks = {text: rank for rank, (text, _, _) in enumerate(lexical, start=1)}
+        fused = reciprocal_rank_fusion(
+            [list(vector_ranks), list(lexical_ranks)], rrf_k=settings["rrf_k"],
+            weights=[settings["vector_weight"], settings["lexical_weight"]],
+        )
+        return [
+            Document(page_content=text, metadata={
+                **metadata[text],
+                "score":        round(score, 6),
+                "bm25_score":   bm25.get(text),
+                "rrf_score":    round(score, 6),
+                "vector_rank":  vector_ranks.get(text),
+                "lexical_rank": lexical_ranks.get(text),
+            })
+            for text, score in fused[:k]
+        ]
@@ -0,0 +1,259 @@
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from   collections import OrderedDict, deque
+
+
+def format_message(msg):
+    """Format a single history message the way the prompt expects it"""
+    if msg["role"] == "user":
+        return f"User: {msg['content']}"
+    return f"Cybel: {msg['content']}"
+
+
+def format_conversation_history(history):
+    """Format conversation history as a readable string"""
+    return "\n".join(format_message(msg) for msg in history)
+
+
+class SQLiteSpill:
+    """
+    On-disk tier for conversation histories evicted from memory.
+
+    Users pushed out of the in-memory store are written here and loaded back
+    (and removed from disk) the next time they talk to Cybel.
+    """
+
+    def __init__(self, path="conversation_spill.db"):
+        self.path  = path
+        self._lock = threading.Lock()  # shared by every shard of a ShardedConversationStore
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS histories ("
+            "user_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(self, user_id, messages):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO histories (user_id, messages, updated_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(list(messages)), time.time())
+            )
+            self._conn.commit()
+
+    def pop(self, user_id):
+        with self._lock:
+            row = self._conn.execute("SELECT messages FROM histories WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM histories WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM histories").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class ConversationStore:
+    """
+    Bounded per-user conversation memory.
+
+    Each user gets a ring buffer of at most `max_messages` messages. Users are
+    kept in LRU order; once there are more than `max_users` users or the stored
+    content exceeds `max_bytes`, the least recently active users are evicted,
+    either to the optional `spill` tier or dropped entirely.
+
+    Parameters:
+    - max_messages (int): Messages kept per user.
+    - max_users (int): Users kept in memory at once.
+    - max_bytes (int): Approximate cap on stored message content, in bytes.
+    - spill (SQLiteSpill | None): Where evicted histories go, if anywhere.
+    """
+
+    def __init__(self, max_messages=50, max_users=1000, max_bytes=32 * 1024 * 1024, spill=None):
+        self.max_messages = max_messages
+        self.max_users    = max_users
+        self.max_bytes    = max_bytes
+        self.spill        = spill
+
+        self._histories    = OrderedDict()  # user_id -> deque of (message, formatted line, size)
+        self._sizes        = {}
+        self._revisions    = {}
+        self._format_cache = {}             # user_id -> (revision, window, exclude_last, text)
+        self._total_bytes  = 0
+        self._evictions    = 0
+        self._lock         = threading.RLock()
+
+    # ---------- internals ----------
+    def _buffer(self, user_id):
+        """Return the user's ring buffer, loading it from the spill tier if needed."""
+        buffer = self._histories.get(user_id)
+        if buffer is not None:
+            self._histories.move_to_end(user_id)
+            return buffer
+
+        buffer = deque(maxlen=self.max_messages)
+        self._histories[user_id] = buffer
+        self._sizes[user_id]     = 0
+        self._revisions[user_id] = 0
+
+        if self.spill is not None:
+            for msg in self.spill.pop(user_id) or []:
+                self._append(user_id, buffer, msg)
+        self._enforce_limits(keep=user_id)
+        return buffer
+
+    def _append(self, user_id, buffer, msg):
+        size = len(msg["content"].encode("utf-8"))
+        if len(buffer) == buffer.maxlen:
+            self._release(user_id, buffer[0][2])
+        buffer.append((msg, format_message(msg), size))
+        self._sizes[user_id] += size
+        self._total_bytes    += size
+        self._revisions[user_id] += 1
+
+    def _release(self, user_id, size):
+        self._sizes[user_id] -= size
+        self._total_bytes    -= size
+
+    def _drop(self, user_id, spill=True):
+        buffer = self._histories.pop(user_id)
+        if spill and self.spill is not None and buffer:
+            self.spill.save(user_id, (entry[0] for entry in buffer))
+        self._total_bytes -= self._sizes.pop(user_id)
+        self._revisions.pop(user_id, None)
+        self._format_cache.pop(user_id, None)
+
+    def _enforce_limits(self, keep):
+        while len(self._histories) > 1 and (
+            len(self._histories) > self.max_users or self._total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._histories))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+            self._evictions += 1
+
+    # ---------- public API ----------
+    def add(self, user_id, role, content):
+        """Add a message to the user's history"""
+        with self._lock:
+            buffer = self._buffer(user_id)
+            self._append(user_id, buffer, {"role": role, "content": content})
+            self._enforce_limits(keep=user_id)
+
+    def get(self, user_id, max_messages=10):
+        """Get the last N messages from the user's history"""
+        with self._lock:
+            buffer = self._buffer(user_id)
+            start  = max(len(buffer) - max_messages, 0)
+            return [buffer[i][0] for i in range(start, len(buffer))]
+
+    def format(self, user_id, max_messages=10, exclude_last=False):
+        """
+        Format the last `max_messages` messages as a prompt-ready string.
+
+        The result is cached per user and reused until the history changes, so
+        repeated lookups within a turn do not rebuild the string.
+        """
+        with self._lock:
+            buffer   = self._buffer(user_id)
+            revision = self._revisions[user_id]
+            cached   = self._format_cache.get(user_id)
+            if cached is not None and cached[:3] == (revision, max_messages, exclude_last):
+                return cached[3]
+
+            end   = len(buffer) - 1 if exclude_last else len(buffer)
+            start = max(len(buffer) - max_messages, 0)
+            text  = "\n".join(buffer[i][1] for i in range(start, max(end, start)))
+            self._format_cache[user_id] = (revision, max_messages, exclude_last, text)
+            return text
+
+    def evict(self, user_id, spill=True):
+        """Remove a user from memory, spilling their history to disk if configured"""
+        with self._lock:
+            if user_id in self._histories:
+                self._drop(user_id, spill=spill)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for user_id in list(self._histories):
+                self._drop(user_id, spill=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users":         len(self._histories),
+                "bytes":         self._total_bytes,
+                "evictions":     self._evictions,
+                "spilled_users": len(self.spill) if self.spill is not None else 0,
+            }
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._histories
+
+    def __len__(self):
+        return len(self._histories)
+
+
+class ShardedConversationStore:
+    """
+    ConversationStore split into `shards` independent stores by user id.
+
+    Each shard has its own lock, LRU order and a 1/`shards` share of the
+    user and byte limits, so requests from different users rarely wait on
+    each other. One user always maps to the same shard. Same interface as
+    ConversationStore.
+    """
+
+    def __init__(self, shards=16, max_messages=50, max_users=1000, max_bytes=32 * 1024 * 1024, spill=None):
+        self.max_messages = max_messages
+        self.spill        = spill
+        self.shards       = [
+            ConversationStore(max_messages, max(max_users // shards, 1), max(max_bytes // shards, 1), spill)
+            for _ in range(shards)
+        ]
+
+    def shard(self, user_id):
+        return self.shards[zlib.crc32(str(user_id).encode("utf-8")) % len(self.shards)]
+
+    def add(self, user_id, role, content):
+        self.shard(user_id).add(user_id, role, content)
+
+    def get(self, user_id, max_messages=10):
+        return self.shard(user_id).get(user_id, max_messages)
+
+    def format(self, user_id, max_messages=10, exclude_last=False):
+        return self.shard(user_id).format(user_id, max_messages, exclude_last)
+
+    def evict(self, user_id, spill=True):
+        self.shard(user_id).evict(user_id, spill)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def stats(self):
+        totals = {"users": 0, "bytes": 0, "evictions": 0}
+        for shard in self.shards:
+            for key, value in shard.stats().items():
+                if key in totals:
+                    totals[key] += value
+        totals["shards"]        = len(self.shards)
+        totals["spilled_users"] = len(self.spill) if self.spill is not None else 0
+        return totals
+
+    def __contains__(self, user_id):
+        return user_id in self.shard(user_id)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
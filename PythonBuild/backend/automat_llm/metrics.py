@@ -0,0 +1,183 @@
+import time
+import threading
+from   collections import deque
+from   contextlib  import contextmanager
+
+
+class LatencyTracker:
+    """
+    Rolling latency samples with cheap percentile snapshots.
+
+    Keeps the last `window` observations (in seconds) plus lifetime count and
+    total, which is enough to report p50/p99 on a health endpoint.
+    """
+
+    def __init__(self, window=1024):
+        self._samples = deque(maxlen=window)
+        self._lock    = threading.Lock()
+        self.count    = 0
+        self.total    = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return 0.0
+        index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def snapshot(self):
+        return {
+            "count":   self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms":  round(self.percentile(50) * 1000, 2),
+            "p99_ms":  round(self.percentile(99) * 1000, 2),
+        }
+
+
+# Upper bounds in seconds, Prometheus-style; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed buckets plus rolling percentiles.
+
+    Bucket counts never reset, so they can be scraped and diffed; the
+    percentiles come from a LatencyTracker over recent samples.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets  = tuple(sorted(buckets))
+        self._counts  = [0] * (len(self.buckets) + 1)
+        self._lock    = threading.Lock()
+        self.recent   = LatencyTracker(window)
+
+    def observe(self, seconds):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self._counts[i] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+        self.recent.observe(seconds)
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with ("+Inf", count)"""
+        with self._lock:
+            counts = list(self._counts)
+        result, running = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def snapshot(self):
+        return {
+            **self.recent.snapshot(),
+            "sum_s":   round(self.recent.total, 6),
+            "buckets": {str(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class RequestTimer:
+    """
+    Wall-clock spans for one request, e.g. "embedding", "vector_search", "llm".
+
+    Spans with the same name add up. `breakdown()` is the per-request JSON
+    view; StageMetrics aggregates finished timers for /metrics.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def breakdown(self):
+        """{"total_ms": ..., "<stage>_ms": ...} in the order the stages ran."""
+        return {"total_ms": round(self.elapsed() * 1000, 2),
+                **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.spans.items()}}
+
+
+class _NullTimer(RequestTimer):
+    """Timer that records nothing, the default where timing is optional."""
+
+    def add(self, name, seconds):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class StageMetrics:
+    """Per-stage LatencyHistograms fed from finished RequestTimers, plus the request total."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._stages = {}  # stage -> LatencyHistogram
+        self._lock   = threading.Lock()
+
+    def histogram(self, stage):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = LatencyHistogram(self.buckets)
+            return histogram
+
+    def record(self, timer):
+        for stage, seconds in list(timer.spans.items()):
+            self.histogram(stage).observe(seconds)
+        self.histogram("total").observe(timer.elapsed())
+
+    def snapshot(self):
+        with self._lock:
+            stages = dict(self._stages)
+        return {stage: histogram.snapshot() for stage, histogram in stages.items()}
+
+
+def prometheus_histogram(name, help_text, series):
+    """
+    Prometheus text-format lines for a histogram metric.
+
+    `series` is [(labels dict, LatencyHistogram.snapshot())]; a snapshot's
+    cumulative buckets, sum and count map straight onto _bucket/_sum/_count.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, snapshot in series:
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        prefix     = f"{label_text}," if label_text else ""
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+        labels_all = f"{{{label_text}}}" if label_text else ""
+        lines.append(f"{name}_sum{labels_all} {snapshot['sum_s']}")
+        lines.append(f"{name}_count{labels_all} {snapshot['count']}")
+    return lines
+
+
+def prometheus_counter(name, help_text, series, kind="counter"):
+    """Lines for a counter (or gauge) metric; `series` is [(labels dict, value)]."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in series:
+        label_text = ",".join(f'{key}="{value_}"' for key, value_ in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, fall back to the stdlib
+    psutil = None
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_LLM_MODEL       = "openai/gpt-oss-20b"
+
+
+def _rss_bytes():
+    """Current resident set size of this process, in bytes (0 if unknown)."""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of embedding models, LLM clients and RAG chains.
+
+    Weights are loaded once per model name and shared by every chain that
+    needs them, so initialising several users or personalities does not
+    reload the same model. Load time and the resident memory growth seen
+    while loading are recorded per model and reported by `stats()`.
+
+    Loading happens under a per-key lock rather than the registry lock, so
+    `stats()` (and /health) answers while a model is still warming up.
+    """
+
+    def __init__(self):
+        self._models = {}   # ("embeddings"|"llm", name, ...) -> instance
+        self._chains = {}   # chain key -> chain
+        self._stats  = {}   # model key -> {"load_seconds": float, "rss_bytes": int}
+        self._lock   = threading.RLock()
+        self._loads  = {}   # model or chain key -> lock held while it is being built
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._loads.setdefault(key, threading.Lock())
+
+    def _load(self, key, loader):
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+
+            rss_before = _rss_bytes()
+            start      = time.perf_counter()
+            model      = loader()
+            elapsed    = time.perf_counter() - start
+            rss_delta  = max(_rss_bytes() - rss_before, 0)
+
+            with self._lock:
+                self._models[key] = model
+                self._stats[key]  = {"load_seconds": round(elapsed, 3), "rss_bytes": rss_delta}
+            logging.info(f"Loaded {key[0]} model {key[1]} in {elapsed:.2f}s (+{rss_delta / 1e6:.1f} MB RSS)")
+            return model
+
+    def get_embeddings(self, model_name=DEFAULT_EMBEDDING_MODEL):
+        """
+        Return the shared embedding service for `model_name`: one loaded
+        SentenceTransformer, batched across callers and backed by the on-disk
+        embedding cache (see automat_llm.embedding_service).
+        """
+        def loader():
+            from automat_llm.embedding_service import get_service
+            return get_service(model_name).load()
+        return self._load(("embeddings", model_name), loader)
+
+    def get_router(self):
+        """Return the shared ProviderRouter (backends configured from the environment)."""
+        def loader():
+            from automat_llm.router import ProviderRouter
+            return ProviderRouter.from_env()
+        return self._load(("router", "providers"), loader)
+
+    def get_llm(self, model_name=DEFAULT_LLM_MODEL, temperature=0.5, max_tokens=5000):
+        """
+        Return the shared Groq chat client for `model_name`, or with
+        CYBEL_LLM_ROUTER=1 a chat model that routes across Groq, xAI and a
+        local transformers fallback.
+        """
+        if os.environ.get("CYBEL_LLM_ROUTER", "0").lower() in ("1", "true", "yes", "on"):
+            def loader():
+                from automat_llm.router import RoutedChatModel
+                return RoutedChatModel(router=self.get_router(), temperature=temperature, max_tokens=max_tokens)
+            return self._load(("llm", "router", temperature, max_tokens), loader)
+
+        def loader():
+            from langchain_groq import ChatGroq
+            return ChatGroq(
+                temperature=temperature,
+                model=model_name,
+                max_tokens=max_tokens,
+                api_key=os.environ.get("GROQ_API_KEY")
+            )
+        return self._load(("llm", model_name, temperature, max_tokens), loader)
+
+    def get_chain(self, key, factory):
+        """Return the chain cached under `key`, building it with `factory()` on first use."""
+        chain = self._chains.get(key)
+        if chain is not None:
+            return chain
+
+        with self._key_lock(("chain", key)):
+            with self._lock:
+                chain = self._chains.get(key)
+            if chain is None:
+                chain = factory()
+                if chain is not None:
+                    with self._lock:
+                        self._chains[key] = chain
+            return chain
+
+    def warm_up(self, embedding_models=(DEFAULT_EMBEDDING_MODEL,), llm_models=()):
+        """Load models ahead of the first request, e.g. from a startup hook."""
+        for name in embedding_models:
+            self.get_embeddings(name)
+        for name in llm_models:
+            self.get_llm(name)
+
+    def evict(self, model_name=None):
+        """
+        Drop cached models (and the chains built on them) so their memory can be
+        reclaimed. With no `model_name`, everything is evicted.
+        """
+        with self._lock:
+            for key in list(self._models):
+                if model_name is None or key[1] == model_name:
+                    del self._models[key]
+                    self._stats.pop(key, None)
+            for key in list(self._chains):
+                if model_name is None or model_name in key:
+                    del self._chains[key]
+
+    async def aclose(self):
+        """Close the router's clients, if it was ever built; await it on the loop that served requests (API shutdown)."""
+        with self._lock:
+            router = self._models.get(("router", "providers"))
+        if router is not None:
+            await router.aclose()
+            router.close()
+
+    def stats(self):
+        with self._lock:
+            router = self._models.get(("router", "providers"))
+            return {
+                "models": {f"{key[0]}:{key[1]}": dict(value) for key, value in self._stats.items()},
+                "chains": len(self._chains),
+                "rss_bytes": _rss_bytes(),
+                "llm_backends": router.stats() if router is not None else None,
+            }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,155 @@
+import os
+import time
+import hashlib
+import threading
+from   collections import OrderedDict, namedtuple
+
+import numpy as np
+
+_Entry = namedtuple("_Entry", ["context_key", "vector", "response", "created", "seconds"])
+
+
+def context_key(docs):
+    """
+    Hash of the retrieved memories an answer was grounded in.
+
+    Conversation history is deliberately left out: every turn adds to it, so
+    a question asked again in the same session would never match. Entries
+    are scoped per user and expire after the cache's TTL instead.
+    """
+    h = hashlib.sha1()
+    for doc in docs:
+        h.update(getattr(doc, "page_content", str(doc)).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32").ravel()
+    norm   = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticResponseCache:
+    """
+    Per-user cache of LLM answers for repeated or lightly rephrased questions.
+
+    An answer is reused when the new question's embedding has cosine
+    similarity >= `threshold` with a cached one from the same user AND the
+    retrieved memories hash to the same `context_key`, so a repeated or
+    rephrased question hits only when it is grounded in the same memories.
+
+    Entries expire after `ttl` seconds. Each user keeps at most
+    `max_per_user` entries and the whole cache at most `max_entries`; both
+    limits evict least-recently-used entries first.
+    """
+
+    def __init__(self, threshold=0.95, ttl=3600.0, max_entries=4096, max_per_user=256):
+        self.threshold    = threshold
+        self.ttl          = ttl
+        self.max_entries  = max_entries
+        self.max_per_user = max_per_user
+
+        self._users   = OrderedDict()  # user_id -> OrderedDict(entry_id -> _Entry), LRU first
+        self._size    = 0
+        self._next_id = 0
+        self._lock    = threading.Lock()
+
+        self.hits          = 0
+        self.misses        = 0
+        self.seconds_saved = 0.0
+        self.evictions     = 0
+        self.expirations   = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from CYBEL_RESPONSE_CACHE* settings, or return None when it is off (the default)."""
+        if os.environ.get("CYBEL_RESPONSE_CACHE", "0").lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls(
+            threshold=float(os.environ.get("CYBEL_RESPONSE_CACHE_THRESHOLD", 0.95)),
+            ttl=float(os.environ.get("CYBEL_RESPONSE_CACHE_TTL", 3600)),
+            max_entries=int(os.environ.get("CYBEL_RESPONSE_CACHE_SIZE", 4096)),
+        )
+
+    context_key = staticmethod(context_key)
+
+    def get(self, user_id, vector, context_key):
+        """Return the cached answer for a similar question grounded in the same memories, or None."""
+        query = _unit(vector)
+        now   = time.time()
+        with self._lock:
+            entries = self._users.get(user_id)
+            best_id, best_score = None, self.threshold
+            if entries:
+                for entry_id, entry in list(entries.items()):
+                    if now - entry.created > self.ttl:
+                        del entries[entry_id]
+                        self._size       -= 1
+                        self.expirations += 1
+                        continue
+                    if entry.context_key != context_key or entry.vector.shape != query.shape:
+                        continue
+                    score = float(np.dot(entry.vector, query))
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entries.move_to_end(best_id)
+            self._users.move_to_end(user_id)
+            entry = entries[best_id]
+            self.hits          += 1
+            self.seconds_saved += entry.seconds
+            return entry.response
+
+    def put(self, user_id, vector, context_key, response, seconds=0.0):
+        """Cache `response`; `seconds` is what producing it cost, credited on every later hit."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is None:
+                entries = self._users[user_id] = OrderedDict()
+            self._users.move_to_end(user_id)
+
+            self._next_id += 1
+            entries[self._next_id] = _Entry(context_key, _unit(vector), response, time.time(), seconds)
+            self._size += 1
+
+            while len(entries) > self.max_per_user:
+                entries.popitem(last=False)
+                self._size     -= 1
+                self.evictions += 1
+            while self._size > self.max_entries:
+                lru_user, lru_entries = next(iter(self._users.items()))
+                lru_entries.popitem(last=False)
+                self._size     -= 1
+                self.evictions += 1
+                if not lru_entries:
+                    del self._users[lru_user]
+
+    def clear(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                self._size = 0
+            else:
+                self._size -= len(self._users.pop(user_id, ()))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries":       self._size,
+                "users":         len(self._users),
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "hit_rate":      round(self.hits / lookups, 4) if lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "evictions":     self.evictions,
+                "expirations":   self.expirations,
+            }
+
+    def __len__(self):
+        return self._size
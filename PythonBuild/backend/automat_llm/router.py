@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import weakref
+import threading
+from   typing import Any, List, Optional
+
+import httpx
+from   langchain_core.language_models.chat_models import BaseChatModel
+from   langchain_core.messages                    import AIMessage, AIMessageChunk
+from   langchain_core.outputs                     import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from   automat_llm.metrics import LatencyHistogram
+
+# OpenAI-compatible endpoints of the hosted backends listed in the README
+PROVIDER_URLS = {
+    "groq": "https://api.groq.com/openai/v1",
+    "xai":  "https://api.x.ai/v1",
+}
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+class ProviderError(RuntimeError):
+    """A backend failed or timed out; the router moves on to the next one."""
+
+
+def to_openai_messages(messages):
+    """LangChain messages -> OpenAI chat format"""
+    return [{"role": _ROLES.get(message.type, "user"), "content": message.content} for message in messages]
+
+
+class HTTPProvider:
+    """
+    OpenAI-compatible chat completions backend (Groq, xAI, or a local stub).
+
+    Keeps one pooled sync `httpx` client for the life of the process, and
+    one pooled async client per event loop (an AsyncClient's connections
+    belong to the loop that opened them), so requests reuse warm TLS
+    connections instead of reconnecting per call. aclose() closes the
+    running loop's async client.
+    """
+
+    def __init__(self, name, base_url, model, api_key=None, timeout=30.0, max_connections=20):
+        self.name     = name
+        self.base_url = base_url.rstrip("/")
+        self.model    = model
+        self.timeout  = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._limits  = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client  = httpx.Client(base_url=self.base_url, headers=self._headers, timeout=self.timeout, limits=self._limits)
+        self._aclients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient, created lazily
+
+    def _async_client(self):
+        loop   = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(base_url=self.base_url, headers=self._headers,
+                                       timeout=self.timeout, limits=self._limits)
+            self._aclients[loop] = client
+        return client
+
+    def _payload(self, messages, temperature, max_tokens, stream=False):
+        return {"model": self.model, "messages": messages, "temperature": temperature,
+                "max_tokens": max_tokens, "stream": stream}
+
+    @staticmethod
+    def _content(response):
+        if response.status_code >= 400:
+            raise ProviderError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+    @staticmethod
+    def _delta(line):
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        return json.loads(data)["choices"][0].get("delta", {}).get("content") or None
+
+    def complete(self, messages, temperature=0.5, max_tokens=1024):
+        response = self._client.post("/chat/completions", json=self._payload(messages, temperature, max_tokens))
+        return self._content(response)
+
+    async def acomplete(self, messages, temperature=0.5, max_tokens=1024):
+        response = await self._async_client().post("/chat/completions", json=self._payload(messages, temperature, max_tokens))
+        return self._content(response)
+
+    def stream(self, messages, temperature=0.5, max_tokens=1024):
+        payload = self._payload(messages, temperature, max_tokens, stream=True)
+        with self._client.stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code >= 400:
+                raise ProviderError(f"HTTP {response.status_code}")
+            for line in response.iter_lines():
+                token = self._delta(line)
+                if token:
+                    yield token
+
+    async def astream(self, messages, temperature=0.5, max_tokens=1024):
+        payload = self._payload(messages, temperature, max_tokens, stream=True)
+        async with self._async_client().stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code >= 400:
+                raise ProviderError(f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                token = self._delta(line)
+                if token:
+                    yield token
+
+    async def aclose(self):
+        client = self._aclients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self._client.close()
+
+
+class LocalTransformersProvider:
+    """
+    Last-resort backend: a transformers text-generation pipeline loaded on
+    first use. Slow and small, but it answers when every remote call failed.
+    """
+
+    def __init__(self, model="distilgpt2", max_new_tokens=200):
+        self.name           = f"local:{model}"
+        self.model          = model
+        self.max_new_tokens = max_new_tokens
+        self._pipeline      = None
+        self._lock          = threading.Lock()
+
+    def _pipe(self):
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+                self._pipeline = pipeline("text-generation", model=self.model)
+            return self._pipeline
+
+    def complete(self, messages, temperature=0.5, max_tokens=1024):
+        prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages) + "\nassistant:"
+        output = self._pipe()(prompt, max_new_tokens=min(max_tokens, self.max_new_tokens),
+                              num_return_sequences=1, return_full_text=False)
+        return output[0]["generated_text"].strip()
+
+    async def acomplete(self, messages, temperature=0.5, max_tokens=1024):
+        return await asyncio.get_running_loop().run_in_executor(None, self.complete, messages, temperature, max_tokens)
+
+    def stream(self, messages, temperature=0.5, max_tokens=1024):
+        yield self.complete(messages, temperature, max_tokens)
+
+    async def astream(self, messages, temperature=0.5, max_tokens=1024):
+        yield await self.acomplete(messages, temperature, max_tokens)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Health:
+    """Latency and failure bookkeeping for one backend."""
+
+    def __init__(self):
+        self.latency     = LatencyHistogram()
+        self.ewma        = None
+        self.failures    = 0
+        self.consecutive = 0
+        self.open_until  = 0.0
+        self.last_error  = None
+
+
+class ProviderRouter:
+    """
+    Routes chat completions across backends by health and latency.
+
+    Healthy backends are tried fastest first (exponentially weighted moving
+    average of recent latencies; untried ones first so they get measured).
+    After `max_failures` consecutive errors or timeouts a backend is skipped
+    for `cooldown` seconds and then given one trial request. If every
+    remote backend fails, `fallback` (a LocalTransformersProvider) answers.
+    """
+
+    def __init__(self, providers, fallback=None, max_failures=3, cooldown=30.0, alpha=0.2):
+        self.providers    = list(providers)
+        self.fallback     = fallback
+        self.max_failures = max_failures
+        self.cooldown     = cooldown
+        self.alpha        = alpha
+        self._health      = {p.name: _Health() for p in self.providers + ([fallback] if fallback else [])}
+        self._lock        = threading.Lock()
+        self.fallbacks    = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Backends from the environment: Groq when GROQ_API_KEY is set, xAI when
+        XAI_API_KEY is set, local transformers (CYBEL_LOCAL_MODEL) as fallback.
+        """
+        timeout   = float(os.environ.get("CYBEL_LLM_TIMEOUT", 30))
+        providers = []
+        if os.environ.get("GROQ_API_KEY"):
+            providers.append(HTTPProvider("groq", PROVIDER_URLS["groq"], os.environ.get("CYBEL_GROQ_MODEL", "openai/gpt-oss-20b"),
+                                          os.environ["GROQ_API_KEY"], timeout))
+        if os.environ.get("XAI_API_KEY"):
+            providers.append(HTTPProvider("xai", PROVIDER_URLS["xai"], os.environ.get("CYBEL_XAI_MODEL", "grok-3-mini"),
+                                          os.environ["XAI_API_KEY"], timeout))
+        fallback = None
+        if os.environ.get("CYBEL_LOCAL_MODEL", "distilgpt2").lower() not in ("", "0", "none"):
+            fallback = LocalTransformersProvider(os.environ.get("CYBEL_LOCAL_MODEL", "distilgpt2"))
+        return cls(providers, fallback=fallback)
+
+    # ---------- routing ----------
+    def order(self):
+        """Backends to try, fastest first; ones still cooling down after failures are left out."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [p for p in self.providers if self._health[p.name].open_until <= now]
+            healthy.sort(key=lambda p: self._health[p.name].ewma or 0.0)
+        return healthy
+
+    def _record(self, provider, seconds=None, error=None):
+        with self._lock:
+            health = self._health[provider.name]
+            if error is None:
+                health.latency.observe(seconds)
+                health.ewma        = seconds if health.ewma is None else (1 - self.alpha) * health.ewma + self.alpha * seconds
+                health.consecutive = 0
+                health.open_until  = 0.0
+                return
+            health.failures    += 1
+            health.consecutive += 1
+            health.last_error   = f"{type(error).__name__}: {error}"
+            if health.consecutive >= self.max_failures:
+                health.open_until = time.monotonic() + self.cooldown
+        logging.warning(f"LLM backend {provider.name} failed: {health.last_error}")
+
+    def _candidates(self):
+        candidates = self.order()
+        if self.fallback is not None:
+            candidates.append(self.fallback)
+        if not candidates and self.providers:
+            raise ProviderError("Every LLM backend is cooling down after repeated failures")
+        if not candidates:
+            raise ProviderError("No LLM backend configured (set GROQ_API_KEY, XAI_API_KEY or CYBEL_LOCAL_MODEL)")
+        return candidates
+
+    def _note_fallback(self, provider):
+        if provider is self.fallback:
+            with self._lock:
+                self.fallbacks += 1
+
+    def complete(self, messages, temperature=0.5, max_tokens=1024):
+        """Returns (text, backend name)."""
+        error = None
+        for provider in self._candidates():
+            self._note_fallback(provider)
+            start = time.perf_counter()
+            try:
+                text = provider.complete(messages, temperature, max_tokens)
+            except Exception as e:
+                self._record(provider, error=e)
+                error = e
+                continue
+            self._record(provider, time.perf_counter() - start)
+            return text, provider.name
+        raise ProviderError(f"All LLM backends failed, last error: {error}")
+
+    async def acomplete(self, messages, temperature=0.5, max_tokens=1024):
+        error = None
+        for provider in self._candidates():
+            self._note_fallback(provider)
+            start = time.perf_counter()
+            try:
+                text = await provider.acomplete(messages, temperature, max_tokens)
+            except Exception as e:
+                self._record(provider, error=e)
+                error = e
+                continue
+            self._record(provider, time.perf_counter() - start)
+            return text, provider.name
+        raise ProviderError(f"All LLM backends failed, last error: {error}")
+
+    def stream(self, messages, temperature=0.5, max_tokens=1024):
+        """Yields text; fails over only while nothing has been yielded yet."""
+        error = None
+        for provider in self._candidates():
+            self._note_fallback(provider)
+            start, started = time.perf_counter(), False
+            try:
+                for token in provider.stream(messages, temperature, max_tokens):
+                    started = True
+                    yield token
+            except Exception as e:
+                self._record(provider, error=e)
+                if started:
+                    raise
+                error = e
+                continue
+            self._record(provider, time.perf_counter() - start)
+            return
+        raise ProviderError(f"All LLM backends failed, last error: {error}")
+
+    async def astream(self, messages, temperature=0.5, max_tokens=1024):
+        error = None
+        for provider in self._candidates():
+            self._note_fallback(provider)
+            start, started = time.perf_counter(), False
+            try:
+                async for token in provider.astream(messages, temperature, max_tokens):
+                    started = True
+                    yield token
+            except Exception as e:
+                self._record(provider, error=e)
+                if started:
+                    raise
+                error = e
+                continue
+            self._record(provider, time.perf_counter() - start)
+            return
+        raise ProviderError(f"All LLM backends failed, last error: {error}")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "fallbacks": self.fallbacks,
+                "backends": {
+                    name: {
+                        "healthy":    health.open_until <= now,
+                        "ewma_ms":    round(health.ewma * 1000, 2) if health.ewma is not None else None,
+                        "failures":   health.failures,
+                        "last_error": health.last_error,
+                        "latency":    health.latency.snapshot(),
+                    }
+                    for name, health in self._health.items()
+                },
+            }
+
+    async def aclose(self):
+        """Close the backends' async clients for the running event loop."""
+        for provider in self.providers + ([self.fallback] if self.fallback else []):
+            await provider.aclose()
+
+    def close(self):
+        for provider in self.providers + ([self.fallback] if self.fallback else []):
+            provider.close()
+
+
+class RoutedChatModel(BaseChatModel):
+    """LangChain chat model backed by a ProviderRouter, so it drops into `prompt | llm` chains."""
+
+    router: Any
+    temperature: float = 0.5
+    max_tokens: int = 1024
+
+    @property
+    def _llm_type(self):
+        return "cybel-router"
+
+    def _result(self, text, backend):
+        message = AIMessage(content=text, response_metadata={"backend": backend})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        return self._result(*self.router.complete(to_openai_messages(messages), self.temperature, self.max_tokens))
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        return self._result(*await self.router.acomplete(to_openai_messages(messages), self.temperature, self.max_tokens))
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        for token in self.router.stream(to_openai_messages(messages), self.temperature, self.max_tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        async for token in self.router.astream(to_openai_messages(messages), self.temperature, self.max_tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -1,41 +1,203 @@
 import json
 import time
-import uuid
-import paho.mqtt.client as mqtt
-from transformers import pipeline
+import queue
+import threading
+from   collections import Counter
 
-# Setup local LLM pipeline (can be changed to any local model)
-llm = pipeline("text-generation", model="distilgpt2")
+import paho.mqtt.client as mqtt
 
-MQTT_BROKER = "localhost"
+MQTT_BROKER   = "localhost"
 REQUEST_TOPIC = "llm/requests"
+STATS_TOPIC   = "llm/stats"
 
-def on_connect(client, userdata, flags, rc):
-    print(f"Connected with result code {rc}")
-    client.subscribe(REQUEST_TOPIC)
+MODEL_NAME     = "distilgpt2"  # can be changed to any local model
+MAX_NEW_TOKENS = 200   # generated per prompt, however long the prompt or the others in its batch
+MAX_BATCH_SIZE = 8     # prompts per pipeline call
+MAX_WAIT_MS    = 25    # how long the first prompt of a batch waits for company
+MAX_QUEUE      = 256   # requests beyond this are rejected instead of piling up
+STATS_INTERVAL = 10.0  # seconds between retained stats messages
 
-def on_message(client, userdata, msg):
-    try:
-        data = json.loads(msg.payload.decode())
-        prompt = data["prompt"]
-        request_id = data["request_id"]
-        response_topic = f"llm/responses/{request_id}"
-        print(f"Received prompt: {prompt}")
 
-        # Run model inference
-        output = llm(prompt, max_length=200, num_return_sequences=1)[0]["generated_text"]
+def load_pipeline(model=MODEL_NAME):
+    """Local text-generation pipeline set up for padded batches."""
+    from transformers import pipeline
+    llm = pipeline("text-generation", model=model)
+    # Decoder-only models have no pad token and must pad on the left to batch
+    if llm.tokenizer.pad_token_id is None:
+        llm.tokenizer.pad_token_id = llm.model.config.eos_token_id
+    llm.tokenizer.padding_side = "left"
+    return llm
+
+
+def pipeline_generator(llm, max_new_tokens=MAX_NEW_TOKENS):
+    """
+    Adapt a pipeline to `generate(prompts) -> texts`, one padded forward pass per batch.
+
+    The budget is `max_new_tokens`, not `max_length`: a left-padded batch
+    pads every prompt to the longest, so a total-length cap would leave a
+    short prompt fewer new tokens than it gets on its own.
+    """
+    def generate(prompts):
+        outputs = llm(prompts, max_new_tokens=max_new_tokens, num_return_sequences=1, batch_size=len(prompts))
+        return [output[0]["generated_text"] for output in outputs]
+    return generate
+
+
+class BatchingInferenceWorker:
+    """
+    Collects prompts from MQTT and runs them through the model in micro-batches.
+
+    `submit()` only enqueues, so the paho network thread never blocks on
+    inference and keepalives keep flowing. A worker thread takes the first
+    waiting request, waits up to `max_wait_ms` for up to `max_batch_size - 1`
+    more, runs one `generate(prompts)` call for the batch and hands each
+    result to `publish(request_id, text)`.
+
+    Parameters:
+    - generate (callable): `generate(list of prompts) -> list of texts`.
+    - publish (callable): `publish(request_id, response_text, error=None)`.
+    """
+
+    def __init__(self, generate, publish, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self.generate       = generate
+        self.publish        = publish
+        self.max_batch_size = max_batch_size
+        self.max_wait       = max_wait_ms / 1000
+        self._queue         = queue.Queue(maxsize=max_queue)
+        self._stop          = threading.Event()
+        self._thread        = None
+        self._lock          = threading.Lock()
+
+        self.batch_sizes    = Counter()
+        self.processed      = 0
+        self.rejected       = 0
+        self.errors         = 0
+        self.busy_seconds   = 0.0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+            self._thread.start()
+        return self
 
-        # Publish response
-        response = {"request_id": request_id, "response": output}
-        client.publish(response_topic, json.dumps(response))
-        print(f"Published response to {response_topic}")
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
 
-    except Exception as e:
-        print(f"Error handling message: {e}")
+    def submit(self, request_id, prompt):
+        """Queue a prompt. Returns False (and publishes an error) when the queue is full."""
+        try:
+            self._queue.put_nowait((request_id, prompt, time.perf_counter()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            self.publish(request_id, None, error="busy")
+            return False
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        start = time.perf_counter()
+        try:
+            texts = self.generate([prompt for _, prompt, _ in batch])
+        except Exception as e:
+            print(f"Error running batch of {len(batch)}: {e}")
+            with self._lock:
+                self.errors += len(batch)
+            for request_id, _, _ in batch:
+                self.publish(request_id, None, error=str(e))
+            return
+
+        for (request_id, _, _), text in zip(batch, texts):
+            self.publish(request_id, text)
+        with self._lock:
+            self.batch_sizes[len(batch)] += 1
+            self.processed    += len(batch)
+            self.busy_seconds += time.perf_counter() - start
+
+    def stats(self):
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "queue_depth":     self._queue.qsize(),
+                "processed":       self.processed,
+                "rejected":        self.rejected,
+                "errors":          self.errors,
+                "batches":         batches,
+                "mean_batch_size": round(self.processed / batches, 2) if batches else 0.0,
+                "batch_sizes":     {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                "busy_seconds":    round(self.busy_seconds, 3),
+            }
+
+
+def mqtt_publisher(client):
+    """Publish results to llm/responses/{request_id}, the topic each requester listens on."""
+    def publish(request_id, response_text, error=None):
+        payload = {"request_id": request_id, "response": response_text}
+        if error is not None:
+            payload["error"] = error
+        client.publish(f"llm/responses/{request_id}", json.dumps(payload))
+    return publish
+
+
+def main():
+    llm    = load_pipeline()
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2) if hasattr(mqtt, "CallbackAPIVersion") else mqtt.Client()
+    worker = BatchingInferenceWorker(pipeline_generator(llm), mqtt_publisher(client))
+
+    def on_connect(client, userdata, flags, rc, properties=None):
+        print(f"Connected with result code {rc}")
+        client.subscribe(REQUEST_TOPIC)
+
+    def on_message(client, userdata, msg):
+        # Runs on the network thread: parse and enqueue only
+        try:
+            data = json.loads(msg.payload.decode())
+            worker.submit(data["request_id"], data["prompt"])
+        except Exception as e:
+            print(f"Error handling message: {e}")
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, 1883, 60)
+    worker.start()
+    client.loop_start()
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            stats = worker.stats()
+            client.publish(STATS_TOPIC, json.dumps(stats), retain=True)
+            print(f"queue={stats['queue_depth']} processed={stats['processed']} mean_batch={stats['mean_batch_size']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        client.loop_stop()
+        client.disconnect()
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
 
-client.connect(MQTT_BROKER, 1883, 60)
-client.loop_forever()
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,164 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 import asyncio
 import uvicorn
 import json
+import os
+import time
 import uuid
 from gmqtt import Client as MQTTClient
 
-app = FastAPI()
-
 # ---------- CONFIG ----------
-MQTT_BROKER_HOST = 'localhost'
-MQTT_PORT = 1883
-MQTT_TOPIC_REQUEST = 'robot/llm/request'
-MQTT_TOPIC_RESPONSE = 'robot/llm/response'
-CLIENT_ID = f'fastapi-mqtt-server-{uuid.uuid4()}'
-
-# Store awaiting responses
-pending_requests = {}
-
-# ---------- MQTT SETUP ----------
-class MQTTHandler:
-    def __init__(self):
-        self.client = MQTTClient(CLIENT_ID)
+MQTT_BROKER_HOST     = os.environ.get("MQTT_BROKER_HOST", "localhost")
+MQTT_PORT            = int(os.environ.get("MQTT_PORT", 1883))
+MQTT_VERSION         = int(os.environ.get("MQTT_VERSION", 4))  # 4 = MQTT 3.1.1, 5 = MQTT 5
+MQTT_TOPIC_REQUEST   = 'llm/requests'      # automat_client.py listens here
+MQTT_TOPIC_RESPONSES = 'llm/responses/+'   # ...and answers on llm/responses/{request_id}
+REQUEST_TIMEOUT      = float(os.environ.get("LLM_REQUEST_TIMEOUT", 10))
+MAX_IN_FLIGHT        = int(os.environ.get("LLM_MAX_IN_FLIGHT", 64))
+CLIENT_ID            = f'fastapi-mqtt-server-{uuid.uuid4()}'
+
+
+class Overloaded(Exception):
+    """Too many requests are already waiting for the LLM."""
+
+
+# ---------- MQTT RPC ----------
+class MQTTRPC:
+    """
+    Request/response over MQTT for the FastAPI server.
+
+    Publishes `{"request_id", "prompt"}` to the request topic and keeps one
+    wildcard subscription for all replies. Each call parks a Future in the
+    pending table under its correlation id; the message handler resolves it.
+    At most `max_in_flight` calls wait at once, and a call that times out or
+    is cancelled (client went away) removes its entry, so late replies are
+    simply dropped.
+    """
+
+    def __init__(self, client_id=CLIENT_ID, request_topic=MQTT_TOPIC_REQUEST, response_topic=MQTT_TOPIC_RESPONSES,
+                 timeout=REQUEST_TIMEOUT, max_in_flight=MAX_IN_FLIGHT):
+        self.request_topic  = request_topic
+        self.response_topic = response_topic
+        self.timeout        = timeout
+        self.max_in_flight  = max_in_flight
+        self.pending        = {}  # request_id -> Future
+        self._slots         = None
+        self._connected     = None
+        self.host           = None
+
+        self.client = MQTTClient(client_id)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
 
+        self.completed = 0
+        self.timeouts  = 0
+        self.rejected  = 0
+        self.late      = 0
+
+    async def connect(self, host=MQTT_BROKER_HOST, port=MQTT_PORT, version=MQTT_VERSION):
+        # Created here so they belong to the loop uvicorn is running
+        self.host       = host
+        self._slots     = asyncio.Semaphore(self.max_in_flight)
+        self._connected = asyncio.Event()
+        await self.client.connect(host, port, version=version)
+        await asyncio.wait_for(self._connected.wait(), self.timeout)
+
+    async def disconnect(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        await self.client.disconnect()
+
     def on_connect(self, client, flags, rc, properties):
-        print(f"Connected to MQTT Broker at {MQTT_BROKER_HOST}")
-        client.subscribe(MQTT_TOPIC_REQUEST)
+        print(f"Connected to MQTT Broker at {self.host}")
+        # (Re)subscribe on every connect so a broker restart does not lose the replies
+        client.subscribe(self.response_topic)
+        self._connected.set()
+
+    def on_message(self, client, topic, payload, qos, properties):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            print(f"Ignoring malformed reply on {topic}")
+            return 0
+        request_id = message.get("request_id") or topic.rsplit("/", 1)[-1]
+        future     = self.pending.get(request_id)
+        if future is None or future.done():
+            self.late += 1  # timed out, cancelled, or not ours
+            return 0
+        future.set_result(message)
+        return 0
+
+    async def call(self, prompt, timeout=None):
+        """Send a prompt and wait for its reply dict. Raises Overloaded or asyncio.TimeoutError."""
+        timeout = timeout or self.timeout
+        if self._slots.locked():
+            self.rejected += 1
+            raise Overloaded(f"{self.max_in_flight} requests already in flight")
+
+        async with self._slots:
+            request_id = str(uuid.uuid4())
+            future     = asyncio.get_running_loop().create_future()
+            self.pending[request_id] = future
+            try:
+                self.client.publish(self.request_topic, json.dumps({"request_id": request_id, "prompt": prompt}))
+                reply = await asyncio.wait_for(future, timeout)
+                self.completed += 1
+                return reply
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            finally:
+                self.pending.pop(request_id, None)
+
+    def stats(self):
+        return {
+            "in_flight": len(self.pending),
+            "completed": self.completed,
+            "timeouts":  self.timeouts,
+            "rejected":  self.rejected,
+            "late":      self.late,
+        }
 
-    async def on_message(self, client, topic, payload, qos, properties):
-        message = json.loads(payload)
-        print(f"Received on {topic}: {message}")
 
-        request_id = message.get("request_id")
-        prompt = message.get("prompt")
+rpc = MQTTRPC()
 
-        # Simulate LLM response (replace this with real LLM call)
-        response_text = f"LLM Response to: {prompt}"
 
-        response = {
-            "request_id": request_id,
-            "response": response_text
-        }
-        client.publish(MQTT_TOPIC_RESPONSE, json.dumps(response))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect to the broker on uvicorn's event loop and disconnect on shutdown."""
+    await rpc.connect()
+    yield
+    await rpc.disconnect()
 
-mqtt_handler = MQTTHandler()
+app = FastAPI(lifespan=lifespan)
 
 # ---------- API MODEL ----------
 class LLMRequest(BaseModel):
     prompt: str
 
-# ---------- FASTAPI ENDPOINT ----------
+# ---------- FASTAPI ENDPOINTS ----------
 @app.post("/query")
 async def query_llm(req: LLMRequest):
-    request_id = str(uuid.uuid4())
-    payload = {
-        "request_id": request_id,
-        "prompt": req.prompt
-    }
-    pending_requests[request_id] = asyncio.Future()
-
-    mqtt_handler.client.publish(MQTT_TOPIC_REQUEST, json.dumps(payload))
-
+    start = time.perf_counter()
     try:
-        result = await asyncio.wait_for(pending_requests[request_id], timeout=10)
-        return {"response": result}
+        reply = await rpc.call(req.prompt)
+    except Overloaded as e:
+        return JSONResponse({"error": f"LLM busy: {e}"}, status_code=503)
     except asyncio.TimeoutError:
-        return {"error": "LLM response timeout"}
-    finally:
-        del pending_requests[request_id]
+        return JSONResponse({"error": "LLM response timeout"}, status_code=504)
 
-# ---------- MQTT RESPONSE HANDLER ----------
-@mqtt_handler.client.on_message
-async def handle_response(client, topic, payload, qos, properties):
-    data = json.loads(payload)
-    request_id = data.get("request_id")
-    response = data.get("response")
+    if reply.get("error"):
+        return JSONResponse({"error": reply["error"]}, status_code=502)
+    return {"response": reply.get("response"), "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
 
-    if request_id in pending_requests:
-        pending_requests[request_id].set_result(response)
+@app.get("/stats")
+async def stats():
+    return rpc.stats()
 
 # ---------- MAIN ----------
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    loop.create_task(mqtt_handler.client.connect(MQTT_BROKER_HOST))
     uvicorn.run(app, host="0.0.0.0", port=8000)
-    loop.run_forever()
\ No newline at end of file
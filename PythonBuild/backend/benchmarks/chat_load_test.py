@@ -0,0 +1,118 @@
+"""
+Load test for the chat path using a local stub LLM.
+
+Runs N concurrent clients against generate_response (blocking, as the old
+/chat route did) and agenerate_response (the async path used by api.py) and
+prints p50/p99 latency for each, then the same split by request stage
+(embedding, vector_search, llm, ...) as exported on /metrics. No Groq or
+Weaviate access is needed.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/chat_load_test.py --clients 50 --requests 5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages  import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from automat_llm         import core
+from automat_llm.chain   import CybelRagChain
+from automat_llm.core    import generate_response, agenerate_response, install_executor
+from automat_llm.metrics import StageMetrics
+
+RUDE_KEYWORDS    = ["stupid", "idiot", "shut up", "useless", "dumb"]
+PERSONALITY_DATA = {"example_dialogue": []}
+
+
+class StubEmbeddings:
+    """Blocking embedding work, like HuggingFace embeddings on CPU."""
+
+    def __init__(self, embed_ms):
+        self.embed_s = embed_ms / 1000
+
+    def embed_query(self, text):
+        time.sleep(self.embed_s)
+        return [1.0, 0.0]
+
+
+def stub_rag_chain(embed_ms=15, llm_ms=200):
+    """CybelRagChain with blocking embedding work, an empty memory search and a network-bound stub LLM."""
+    llm_s = llm_ms / 1000
+
+    def reply(inputs):
+        time.sleep(llm_s)
+        return AIMessage(content=f"Stub reply to: {inputs['input']}")
+
+    async def areply(inputs):
+        await asyncio.sleep(llm_s)
+        return AIMessage(content=f"Stub reply to: {inputs['input']}")
+
+    return CybelRagChain(StubEmbeddings(embed_ms), lambda query, vector, k, user_id=None: [],
+                         RunnableLambda(reply, afunc=areply))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index   = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_clients(mode, chain, clients, requests):
+    user_interactions = {"users": {}}
+    latencies = []
+
+    async def client(n):
+        user_id = f"load-user-{n}"
+        for i in range(requests):
+            start = time.perf_counter()
+            await asyncio.sleep(0)  # request is queued on the loop, as it would be behind a socket read
+            if mode == "async":
+                await agenerate_response(user_id, user_interactions, f"hello {i}", RUDE_KEYWORDS, PERSONALITY_DATA, chain)
+            else:
+                generate_response(user_id, user_interactions, f"hello {i}", RUDE_KEYWORDS, PERSONALITY_DATA, chain)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def main(args):
+    install_executor(max_workers=args.workers)
+    chain = stub_rag_chain(embed_ms=args.embed_ms, llm_ms=args.llm_ms)
+
+    print(f"{args.clients} clients x {args.requests} requests, stub embed={args.embed_ms}ms llm={args.llm_ms}ms")
+    stages = {}
+    for mode in args.modes:
+        core.request_stages = StageMetrics()
+        latencies, elapsed  = await run_clients(mode, chain, args.clients, args.requests)
+        stages[mode]        = core.request_stages.snapshot()
+        print(
+            f"{mode:>5}: p50={percentile(latencies, 50) * 1000:8.1f}ms  "
+            f"p99={percentile(latencies, 99) * 1000:8.1f}ms  "
+            f"mean={statistics.mean(latencies) * 1000:8.1f}ms  "
+            f"throughput={len(latencies) / elapsed:7.1f} req/s"
+        )
+
+    for mode, snapshot in stages.items():
+        print(f"\n{mode} by stage:")
+        for stage, latency in sorted(snapshot.items(), key=lambda item: -item[1]["p99_ms"]):
+            print(f"  {stage:>14}: p50={latency['p50_ms']:8.2f}ms  p99={latency['p99_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent chat load test against a stub LLM.")
+    parser.add_argument("--clients",  type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--embed-ms", type=int, default=15)
+    parser.add_argument("--llm-ms",   type=int, default=200)
+    parser.add_argument("--workers",  type=int, default=4, help="Embedding thread pool size")
+    parser.add_argument("--modes",    nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    asyncio.run(main(parser.parse_args()))
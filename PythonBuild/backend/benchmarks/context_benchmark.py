@@ -0,0 +1,74 @@
+"""
+Prompt size before and after token-budgeted context assembly.
+
+Queries and conversation history are sampled from the Input_JSON corpus,
+the top-k memories are retrieved with the hashing embedder from
+retrieval_benchmark.py, and the human prompt is rendered twice: the old way
+(all k Documents dropped into {context}, 8 history messages) and through
+ContextBuilder. Token counts use the same counter the chain logs.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/context_benchmark.py --queries 200 --k 10 --budget 1500
+"""
+import os
+import sys
+import random
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents  import Document
+from retrieval_benchmark       import HashEmbeddings, load_corpus
+from automat_llm.context       import ContextBuilder, count_tokens, _encoding
+
+HUMAN_TEMPLATE = "{input}\n\n=== Current Conversation ===\n{conversation_history}\n\n=== Past Conversations (Long-term Memory) ===\n{context}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    here  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    texts = load_corpus(os.path.join(here, "Input_JSON"))
+    rng   = random.Random(0)
+
+    embeddings = HashEmbeddings()
+    vectors    = embeddings.embed_documents(texts)
+    vectors   /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    builder    = ContextBuilder(max_tokens=args.budget)
+
+    print(f"{len(texts)} memories, k={args.k}, budget={args.budget} tokens, "
+          f"tokenizer={'tiktoken' if _encoding() is not None else 'estimate'}")
+
+    before, after, kept, duplicates = [], [], [], []
+    for _ in range(args.queries):
+        query   = rng.choice(texts)
+        history = "\n".join(f"{'User' if i % 2 == 0 else 'Cybel'}: {rng.choice(texts)}" for i in range(8))
+
+        q      = embeddings.embed_query(query)
+        q     /= max(np.linalg.norm(q), 1e-12)
+        scores = vectors @ q
+        top    = np.argsort(-scores)[:args.k]
+        docs   = [Document(page_content=texts[i], metadata={"score": float(scores[i])}) for i in top]
+
+        before.append(count_tokens(HUMAN_TEMPLATE.format(input=query, conversation_history=history, context=docs)))
+        history_text, context, stats = builder.build(query, history, docs)
+        after.append(count_tokens(HUMAN_TEMPLATE.format(input=query, conversation_history=history_text, context=context)))
+        kept.append(stats["memories_kept"])
+        duplicates.append(stats["memories_retrieved"] - stats["memories_unique"])
+
+    print(f"prompt tokens before: mean={statistics.mean(before):7.1f}  p95={sorted(before)[int(len(before) * 0.95)]}")
+    print(f"prompt tokens after:  mean={statistics.mean(after):7.1f}  p95={sorted(after)[int(len(after) * 0.95)]}")
+    print(f"memories kept: mean={statistics.mean(kept):.1f}/{args.k}, duplicates dropped: mean={statistics.mean(duplicates):.2f}")
+    print(f"reduction: {100 * (1 - statistics.mean(after) / statistics.mean(before)):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Shared embedding service: dynamic batching across callers and the on-disk
+float16 cache.
+
+Many threads each embed single queries (like concurrent chat requests) three
+ways:
+
+  - direct: every caller runs the model itself, one text per call;
+  - batched: calls go through EmbeddingService, which merges them;
+  - cached: the same texts again from a new service over the same cache
+    directory (a restarted process), which never runs the model.
+
+The default stand-in model costs a fixed overhead per call plus a little
+per text, like a small transformer on CPU; --real uses all-MiniLM-L6-v2
+(needs sentence-transformers). Also reports the float16 round-trip error.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/embedding_service_benchmark.py --threads 32 --texts 2000
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.embedding_service import EmbeddingService
+
+
+class StandInModel:
+    """Deterministic 384-d vectors; `call_ms` per call plus `text_ms` per text."""
+
+    def __init__(self, call_ms, text_ms, dim=384):
+        self.call_s, self.text_s, self.dim = call_ms / 1000, text_ms / 1000, dim
+        self._lock = threading.Lock()  # one forward pass at a time, like a single model instance
+
+    def __call__(self, texts):
+        with self._lock:
+            time.sleep(self.call_s + self.text_s * len(texts))
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+            row  = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            rows.append(row / np.linalg.norm(row))
+        return np.stack(rows)
+
+
+def run(embed, texts, threads):
+    results = [None] * len(texts)
+
+    def worker(n):
+        for i in range(n, len(texts), threads):
+            results[i] = embed(texts[i])
+
+    start   = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, np.stack(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--call-ms", type=float, default=4.0)
+    parser.add_argument("--text-ms", type=float, default=0.1)
+    parser.add_argument("--real", action="store_true", help="use all-MiniLM-L6-v2 instead of the stand-in")
+    args = parser.parse_args()
+
+    texts     = [f"memory {i}: the user mentioned item {i * 7919 % 1000} near deck {i % 13}" for i in range(args.texts)]
+    cache_dir = tempfile.mkdtemp()
+    encoder   = None if args.real else StandInModel(args.call_ms, args.text_ms)
+
+    print(f"{args.texts} single-text calls from {args.threads} threads"
+          + ("" if args.real else f", stand-in model {args.call_ms}ms/call + {args.text_ms}ms/text"))
+    if args.real:
+        model  = EmbeddingService(cache_dir=None).load()._model
+        direct = lambda text: model.encode([text], convert_to_numpy=True)[0]
+    else:
+        direct = lambda text: encoder([text])[0]
+    seconds, reference = run(direct, texts, args.threads)
+    print(f"  direct : {args.texts / seconds:8.0f} texts/s")
+
+    service = EmbeddingService(cache_dir=cache_dir, encoder=encoder)
+    seconds, batched = run(service.embed_query, texts, args.threads)
+    stats = service.stats()
+    print(f"  batched: {args.texts / seconds:8.0f} texts/s  ({stats['batches']} model calls, "
+          f"mean batch {stats['mean_batch']})")
+
+    restarted = EmbeddingService(cache_dir=cache_dir, encoder=encoder)
+    seconds, cached = run(restarted.embed_query, texts, args.threads)
+    stats = restarted.stats()
+    print(f"  cached : {args.texts / seconds:8.0f} texts/s  ({stats['cache_hits']} cache hits, "
+          f"{stats['batches']} model calls)")
+
+    print(f"\nresult type {type(cached).__name__} {cached.dtype}; "
+          f"max |batched - direct| {np.abs(batched - reference).max():.2e}, "
+          f"max |cached - direct| {np.abs(cached - reference).max():.2e} (float16 storage)")
+
+
+if __name__ == "__main__":
+    main()
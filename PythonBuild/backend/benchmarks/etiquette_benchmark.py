@@ -0,0 +1,75 @@
+"""
+Rudeness detection cost as the keyword list grows: the old
+`any(keyword in input_lower ...)` scan vs. the compiled KeywordMatcher.
+
+Keywords are synthetic words plus the real defaults; messages are lines
+from Input_JSON, so most of them do not match (the common case).
+
+Usage (from PythonBuild/backend):
+    python benchmarks/etiquette_benchmark.py --sizes 5 100 1000 5000
+"""
+import os
+import sys
+import glob
+import json
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.etiquette import KeywordMatcher, DEFAULT_RUDE_KEYWORDS
+
+
+def load_messages(directory, limit):
+    messages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                if isinstance(item, dict) and "Entry" in item:
+                    messages.extend(line for line in item["Entry"].splitlines() if line.strip())
+    return messages[:limit]
+
+
+def keywords(n, rng):
+    words = list(DEFAULT_RUDE_KEYWORDS)
+    while len(words) < n:
+        words.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))))
+    return words
+
+
+def time_per_message(fn, messages, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 100, 1000, 5000])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    here     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    messages = load_messages(os.path.join(here, "Input_JSON"), args.messages) or ["you are so dumb"] * args.messages
+    rng      = random.Random(0)
+    print(f"{len(messages)} messages (avg {sum(map(len, messages)) // len(messages)} chars)")
+
+    for n in args.sizes:
+        words   = keywords(n, rng)
+        start   = time.perf_counter()
+        matcher = KeywordMatcher(words)
+        build   = (time.perf_counter() - start) * 1e3
+
+        scan     = time_per_message(lambda m: any(k in m.lower() for k in words), messages)
+        compiled = time_per_message(matcher.search, messages)
+        print(f"{n:>6} keywords: scan={scan:8.2f}us/msg  compiled={compiled:6.2f}us/msg  (build {build:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
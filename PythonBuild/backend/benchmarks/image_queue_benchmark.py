@@ -0,0 +1,200 @@
+"""
+Image generation: one prompt per pipeline call vs. the ImageQueue worker
+(batching compatible prompts), plus priority, cancellation and the
+reduced-memory modes.
+
+Runs on CPU with a tiny randomly initialised Stable Diffusion pipeline
+(tens of thousands of parameters, 64x64 images) built from
+configs, so nothing is downloaded; the absolute numbers are small but the
+per-call overhead that batching removes is real. Reports:
+
+  - images/s for sequential single-prompt calls and for the queue at
+    several batch sizes, and the largest pixel difference between a
+    batched image and the same prompt + seed run alone;
+  - how long a priority-10 job waits behind a backlog;
+  - how soon a running job stops after cancel();
+  - peak RSS and images/s per memory mode (each in its own process).
+    sequential_offload is only measured with CUDA; on CPU the generator
+    falls back to attention_slicing, so it would repeat that row.
+
+Needs torch, diffusers and transformers (CPU builds are enough).
+
+Usage (from PythonBuild/backend):
+    python benchmarks/image_queue_benchmark.py --images 32 --steps 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Image-Gen-Model"))
+
+import torch
+from   diffusers    import AutoencoderKL, DDIMScheduler, StableDiffusionPipeline, UNet2DConditionModel
+from   transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+from generator   import ImageGenerator
+from image_queue import ImageQueue, JobCancelled
+
+SIZE = 64
+
+
+def bytes_to_unicode():
+    """CLIP's byte -> printable character table (private in transformers, and it moves between versions)."""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    others    = [byte for byte in range(256) if byte not in printable]
+    return dict(zip(printable + others, map(chr, printable + [256 + i for i in range(len(others))])))
+
+
+def tiny_tokenizer(directory):
+    """A byte-level CLIP tokenizer with no merges (one token per character), written to `directory`."""
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 2, "!": 1}
+    for char in bytes_to_unicode().values():
+        for token in (char, char + "</w>"):
+            vocab.setdefault(token, len(vocab) + 1)
+    with open(os.path.join(directory, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(directory, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    return CLIPTokenizer(os.path.join(directory, "vocab.json"), os.path.join(directory, "merges.txt"), model_max_length=77)
+
+
+def tiny_pipeline():
+    """The small Stable Diffusion pipeline diffusers' own tests use, without the hub."""
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(
+        block_out_channels=(4, 8), layers_per_block=1, sample_size=SIZE // 2, in_channels=4, out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"), up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32, norm_num_groups=2,
+    )
+    vae = AutoencoderKL(
+        block_out_channels=[4, 8], in_channels=3, out_channels=3, latent_channels=4, norm_num_groups=2,
+        down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"], up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+    )
+    text_encoder = CLIPTextModel(CLIPTextConfig(
+        bos_token_id=0, eos_token_id=2, pad_token_id=1, hidden_size=32, intermediate_size=64,
+        num_attention_heads=8, num_hidden_layers=3, layer_norm_eps=1e-05, vocab_size=1000,
+    ))
+    scheduler = DDIMScheduler(beta_start=0.00085, beta_end=0.012, beta_schedule="scaled_linear",
+                              clip_sample=False, set_alpha_to_one=False)
+    pipe = StableDiffusionPipeline(
+        vae=vae, text_encoder=text_encoder, tokenizer=tiny_tokenizer(tempfile.mkdtemp()), unet=unet,
+        scheduler=scheduler, safety_checker=None, feature_extractor=None, requires_safety_checker=False,
+    )
+    pipe.set_progress_bar_config(disable=True)
+    return pipe
+
+
+def prompts(count):
+    return [f"a lighthouse on a cliff at dusk, study {i}" for i in range(count)]
+
+
+def sequential(generator, texts, steps):
+    start  = time.perf_counter()
+    images = [generator.generate_batch([text], SIZE, SIZE, steps, seeds=[i])[0] for i, text in enumerate(texts)]
+    return time.perf_counter() - start, images
+
+
+def queued(generator, texts, steps, max_batch):
+    queue   = ImageQueue(generator, max_batch=max_batch, max_wait_ms=20).start()
+    start   = time.perf_counter()
+    jobs    = [queue.submit(text, SIZE, SIZE, steps, seed=i) for i, text in enumerate(texts)]
+    images  = [job.result() for job in jobs]
+    seconds = time.perf_counter() - start
+    stats   = queue.stats()
+    queue.close()
+    return seconds, images, stats
+
+
+def max_diff(a, b):
+    return max(int(np.abs(np.asarray(x, dtype=np.int16) - np.asarray(y, dtype=np.int16)).max()) for x, y in zip(a, b))
+
+
+def priority_wait(generator, steps, backlog):
+    queue = ImageQueue(generator, max_batch=1, max_wait_ms=0).start()
+    jobs  = [queue.submit(text, SIZE, SIZE, steps) for text in prompts(backlog)]
+    time.sleep(0.05)
+    urgent = queue.submit("an urgent request", SIZE, SIZE, steps, priority=10)
+    urgent.result()
+    last = jobs[-1]
+    last.result()
+    queue.close()
+    return urgent.started - urgent.submitted, last.started - last.submitted
+
+
+def cancel_latency(generator, steps):
+    queue = ImageQueue(generator).start()
+    job   = queue.submit("a very long render", SIZE, SIZE, steps * 20)
+    while job.step < 2:
+        time.sleep(0.001)
+    start = time.perf_counter()
+    job.cancel()
+    try:
+        job.result()
+    except JobCancelled:
+        pass
+    queue.close()
+    return time.perf_counter() - start, job.step, job.steps
+
+
+def mode_run(mode, count, steps):
+    """Child process: images/s and peak RSS for one memory mode."""
+    generator = ImageGenerator(memory_mode=mode, pipe=tiny_pipeline())
+    generator.generate_batch(["warm up"], SIZE, SIZE, 2)
+    seconds, _, _ = queued(generator, prompts(count), steps, 4)
+    print(json.dumps({"images_per_s": count / seconds, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--batches", default="1,4,8")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)  # internal: run one memory mode in a child process
+    args = parser.parse_args()
+
+    torch.set_num_threads(max(1, os.cpu_count() // 2))
+    if args.mode:
+        return mode_run(args.mode, args.images, args.steps)
+
+    generator = ImageGenerator(pipe=tiny_pipeline())
+    texts     = prompts(args.images)
+    generator.generate_batch(["warm up"], SIZE, SIZE, 2)
+    print(f"{args.images} prompts, {args.steps} steps, {SIZE}x{SIZE}, tiny CPU pipeline")
+
+    seconds, reference = sequential(generator, texts, args.steps)
+    print(f"  one prompt per call : {args.images / seconds:7.1f} images/s")
+    for max_batch in (int(n) for n in args.batches.split(",")):
+        seconds, images, stats = queued(generator, texts, args.steps, max_batch)
+        print(f"  queue, max batch {max_batch:<2} : {args.images / seconds:7.1f} images/s  "
+              f"(mean batch {stats['mean_batch']}, max pixel diff vs. unbatched {max_diff(images, reference)})")
+
+    urgent, last = priority_wait(generator, args.steps, backlog=16)
+    print(f"\npriority 10 behind 16 queued jobs waited {urgent * 1000:.0f}ms (the last normal job: {last * 1000:.0f}ms)")
+    seconds, step, steps = cancel_latency(generator, args.steps)
+    print(f"cancel() stopped a running job after step {step}/{steps} in {seconds * 1000:.0f}ms")
+
+    print("\nmemory modes (4-prompt batches, separate processes):")
+    modes = ["full", "attention_slicing"]
+    if torch.cuda.is_available():
+        modes.append("sequential_offload")
+    for mode in modes:
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, "--images", str(args.images), "--steps", str(args.steps)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"  {mode:<19}: failed: {out.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {mode:<19}: {result['images_per_s']:7.1f} images/s, peak RSS {result['peak_rss_mb']:.0f}MB")
+    if not torch.cuda.is_available():
+        print("  sequential_offload : not measured, needs CUDA (falls back to attention_slicing on CPU)")
+
+
+if __name__ == "__main__":
+    main()
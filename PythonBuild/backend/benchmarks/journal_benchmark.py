@@ -0,0 +1,132 @@
+"""
+Text chat log vs. conversation journal: request-path cost, ingestion parse
+cost and what survives the round trip.
+
+Several threads record the same synthetic turns (multi-line responses, four
+retrieved memories each) two ways:
+
+  - text: the old `logging.info` lines under one lock, re-parsed by
+    ConversationLogReader;
+  - journal: ConversationJournal.record(), written by its background
+    thread and read back by JournalReader.
+
+Reports per-turn latency seen by the caller, total parse time and how many
+responses came back intact.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/journal_benchmark.py --turns 20000 --threads 8
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from automat_llm.ingest   import ConversationLogReader
+from automat_llm.journal  import ConversationJournal, JournalReader, turn_record, summarize
+from automat_llm.metrics  import RequestTimer
+
+DOCS = [Document(page_content=f"User: memory {i}\nBot: noted " * 8, metadata={"uuid": f"doc-{i}"}) for i in range(4)]
+
+
+def turns(count):
+    for i in range(count):
+        response = f"Sure, here is step {i}:\n\n1. open the panel\n2. press start\n\nAnything else?"
+        yield f"user-{i % 32}", f"question {i}", response
+
+
+def text_logger(path):
+    logger  = logging.getLogger("journal-benchmark")
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    lock = threading.Lock()
+
+    def log_turn(user_id, user_input, response, timer):
+        # What core._log_turn wrote before the journal
+        with lock:
+            logger.info(f"User [{user_id}]: {user_input}")
+            logger.info(f"Bot: {response}")
+            logger.info("Retrieved Memories:")
+            for doc in DOCS:
+                logger.info(f"- [past conversation] {doc.page_content[:200]}")
+            logger.info("")
+    return log_turn, handler.close
+
+
+def journal_logger(path):
+    journal = ConversationJournal(path).start()
+
+    def log_turn(user_id, user_input, response, timer):
+        journal.record(turn_record(user_id, user_input, response, DOCS, timer.breakdown()))
+    return log_turn, journal.close
+
+
+def record_all(log_turn, count, threads):
+    latencies = []
+    work      = list(turns(count))
+
+    def worker(n):
+        timer = RequestTimer()
+        for user_id, user_input, response in work[n::threads]:
+            start = time.perf_counter()
+            log_turn(user_id, user_input, response, timer)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    start   = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    tmp      = tempfile.mkdtemp()
+    expected = {(user_input, response) for _, user_input, response in turns(args.turns)}
+    readers  = {
+        "text":    (text_logger, ConversationLogReader, lambda item: (item[0], item[1])),
+        "journal": (journal_logger, JournalReader, lambda record: (record["user"], record["response"])),
+    }
+
+    print(f"{args.turns} turns from {args.threads} threads")
+    print(f"{'format':>8} {'p50 us':>8} {'p99 us':>8} {'turns/s':>10} {'file MB':>8} {'parse ms':>9} {'intact':>8}")
+    for name, (make_logger, reader_class, key) in readers.items():
+        path = os.path.join(tmp, f"{name}.log")
+        log_turn, close = make_logger(path)
+        elapsed, latencies = record_all(log_turn, args.turns, args.threads)
+        close()
+
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            parsed = [key(item) for item in reader_class(f)]
+        parse_ms = (time.perf_counter() - start) * 1000
+        intact   = len(expected.intersection(parsed))
+
+        print(f"{name:>8} {statistics.median(latencies):8.1f} {latencies[int(len(latencies) * 0.99)]:8.1f} "
+              f"{args.turns / elapsed:10.0f} {os.path.getsize(path) / 1e6:8.1f} {parse_ms:9.1f} "
+              f"{intact:>8}")
+
+    with open(os.path.join(tmp, "journal.log"), "rb") as f:
+        summary = summarize(JournalReader(f))
+    print(f"\njournal summary: {summary['turns']} turns, {summary['users']} users, "
+          f"top doc {summary['top_docs'][0]}")
+
+
+if __name__ == "__main__":
+    main()
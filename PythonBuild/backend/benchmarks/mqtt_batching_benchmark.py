@@ -0,0 +1,90 @@
+"""
+Throughput of the MQTT inference worker with and without micro-batching.
+
+Requests go straight into BatchingInferenceWorker.submit (what on_message
+does), so no broker is needed. By default the model is a stand-in whose
+cost is a fixed per-call overhead plus a smaller per-prompt cost, which is
+how a padded pipeline call behaves; pass --model distilgpt2 to use the real
+pipeline when transformers is installed.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/mqtt_batching_benchmark.py --requests 400 --clients 16
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.server.automat_client import BatchingInferenceWorker, load_pipeline, pipeline_generator
+
+
+def stub_generator(call_ms, prompt_ms):
+    def generate(prompts):
+        time.sleep((call_ms + prompt_ms * len(prompts)) / 1000)
+        return [f"{prompt} ..." for prompt in prompts]
+    return generate
+
+
+def run(generate, requests, clients, max_batch_size, max_wait_ms):
+    done, sent = {}, {}
+    finished   = threading.Event()
+    lock       = threading.Lock()
+
+    def publish(request_id, text, error=None):
+        with lock:
+            done[request_id] = time.perf_counter()
+            if len(done) == requests:
+                finished.set()
+
+    worker = BatchingInferenceWorker(generate, publish, max_batch_size=max_batch_size,
+                                     max_wait_ms=max_wait_ms, max_queue=requests).start()
+
+    def client(offset):
+        for i in range(offset, requests, clients):
+            sent[i] = time.perf_counter()
+            worker.submit(i, f"Prompt number {i}")
+            time.sleep(0.001)
+
+    start   = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    for thread in threads:
+        thread.start()
+    finished.wait()
+    elapsed = time.perf_counter() - start
+    worker.stop()
+
+    latencies = sorted((done[i] - sent[i]) * 1000 for i in range(requests))
+    return {
+        "throughput": requests / elapsed,
+        "p50":        statistics.median(latencies),
+        "p99":        latencies[int(len(latencies) * 0.99) - 1],
+        "mean_batch": worker.stats()["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=25)
+    parser.add_argument("--call-ms", type=float, default=40, help="stand-in cost per pipeline call")
+    parser.add_argument("--prompt-ms", type=float, default=5, help="stand-in cost per prompt in a call")
+    parser.add_argument("--model", default=None, help="use a real transformers model instead of the stand-in")
+    args = parser.parse_args()
+
+    generate = pipeline_generator(load_pipeline(args.model)) if args.model else stub_generator(args.call_ms, args.prompt_ms)
+    label    = args.model or f"stand-in {args.call_ms:.0f}ms/call + {args.prompt_ms:.0f}ms/prompt"
+    print(f"{args.requests} requests from {args.clients} clients, {label}")
+
+    for batch_size in (1, 4, 8, 16):
+        result = run(generate, args.requests, args.clients, batch_size, args.max_wait_ms)
+        print(f"max_batch={batch_size:>2}: {result['throughput']:7.1f} req/s  p50={result['p50']:8.1f}ms  "
+              f"p99={result['p99']:8.1f}ms  mean batch={result['mean_batch']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Requests/sec through the FastAPI-over-MQTT bridge (automat_server.py).
+
+Everything runs in-process: a minimal MQTT broker stand-in (QoS 0, MQTT
+3.1.1 and 5, `+`/`#` wildcards), the automat_client BatchingInferenceWorker
+on a paho client with a stand-in model, and the FastAPI app driven through
+httpx's ASGI transport. Also checks that a request nobody answers times out
+with 504 and leaves nothing in the pending table, and that going over the
+in-flight limit returns 503.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/mqtt_rpc_benchmark.py --requests 2000 --concurrency 64
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.server import automat_server
+from automat_llm.server.automat_client import BatchingInferenceWorker, mqtt_publisher, REQUEST_TOPIC
+
+
+# ---------- broker stand-in ----------
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte, n = n % 128, n // 128
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+def _string(data, pos):
+    length = int.from_bytes(data[pos:pos + 2], "big")
+    return data[pos + 2:pos + 2 + length].decode(), pos + 2 + length
+
+def _skip_properties(data, pos):
+    length, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return pos + length
+
+def topic_matches(pattern, topic):
+    pattern, topic = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern):
+        if part == "#":
+            return True
+        if i >= len(topic) or (part != "+" and part != topic[i]):
+            return False
+    return len(pattern) == len(topic)
+
+
+class Broker:
+    """Just enough of an MQTT broker for the bridge and the worker to talk through."""
+
+    def __init__(self):
+        self.sessions  = {}  # writer -> {"version": int, "subs": [patterns]}
+        self.forwarded = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _packets(self, reader):
+        while True:
+            header = await reader.readexactly(1)
+            length, shift = 0, 0
+            while True:
+                byte = (await reader.readexactly(1))[0]
+                length |= (byte & 0x7F) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            yield header[0], await reader.readexactly(length)
+
+    def _publish_to(self, writer, topic, payload):
+        version = self.sessions[writer]["version"]
+        topic_b = topic.encode()
+        body    = len(topic_b).to_bytes(2, "big") + topic_b + (b"\x00" if version == 5 else b"") + payload
+        writer.write(b"\x30" + _varint(len(body)) + body)
+
+    async def _session(self, reader, writer):
+        self.sessions[writer] = {"version": 4, "subs": []}
+        try:
+            async for first, data in self._packets(reader):
+                kind    = first >> 4
+                version = self.sessions[writer]["version"]
+                if kind == 1:  # CONNECT
+                    _, pos  = _string(data, 0)
+                    version = self.sessions[writer]["version"] = data[pos]
+                    writer.write(b"\x20\x03\x00\x00\x00" if version == 5 else b"\x20\x02\x00\x00")
+                elif kind == 8:  # SUBSCRIBE
+                    packet_id, pos = data[0:2], 2
+                    if version == 5:
+                        pos = _skip_properties(data, pos)
+                    codes = b""
+                    while pos < len(data):
+                        pattern, pos = _string(data, pos)
+                        pos += 1  # options
+                        self.sessions[writer]["subs"].append(pattern)
+                        codes += b"\x00"
+                    body = packet_id + (b"\x00" if version == 5 else b"") + codes
+                    writer.write(b"\x90" + _varint(len(body)) + body)
+                elif kind == 3:  # PUBLISH
+                    topic, pos = _string(data, 0)
+                    qos = (first >> 1) & 0x03
+                    if qos:
+                        packet_id = data[pos:pos + 2]
+                        pos += 2
+                        writer.write(b"\x40\x02" + packet_id)
+                    if version == 5:
+                        pos = _skip_properties(data, pos)
+                    payload = data[pos:]
+                    for other, session in list(self.sessions.items()):
+                        if any(topic_matches(p, topic) for p in session["subs"]):
+                            self._publish_to(other, topic, payload)
+                            self.forwarded += 1
+                elif kind == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.sessions.pop(writer, None)
+            writer.close()
+
+
+# ---------- the LLM side: automat_client's worker on paho ----------
+def start_responder(port, call_ms, prompt_ms):
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2) if hasattr(mqtt, "CallbackAPIVersion") else mqtt.Client()
+
+    def generate(prompts):
+        time.sleep((call_ms + prompt_ms * len(prompts)) / 1000)
+        return [f"echo: {prompt}" for prompt in prompts]
+
+    worker = BatchingInferenceWorker(generate, mqtt_publisher(client), max_batch_size=16, max_wait_ms=5).start()
+    client.on_connect = lambda c, *args: c.subscribe(REQUEST_TOPIC)
+    client.on_message = lambda c, userdata, msg: worker.submit(**json.loads(msg.payload))
+    client.connect("127.0.0.1", port, 60)
+    client.loop_start()
+    return client, worker
+
+
+async def load(http, n, concurrency):
+    latencies, statuses = [], {}
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            start    = time.perf_counter()
+            response = await http.post("/query", json={"prompt": f"prompt {i}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return n / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--call-ms", type=float, default=10)
+    parser.add_argument("--prompt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    broker = Broker()
+    port   = await broker.start()
+    client, worker = start_responder(port, args.call_ms, args.prompt_ms)
+
+    rpc = automat_server.rpc
+    rpc.max_in_flight = args.concurrency
+    await rpc.connect("127.0.0.1", port)
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=automat_server.app), base_url="http://bridge", timeout=30)
+
+    rps, p50, p99, statuses = await load(http, args.requests, args.concurrency)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, model {args.call_ms}ms/call + {args.prompt_ms}ms/prompt")
+    print(f"  {rps:7.1f} req/s  p50={p50:6.1f}ms  p99={p99:6.1f}ms  statuses={statuses}  "
+          f"mean batch={worker.stats()['mean_batch_size']}")
+
+    # Nobody answers: timeout and cleanup
+    client.loop_stop()
+    client.disconnect()
+    worker.stop()
+    rpc.timeout = 0.2
+    response    = await http.post("/query", json={"prompt": "anyone?"})
+    print(f"  unanswered request -> {response.status_code}, pending after: {len(rpc.pending)}")
+
+    # Over the in-flight limit
+    rpc.max_in_flight = 4
+    rpc._slots        = asyncio.Semaphore(4)
+    responses = await asyncio.gather(*(http.post("/query", json={"prompt": "x"}) for _ in range(8)))
+    print(f"  8 concurrent with limit 4 -> {sorted(r.status_code for r in responses)}, stats={rpc.stats()}")
+
+    await http.aclose()
+    await rpc.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+/chat throughput as the number of distinct concurrent users grows.
+
+Drives api.py's /chat route in-process (httpx ASGI transport) with the real
+CybelRagChain, sharded history store and interaction store, but a stand-in
+embedding model, memory search and LLM, so no Groq or Weaviate access is
+needed. For each level of concurrency it runs once with every client using
+a different user_id and once with all clients sharing one, then checks that
+every memory search was scoped to a user and every reply went to the
+user who asked.
+
+Distinct users should scale with concurrency; one shared user is serialised
+by its per-user lock (turns for one user must stay in order).
+
+Usage (from PythonBuild/backend):
+    python benchmarks/multi_user_benchmark.py --requests 4 --llm-ms 50
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents  import Document
+from langchain_core.messages   import AIMessage
+from langchain_core.runnables  import RunnableLambda
+
+import api
+import main
+from automat_llm              import core
+from automat_llm.chain        import CybelRagChain
+from automat_llm.core         import install_executor
+from automat_llm.etiquette    import Personality
+from automat_llm.interactions import InteractionStore
+
+
+class StubEmbeddings:
+    def __init__(self, embed_ms):
+        self.embed_s = embed_ms / 1000
+
+    def embed_query(self, text):
+        time.sleep(self.embed_s)
+        return [float(len(text)), 1.0]
+
+
+def scoped_search(seen):
+    """Memory search that records which scope each query ran in."""
+    def search(query, vector, k, user_id=None):
+        seen.append(user_id)
+        return [Document(page_content=f"User: my name is {user_id}\nBot: noted", metadata={"user_id": user_id})]
+    return search
+
+
+def stub_llm(llm_ms):
+    async def answer(prompt_inputs):
+        await asyncio.sleep(llm_ms / 1000)
+        return AIMessage(content=f"Hello again, {prompt_inputs['user_id']}")
+    return RunnableLambda(lambda inputs: AIMessage(content="sync"), afunc=answer)
+
+
+async def run(http, clients, requests, shared, crossed):
+    latencies = []
+
+    async def client(n):
+        user_id = "shared-user" if shared else f"user-{n}"
+        for i in range(requests):
+            start    = time.perf_counter()
+            response = await http.post("/chat", json={"message": f"question {i} from {n}", "user_id": user_id})
+            response.raise_for_status()
+            if not response.json()["response"].endswith(user_id):
+                crossed.append((user_id, response.json()["response"]))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    return clients * requests / elapsed, statistics.median(latencies)
+
+
+async def amain():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=4, help="turns per client")
+    parser.add_argument("--embed-ms", type=float, default=2)
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--clients", default="1,4,16,64")
+    args = parser.parse_args()
+
+    executor = install_executor(max_workers=8)
+    tmp      = tempfile.mkdtemp()
+    seen     = []
+    crossed  = []  # replies that came back for somebody else
+
+    # What main.initialize_system would have set up, minus Weaviate and Groq
+    main.personality_data  = Personality({"char_name": "Cybel", "example_dialogue": []})
+    main.rude_keywords     = main.personality_data.rude
+    main.user_interactions = InteractionStore(os.path.join(tmp, "user_interactions.json")).start()
+    main.rag_chain         = CybelRagChain(StubEmbeddings(args.embed_ms), scoped_search(seen), stub_llm(args.llm_ms), k=4)
+
+    class IdleIngestion:
+        def notify(self, turns=1):
+            pass
+
+    api.ingestion_worker = IdleIngestion()
+    api.startup["state"] = "ready"
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://cybel", timeout=120) as http:
+        print(f"{args.requests} turns per client, embedding {args.embed_ms}ms + LLM {args.llm_ms}ms per turn")
+        print(f"{'clients':>8} {'distinct users':>24} {'one shared user':>24}")
+        for clients in (int(n) for n in args.clients.split(",")):
+            distinct_rps, distinct_p50 = await run(http, clients, args.requests, False, crossed)
+            shared_rps, shared_p50     = await run(http, clients, args.requests, True, crossed)
+            print(f"{clients:>8} {distinct_rps:9.1f} req/s p50 {distinct_p50:6.0f}ms "
+                  f"{shared_rps:9.1f} req/s p50 {shared_p50:6.0f}ms")
+
+        response = await http.post("/chat", json={"message": "hi", "user_id": "not a valid id!"})
+        print(f"\ninvalid user_id -> {response.status_code}")
+
+    leaked = [scope for scope in seen if scope is None]
+    print(f"memory searches: {len(seen)}, distinct scopes: {len(set(seen))}, unscoped: {len(leaked)}, "
+          f"replies for the wrong user: {len(crossed)}")
+    print(f"history store: {core.conversation_histories.stats()}")
+
+    main.user_interactions.close()
+    executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(amain())
@@ -0,0 +1,123 @@
+"""
+Response cache over a chat session: how many turns skip the LLM.
+
+Drives core.generate_response / agenerate_response / stream_response for
+one user with a CybelRagChain whose LLM is a stand-in that sleeps
+`--llm-ms` per call. Memories come from the Input_JSON corpus and are
+retrieved with the hashing embedder from retrieval_benchmark.py. The
+session asks a few questions, then asks the first one again word for word
+and lightly rephrased, after the history has moved on; both repeats must
+be answered from the cache (the script exits non-zero otherwise). Also
+reports hit rate and LLM calls for a longer session with `--repeat` of its
+turns asked again.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/response_cache_benchmark.py --turns 200 --repeat 0.3
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents  import Document
+from langchain_core.runnables  import RunnableLambda
+from retrieval_benchmark       import HashEmbeddings, load_corpus
+
+from automat_llm                import core
+from automat_llm.chain          import CybelRagChain
+from automat_llm.response_cache import SemanticResponseCache
+
+
+def build_chain(texts, llm_ms, calls):
+    embeddings = HashEmbeddings()
+    vectors    = embeddings.embed_documents(texts)
+    vectors   /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def search(query, vector, k, user_id=None):
+        q   = vector / max(np.linalg.norm(vector), 1e-12)
+        top = np.argsort(-(vectors @ q))[:k]
+        return [Document(page_content=texts[i]) for i in top]
+
+    def llm(prompt_inputs):
+        calls.append(prompt_inputs["input"])
+        time.sleep(llm_ms / 1000)
+        return f"answer {len(calls)} to: {prompt_inputs['input']}"
+
+    return CybelRagChain(embeddings, search, RunnableLambda(llm), k=5)
+
+
+def ask(chain, user_id, text):
+    return core.generate_response(user_id, {"users": {}}, text, [], {}, chain)
+
+
+def stream(chain, user_id, text):
+    return "".join(str(chunk) for chunk in core.stream_response(user_id, {"users": {}}, text, [], {}, chain))
+
+
+def check_session(chain, calls):
+    """The same question twice in one session: the second ask (and a rephrasing) must not reach the LLM."""
+    user     = "session-check"
+    question = "What did the station crew say about the coolant loop?"
+    first    = ask(chain, user, question)
+    for other in ("How are you today?", "Tell me about the docking sequence.", "Any news from engineering?"):
+        ask(chain, user, other)
+
+    before = len(calls)
+    checks = {
+        "same question again":       ask(chain, user, question),
+        "same question, async":      asyncio.run(core.agenerate_response(user, {"users": {}}, question, [], {}, chain)),
+        "same question, streamed":   stream(chain, user, question),
+        "rephrased":                 ask(chain, user, "About the coolant loop: what did the station crew say?"),
+    }
+    ok = True
+    for name, answer in checks.items():
+        hit = answer == first
+        ok  = ok and hit
+        print(f"  {name:<27}: {'cached' if hit else 'MISS'}")
+    print(f"  LLM calls for the repeats : {len(calls) - before}")
+    other_user = ask(chain, "someone-else", question)
+    print(f"  another user, same question: {'cached (wrong!)' if other_user == first else 'not shared'}")
+    return ok and len(calls) == before + 1 and other_user != first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeat", type=float, default=0.3, help="Share of turns that repeat an earlier question")
+    parser.add_argument("--llm-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    here  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    texts = load_corpus(os.path.join(here, "Input_JSON"))
+    calls = []
+    chain = build_chain(texts, args.llm_ms, calls)
+    core.set_response_cache(SemanticResponseCache())
+
+    print("same question twice in one session:")
+    ok = check_session(chain, calls)
+
+    rng, asked = random.Random(0), []
+    calls.clear()
+    core.set_response_cache(SemanticResponseCache())
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        question = rng.choice(asked) if asked and rng.random() < args.repeat else rng.choice(texts)
+        asked.append(question)
+        ask(chain, "load", question)
+    seconds = time.perf_counter() - start
+    stats   = core.response_cache_stats()
+    print(f"\n{args.turns} turns, {args.repeat:.0%} repeats: {len(calls)} LLM calls, hit rate {stats['hit_rate']:.2f}, "
+          f"{stats['seconds_saved']:.2f}s of LLM time saved, {args.turns / seconds:.0f} turns/s")
+    if not ok:
+        sys.exit("response cache missed a repeated question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Retrieval latency: local FAISS index vs. a networked vector store.
+
+The Weaviate path is represented by a local HTTP stand-in that does the same
+brute-force cosine search behind a JSON round-trip, so the comparison runs
+without a Weaviate instance. Embeddings come from a deterministic hashing
+embedder, so no model download is needed either. The corpus is built from
+Input_JSON.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/retrieval_benchmark.py --queries 500 --k 10
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import zlib
+import argparse
+import tempfile
+import threading
+import http.client
+from   http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.faiss_store import LocalFaissStore
+
+
+class HashEmbeddings:
+    """Bag-of-hashed-words embedder with the same interface as HuggingFaceEmbeddings."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def load_corpus(directory):
+    """Memory texts from Input_JSON: 'Entry' values and the lines of 'content' transcripts."""
+    texts = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                continue
+        if isinstance(data, list):
+            texts.extend(item["Entry"] for item in data if isinstance(item, dict) and item.get("Entry"))
+        elif isinstance(data, dict):
+            texts.extend(line.strip() for line in data.get("content", "").splitlines() if len(line.strip()) > 20)
+    return texts
+
+
+def start_standin(vectors, texts):
+    """Serve brute-force search over HTTP, standing in for a remote Weaviate instance."""
+    normalised = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version        = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body   = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            query  = np.asarray(body["vector"], dtype="float32")
+            query /= max(np.linalg.norm(query), 1e-12)
+            scores = normalised @ query
+            top    = np.argsort(-scores)[:body["k"]]
+            data   = json.dumps({"objects": [{"text": texts[i], "score": float(scores[i])} for i in top]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick    = lambda pct: ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)] * 1000
+    return f"p50={pick(50):7.3f}ms  p99={pick(99):7.3f}ms"
+
+
+def main(args):
+    embeddings = HashEmbeddings()
+    corpus     = load_corpus(args.input_dir)
+    corpus     = (corpus * (args.min_docs // max(len(corpus), 1) + 1))[:max(args.min_docs, len(corpus))]
+    corpus     = [f"{text} #{i}" for i, text in enumerate(corpus)]  # keep duplicates distinct
+    queries    = [random.Random(i).choice(corpus)[:80] for i in range(args.queries)]
+    print(f"Corpus: {len(corpus)} memories, {args.queries} queries, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        start = time.perf_counter()
+        store = LocalFaissStore(index_dir, embeddings)
+        store.add_texts(corpus)
+        store.save()
+        print(f"FAISS build + save: {time.perf_counter() - start:.2f}s")
+
+        for mmap in (False, True):
+            start  = time.perf_counter()
+            opened = LocalFaissStore(index_dir, embeddings, mmap=mmap)
+            print(f"FAISS open ({'mmap' if mmap else 'read'}): {(time.perf_counter() - start) * 1000:.2f}ms")
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            opened.search(query, args.k)
+            latencies.append(time.perf_counter() - start)
+        print(f"FAISS local      : {percentiles(latencies)}")
+
+    server = start_standin(embeddings.embed_documents(corpus), corpus)
+    conn   = http.client.HTTPConnection(*server.server_address)
+    conn.connect()
+    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        body  = json.dumps({"vector": embeddings.embed_query(query).tolist(), "k": args.k})
+        conn.request("POST", "/v1/search", body, {"Content-Type": "application/json"})
+        json.loads(conn.getresponse().read())
+        latencies.append(time.perf_counter() - start)
+    print(f"Weaviate stand-in: {percentiles(latencies)}  (loopback only, real network adds RTT)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare local FAISS retrieval with a networked vector store.")
+    parser.add_argument("--input-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Input_JSON"))
+    parser.add_argument("--queries",   type=int, default=500)
+    parser.add_argument("--k",         type=int, default=10)
+    parser.add_argument("--min-docs",  type=int, default=20000, help="Repeat the corpus up to this many memories")
+    main(parser.parse_args())
@@ -0,0 +1,164 @@
+"""
+recall@k of vector, keyword (BM25) and hybrid (RRF) memory search.
+
+Builds a memory store from Input_JSON: each {{user}}/{{char}} exchange of
+the memory constructs and each entry of the list files becomes one memory,
+plus synthetic "my name is ... my locker code is ..." facts (the README's
+"remember my name" case). Every query targets one memory:
+
+  - fact queries name the person and ask for their code;
+  - corpus queries mix the memory's two rarest words with a few common ones,
+    like a user half-remembering a conversation.
+
+The memories go through the real LocalFaissStore, LexicalIndex and
+HybridSearch. By default the dense side uses a 256-d hashed bag of words,
+which blurs rare words the way a small embedding model does; pass
+--embeddings hf to use the configured HuggingFace model instead.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/retrieval_recall_benchmark.py --facts 200 --ks 1,5,10
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automat_llm.core        import _faiss_search
+from automat_llm.faiss_store import LocalFaissStore
+from automat_llm.lexical     import LexicalIndex, HybridSearch, tokenize
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Input_JSON")
+NAMES     = ["Aoife", "Bartholomew", "Chidi", "Dagny", "Eero", "Farah", "Gideon", "Hiroko", "Ines", "Jovan",
+             "Kalani", "Lucan", "Mirela", "Nnamdi", "Orla", "Pavel", "Quilla", "Rashid", "Solveig", "Tamsin"]
+
+
+class HashedEmbeddings:
+    """Signed feature hashing of the words into `dim` buckets, L2-normalised."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for token in tokenize(text):
+            digest = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:4], "little")
+            vector[digest % self.dim] += 1.0 if digest & 1 << 31 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+def corpus_memories(directory):
+    """One memory per User/Bot exchange (or list entry) in the Input_JSON files."""
+    memories = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            memories.extend(item["Entry"] for item in data if isinstance(item, dict) and item.get("Entry"))
+            continue
+        speaker, lines, turns = None, [], []
+        for line in data.get("content", "").splitlines():
+            if line.strip() in ("{{user}}:", "{{char}}:"):
+                if speaker and lines:
+                    turns.append((speaker, " ".join(lines)))
+                speaker, lines = line.strip(), []
+            elif line.strip() and line.strip() != "START":
+                lines.append(line.strip())
+        if speaker and lines:
+            turns.append((speaker, " ".join(lines)))
+        for (who, said), (_, reply) in zip(turns, turns[1:]):
+            if who == "{{user}}:":
+                memories.append(f"User: {said}\nBot: {reply}")
+    return list(dict.fromkeys(memories))
+
+
+def build_queries(memories, facts, rng):
+    """(query, target memory) pairs."""
+    queries = []
+    for i in range(facts):
+        name = f"{rng.choice(NAMES)}-{i}"
+        code = f"{rng.choice('KQXZ')}{rng.choice('ABCDEFGH')}-{rng.randint(1000, 9999)}"
+        fact = f"User: my name is {name} and my locker code is {code}\nBot: Noted, {name}. I'll keep {code} safe."
+        memories.append(fact)
+        queries.append((f"hey it's {name}, what was my locker code again?", fact))
+
+    frequency = {}
+    for memory in memories:
+        for token in set(tokenize(memory)):
+            frequency[token] = frequency.get(token, 0) + 1
+    for memory in rng.sample(memories[:len(memories) - facts], min(200, len(memories) - facts)):
+        words = sorted(set(token for token in tokenize(memory) if token.isalpha()), key=lambda t: (frequency[t], t))
+        if len(words) < 5:
+            continue
+        picked = words[:2] + rng.sample(words[len(words) // 2:], 3)
+        rng.shuffle(picked)
+        queries.append((" ".join(picked), memory))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facts", type=int, default=200, help="synthetic name/code memories")
+    parser.add_argument("--ks", default="1,5,10")
+    parser.add_argument("--embeddings", choices=["hashed", "hf"], default="hashed")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng        = random.Random(args.seed)
+    ks         = [int(k) for k in args.ks.split(",")]
+    memories   = corpus_memories(INPUT_DIR)
+    corpus     = len(memories)
+    queries    = build_queries(memories, args.facts, rng)
+    if args.embeddings == "hf":
+        from automat_llm.registry import registry
+        embeddings = registry.get_embeddings()
+    else:
+        embeddings = HashedEmbeddings()
+
+    store = LocalFaissStore(tempfile.mkdtemp(), embeddings, mmap=False)
+    start = time.perf_counter()
+    store.add_texts(memories)
+    print(f"{len(memories)} memories ({corpus} from Input_JSON, {args.facts} facts) embedded in "
+          f"{time.perf_counter() - start:.1f}s with {args.embeddings} embeddings")
+
+    index = LexicalIndex()
+    start = time.perf_counter()
+    index.add_many(store.iter_docs())
+    print(f"keyword index: {index.stats()} built in {(time.perf_counter() - start) * 1000:.0f}ms\n")
+
+    search  = HybridSearch(_faiss_search(store), index)
+    vectors = [embeddings.embed_query(query) for query, _ in queries]
+    print(f"{len(queries)} queries ({args.facts} fact lookups)")
+    print(f"{'mode':>8} " + " ".join(f"{f'recall@{k}':>10}" for k in ks) + f" {'facts@1':>8} {'ms/query':>9}")
+    for mode in ("vector", "lexical", "hybrid"):
+        hits, fact_hits, latencies = {k: 0 for k in ks}, 0, []
+        for (query, target), vector in zip(queries, vectors):
+            start   = time.perf_counter()
+            results = [doc.page_content for doc in search(query, vector, max(ks), options={"mode": mode})]
+            latencies.append((time.perf_counter() - start) * 1000)
+            for k in ks:
+                hits[k] += target in results[:k]
+            fact_hits += target.startswith("User: my name is") and results[:1] == [target]
+        print(f"{mode:>8} " + " ".join(f"{hits[k] / len(queries):10.3f}" for k in ks)
+              + f" {fact_hits / max(args.facts, 1):8.3f} {statistics.mean(latencies):9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+ProviderRouter against local OpenAI-compatible stub servers.
+
+Starts two stub backends ("fast" and "slow") that answer /chat/completions
+after a configurable delay, then shows:
+  1. routing: most traffic goes to the faster backend,
+  2. failover: when "fast" starts hanging past the timeout its circuit opens
+     and requests move to "slow",
+  3. fallback: with both down the local provider answers,
+  4. pooling: a pooled client vs. a new connection per request,
+  5. streaming: tokens through RoutedChatModel in a prompt | llm chain.
+No API keys or network access needed. The local fallback is a
+transformers pipeline when transformers is installed, otherwise an echo.
+
+Usage (from PythonBuild/backend):
+    python benchmarks/router_stub_benchmark.py --requests 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from   http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.prompts import ChatPromptTemplate
+from automat_llm.router     import HTTPProvider, LocalTransformersProvider, ProviderRouter, RoutedChatModel
+
+
+def start_stub(name, delay):
+    """OpenAI-style chat completions server; `state["delay"]` can be changed while it runs."""
+    state = {"delay": delay, "fail": False}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version        = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(state["delay"])
+            if body.get("stream") and not state["fail"]:
+                return self._stream(f"{name} streams hi".split())
+            if state["fail"]:
+                payload, status = b'{"error": "overloaded"}', 503
+            else:
+                text    = f"{name} says hi to {body['messages'][-1]['content'][:20]}"
+                payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": text}}]}).encode()
+                status  = 200
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self._write(payload)
+
+        def _stream(self, words):
+            events = [f"data: {json.dumps({'choices': [{'delta': {'content': word + ' '}}]})}\n\n" for word in words]
+            payload = ("".join(events) + "data: [DONE]\n\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self._write(payload)
+
+        def _write(self, payload):
+            try:
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the router gave up on this request (timeout)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1", state
+
+
+class EchoProvider(LocalTransformersProvider):
+    """Stands in for the transformers fallback when transformers is not installed."""
+
+    def complete(self, messages, temperature=0.5, max_tokens=1024):
+        return f"(local) {messages[-1]['content']}"
+
+
+def run(router, n, messages):
+    counts = {}
+    start  = time.perf_counter()
+    for _ in range(n):
+        _, backend = router.complete(messages)
+        counts[backend] = counts.get(backend, 0) + 1
+    return counts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    fast_url, fast = start_stub("fast", 0.005)
+    slow_url, slow = start_stub("slow", 0.040)
+    try:
+        import transformers  # noqa: F401
+        fallback = LocalTransformersProvider()
+    except ImportError:
+        fallback = EchoProvider("echo")
+
+    router   = ProviderRouter(
+        [HTTPProvider("fast", fast_url, "stub", timeout=args.timeout), HTTPProvider("slow", slow_url, "stub", timeout=args.timeout)],
+        fallback=fallback, max_failures=3, cooldown=60,
+    )
+    messages = [{"role": "user", "content": "hello there"}]
+
+    counts, elapsed = run(router, args.requests, messages)
+    print(f"1. routing:   {counts}  ({args.requests / elapsed:.0f} req/s)")
+
+    fast["delay"] = args.timeout * 2  # "fast" now hangs past the timeout
+    counts, elapsed = run(router, args.requests, messages)
+    print(f"2. failover:  {counts}  ({args.requests / elapsed:.0f} req/s, fast healthy={router.stats()['backends']['fast']['healthy']})")
+
+    slow["fail"] = True
+    counts, elapsed = run(router, 20, messages)
+    print(f"3. fallback:  {counts}  (fallbacks={router.stats()['fallbacks']})")
+
+    slow["fail"], slow["delay"] = False, 0.0
+    n      = args.requests
+    pooled = HTTPProvider("pooled", slow_url, "stub")
+    start  = time.perf_counter()
+    for _ in range(n):
+        pooled.complete(messages)
+    pooled_s = time.perf_counter() - start
+    start    = time.perf_counter()
+    for _ in range(n):
+        with httpx.Client(base_url=slow_url) as client:
+            client.post("/chat/completions", json={"model": "stub", "messages": messages})
+    fresh_s = time.perf_counter() - start
+    print(f"4. pooling:   pooled {pooled_s / n * 1000:.2f} ms/req vs new client {fresh_s / n * 1000:.2f} ms/req")
+
+    llm    = RoutedChatModel(router=ProviderRouter([pooled], fallback=fallback))
+    chain  = ChatPromptTemplate.from_messages([("human", "{input}")]) | llm
+    tokens = [chunk.content for chunk in chain.stream({"input": "stream please"})]
+    print(f"5. streaming: {tokens} via RoutedChatModel")
+
+    print("\nper-backend latency:")
+    for name, backend in router.stats()["backends"].items():
+        latency = backend["latency"]
+        print(f"  {name:>10}: n={latency['count']:4d} p50={latency['p50_ms']:7.2f}ms p99={latency['p99_ms']:7.2f}ms "
+              f"failures={backend['failures']}")
+
+
+if __name__ == "__main__":
+    main()
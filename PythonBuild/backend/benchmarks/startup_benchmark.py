@@ -0,0 +1,123 @@
+"""
+Cold-start budget for the CLI and API entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each target, takes the median cumulative import time over a few runs and
+lists the slowest imports. Exits non-zero when a target is over its budget,
+so it can gate CI. With --serve it also starts uvicorn on api:app and times
+how long until /health answers (models keep warming in the background).
+
+Usage (from PythonBuild/backend):
+    python benchmarks/startup_benchmark.py --runs 5 --budget api=800 --budget main=300 --serve
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+BACKEND_DIR     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGETS = {"main": 300.0, "api": 800.0}  # milliseconds
+
+
+def import_times(module):
+    """{imported module: cumulative ms} from one fresh `-X importtime` run of `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = max(times.get(name.strip(), 0.0), int(cumulative) / 1000)
+    return times
+
+
+def measure(module, runs):
+    import_times(module)  # write .pyc files so every measured run is equal
+    samples = [import_times(module) for _ in range(runs)]
+    total   = statistics.median(sample[module] for sample in samples)
+    slowest = sorted(samples[-1].items(), key=lambda item: -item[1])
+    return total, [(name, ms) for name, ms in slowest if name != module][:8]
+
+
+def time_to_health(port=None, timeout=60.0):
+    """Seconds from launching uvicorn to the first 200 from /health."""
+    if port is None:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+    start   = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0)
+                if response.status_code == 200:
+                    return time.perf_counter() - start, response.json()["startup"]["state"]
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {process.returncode}")
+            time.sleep(0.02)
+        raise RuntimeError(f"/health did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="import budget per module (default main=300, api=800)")
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn until /health answers")
+    parser.add_argument("--health-budget", type=float, default=3.0, help="seconds allowed until /health answers")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget:
+        module, _, ms = item.partition("=")
+        budgets[module] = float(ms)
+
+    over = []
+    for module, budget in budgets.items():
+        total, slowest = measure(module, args.runs)
+        status = "ok" if total <= budget else "OVER BUDGET"
+        print(f"import {module}: {total:7.1f} ms (budget {budget:.0f} ms, median of {args.runs})  {status}")
+        for name, ms in slowest:
+            print(f"    {ms:7.1f} ms  {name}")
+        if total > budget:
+            over.append(module)
+
+    if args.serve:
+        seconds, state = time_to_health()
+        status = "ok" if seconds <= args.health_budget else "OVER BUDGET"
+        print(f"uvicorn api:app -> first /health in {seconds:.2f}s (budget {args.health_budget:.1f}s, "
+              f"startup state {state!r})  {status}")
+        if seconds > args.health_budget:
+            over.append("/health")
+
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
-from generator import ImageGenerator
-import threading
-import os
+from image_queue import ImageQueue, QueueFull, DONE
 
 class ImageGeneratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Uncensored Image Generator")
-        self.generator = ImageGenerator()
+        self.queue = ImageQueue.from_env().start()  # one worker owns the model; clicks queue jobs
+        self.job = None
         self.image_label = None
         self.create_widgets()
 
@@ -20,9 +19,13 @@ class ImageGeneratorApp:
         self.prompt_entry.pack(pady=5)
 
         # Generate button
-        self.generate_button = tk.Button(self.root, text="Generate Image", command=self.generate_image_thread)
+        self.generate_button = tk.Button(self.root, text="Generate Image", command=self.generate_image)
         self.generate_button.pack(pady=10)
 
+        # Cancel button
+        self.cancel_button = tk.Button(self.root, text="Cancel", command=self.cancel_image, state=tk.DISABLED)
+        self.cancel_button.pack(pady=5)
+
         # Image display
         self.image_label = tk.Label(self.root)
         self.image_label.pack(pady=10)
@@ -31,29 +34,49 @@ class ImageGeneratorApp:
         self.status_label = tk.Label(self.root, text="Ready")
         self.status_label.pack(pady=5)
 
-    def generate_image_thread(self):
-        threading.Thread(target=self.generate_image).start()
-
     def generate_image(self):
         prompt = self.prompt_entry.get().strip()
         if not prompt:
             messagebox.showerror("Error", "Please enter a prompt.")
             return
 
-        self.status_label.config(text="Generating...")
-        self.generate_button.config(state=tk.DISABLED)
+        if self.job is not None:
+            self.job.cancel()  # only the latest prompt's image is shown, so drop the previous one
+
+        try:
+            # Progress and completion arrive on the worker thread; hand them to Tk's thread
+            self.job = self.queue.submit(prompt, on_progress=lambda job: self.root.after(0, self.show_progress, job))
+        except QueueFull:
+            messagebox.showerror("Error", "Too many images are waiting; try again shortly.")
+            return
+        self.job.add_done_callback(lambda job: self.root.after(0, self.image_done, job))
+
+        ahead = self.queue.position(self.job)
+        self.status_label.config(text=f"Queued ({ahead} ahead)..." if ahead else "Generating...")
+        self.cancel_button.config(state=tk.NORMAL)
 
-        output_path = "generated_image.png"
-        result = self.generator.generate_image(prompt, output_path)
+    def cancel_image(self):
+        if self.job is not None:
+            self.job.cancel()
 
-        if result and os.path.exists(result):
-            self.display_image(result)
+    def show_progress(self, job):
+        if job is self.job:
+            self.status_label.config(text=f"Generating... step {job.step}/{job.steps}")
+
+    def image_done(self, job):
+        if job is not self.job:
+            return  # superseded by a later prompt
+        self.cancel_button.config(state=tk.DISABLED)
+        if job.status == DONE:
+            output_path = "generated_image.png"
+            job.image.save(output_path)
+            self.display_image(output_path)
             self.status_label.config(text="Image generated successfully!")
+        elif job.cancelled():
+            self.status_label.config(text="Cancelled.")
         else:
             self.status_label.config(text="Error generating image.")
-            messagebox.showerror("Error", "Failed to generate image.")
-
-        self.generate_button.config(state=tk.NORMAL)
+            messagebox.showerror("Error", f"Failed to generate image: {job.error}")
 
     def display_image(self, path):
         try:
@@ -2,27 +2,33 @@ import os
 import logging
 import argparse
 
-import weaviate
-from   weaviate.classes.init   import Auth
-import weaviate.classes as wvc
-
 from dotenv import load_dotenv
 
 #from dia import model as Dia
 #from playsound import playsound
-from automat_llm.core   import load_json_as_documents, load_personality_file, init_interactions, generate_response, create_rag_chain
+from automat_llm.core   import load_json_as_documents, load_personality_file, init_interactions, generate_response, agenerate_response, create_rag_chain
+from automat_llm.core   import stream_response, astream_response, init_journal, DEFAULT_USER_ID
+from automat_llm.ingest import upload_logs
 from automat_llm.config import load_config, save_config, update_config
-from rich.panel    import Panel
-from rich.markdown import Markdown
-from rich.console import Console
-from datetime import datetime
-import json
-
-console     = Console()
-config      = load_config()
+
+# Weaviate, rich and the models are imported on first use so `import main`
+# (and the API server) starts quickly; see benchmarks/startup_benchmark.py.
+
+console     = None
 current_dir = os.getcwd()
 
+def get_console():
+    """The shared rich console, created on first render."""
+    global console
+    if console is None:
+        from rich.console import Console
+        console = Console()
+    return console
+
 def render_llm(text: str, title: str = "LLM Response"):
+    from rich.panel    import Panel
+    from rich.markdown import Markdown
+
     md = Markdown(text, code_theme="monokai", hyperlinks=True)
     panel = Panel(
         md,
@@ -30,122 +36,113 @@ def render_llm(text: str, title: str = "LLM Response"):
         border_style="cyan",
         padding=(1, 2)
     )
-    console.print(panel)
+    get_console().print(panel)
+
+def render_llm_stream(chunks, title: str = "LLM Response"):
+    """Render streamed text into the response panel as it arrives."""
+    from rich.panel    import Panel
+    from rich.markdown import Markdown
+    from rich.live     import Live
+
+    text = ""
+    with Live(console=get_console(), refresh_per_second=12) as live:
+        for chunk in chunks:
+            text += chunk
+            live.update(Panel(Markdown(text, code_theme="monokai", hyperlinks=True), title=title, border_style="cyan", padding=(1, 2)))
+    return text
 
 load_dotenv()
 
 weaviate_url     = os.environ.get("WEAVIATE_URL") 
 weaviate_api_key = os.environ.get("WEAVIATE_API_KEY")
-user_id          = "Automat-User-Id" # config["default_user"]  # , In the future this will be in a config the user can set.
-                                     # It is made for a single-user system; can be modified for multi-user
+user_id          = DEFAULT_USER_ID # config["default_user"]  # , In the future this will be in a config the user can set.
+                                     # The CLI is single-user; the API passes each client's user_id to the *_once helpers
 
-# Ensure directories exist
 directory = os.path.abspath(f'{current_dir}/Input_JSON/')
-if not os.path.exists(directory):
-    print(f"Cleaned JSON directory not found at {directory}. Creating Input_JSON folder")
-    os.mkdir(f'{current_dir}/Input_JSON')
-    print("UnhandledException: please load Cleaned_, or Cybel Memory JSON into Input_JSON")
-    exit()
 
+def ensure_input_directory():
+    """Make sure Input_JSON exists; exits with instructions when it had to be created."""
+    if not os.path.exists(directory):
+        print(f"Cleaned JSON directory not found at {directory}. Creating Input_JSON folder")
+        os.mkdir(f'{current_dir}/Input_JSON')
+        print("UnhandledException: please load Cleaned_, or Cybel Memory JSON into Input_JSON")
+        exit()
+
+
+# Conversations were logged here before the journal; upload_logs_to_weaviate drains what is left
+LEGACY_LOG = f'{current_dir}/Logs/chatbot_logs.txt'
+
+def setup_logging():
+    """Set up the error log (once per process); conversations go to the journal opened by init_journal."""
+    logging.basicConfig(
+        filename=LEGACY_LOG, #r'./Logs/chatbot_logs.txt',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
 
 
-def chat_once(user_input: str):
+def connect_weaviate(local=None):
+    """Connect to local Weaviate (LOCAL_WEAVIATE=1 or `local`) or to Weaviate Cloud."""
+    import weaviate
+    from   weaviate.classes.init import Auth
+    import weaviate.classes as wvc
+
+    if local is None:
+        local = os.environ.get("LOCAL_WEAVIATE") == "1"
+    if local:
+        return weaviate.connect_to_local(
+            additional_config=wvc.init.AdditionalConfig(
+                timeout=wvc.init.Timeout(init=60, query=30, insert=120)
+            )
+        )
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=weaviate_url,
+        auth_credentials=Auth.api_key(weaviate_api_key),
+    )
+
+
+def chat_once(user_input: str, session_user: str = None, timer=None, retrieval=None):
     try:
-        response = generate_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain)
+        response = generate_response(session_user or user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer, retrieval)
         return response
     except Exception as e:
         return f"Error generating response: {e}"
 
 
-def upload_logs_to_weaviate(client, log_filepath: str, state_file: str = "upload_state.json"):
-    """Parse chat logs and upload only new entries to Weaviate."""
+async def achat_once(user_input: str, session_user: str = None, timer=None, retrieval=None):
+    try:
+        return await agenerate_response(session_user or user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer, retrieval)
+    except Exception as e:
+        return f"Error generating response: {e}"
+
+
+def stream_once(user_input: str, session_user: str = None, timer=None, retrieval=None):
+    return stream_response(session_user or user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer, retrieval)
+
+
+def astream_once(user_input: str, session_user: str = None, timer=None, retrieval=None):
+    return astream_response(session_user or user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain, timer, retrieval)
+
+
+def upload_logs_to_weaviate(client, log_filepath: str = None, state_file: str = "upload_state.json"):
+    """
+    Upload conversations from the pre-journal text chat log that were never uploaded.
+
+    Turns are journaled now (see init_journal), so this only drains what an
+    older version left in Logs/chatbot_logs.txt; its state file records how
+    far it got, so later calls find nothing new.
+    """
+    from automat_llm import core
+
+    log_filepath = log_filepath or LEGACY_LOG
     if not os.path.exists(log_filepath):
-        print(f"Log file not found at {log_filepath}")
         return
     
-    # Load the last upload position
-    last_position = 0
-    if os.path.exists(state_file):
-        try:
-            with open(state_file, 'r') as f:
-                state = json.load(f)
-                last_position = state.get('last_line', 0)
-        except:
-            last_position = 0
-    
     try:
-        with open(log_filepath, 'r', encoding='utf-8', errors='replace') as f:
-            lines = f.readlines()
-        
-        total_lines = len(lines)  
-        
-        # Only process lines after the last position
-        new_lines = lines[last_position:]
-        
-        if not new_lines:
-            print("No new logs to upload.")
-            return
-        
-        # Parse logs (same as before, but on new_lines)
-        conversations = []
-        current_user_input = None
-        
-        for line in new_lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            if " - INFO - User: " in line:
-                user_part = line.split(" - INFO - User: ", 1)
-                if len(user_part) == 2:
-                    current_user_input = user_part[1].strip()
-            
-            elif " - INFO - Bot: " in line and current_user_input:
-                bot_part = line.split(" - INFO - Bot: ", 1)
-                if len(bot_part) == 2:
-                    bot_response = bot_part[1].strip()
-                    
-                    conversations.append({
-                        "user_input": current_user_input,
-                        "bot_response": bot_response
-                    })
-                    current_user_input = None
-        
-        if not conversations:
-            print("No new complete conversations found.")
-
-            with open(state_file, 'w') as f:
-                json.dump({'last_line': total_lines}, f)
-            return
-        
-        print(f"Found {len(conversations)} new conversations to upload.")
-        
-        # Upload to Weaviate
-        collection = client.collections.get("SampleData")
-        
-        uploaded_count = 0
-        with collection.batch.dynamic() as batch:
-            for conv in conversations:
-                conversation_text = f"""User: {conv['user_input']}
-Bot: {conv['bot_response']}"""
-                
-                batch.add_object(
-                    properties={
-                        "text": conversation_text,
-                        "metadata": json.dumps({
-                            "type": "conversation_log",
-                            "source": "chatbot_logs",
-                            "uploaded_at": datetime.now().isoformat()
-                        })
-                    }
-                )
-                uploaded_count += 1
-        
-
-        with open(state_file, 'w') as f:
-            json.dump({'last_line': total_lines}, f)
-        
-        print(f"✅ Successfully uploaded {uploaded_count} new conversations to Weaviate.")
+        collection     = core.local_memory_store() if core.VECTOR_BACKEND == "faiss" else None
+        uploaded_count = upload_logs(client, log_filepath, state_file, collection=collection, index=core.memory_index)
+        if uploaded_count:
+            print(f"✅ Uploaded {uploaded_count} conversations from the old chat log to long-term memory.")
         
     except Exception as e:
         print(f"❌ Error uploading logs: {e}")
@@ -185,9 +182,11 @@ def check_weaviate_contents(client):
 
 
 def initialize_system(weaviate_client):
-    global client, personality_data, user_interactions, documents, rag_chain, rude_keywords
+    global client, personality_data, user_interactions, journal, documents, rag_chain, rude_keywords
 
     client = weaviate_client
+    setup_logging()
+    ensure_input_directory()
 
     # if os.environ.get("LOCAL_WEAVIATE") == "1":
     #     client = weaviate.connect_to_local(
@@ -203,6 +202,7 @@ def initialize_system(weaviate_client):
 
     personality_data = load_personality_file()
     user_interactions = init_interactions()
+    journal = init_journal()
     documents = load_json_as_documents(client, directory)
     
     if not documents:
@@ -211,43 +211,37 @@ def initialize_system(weaviate_client):
 
     print(f"Loaded {len(documents)} documents for RAG.")
 
-    rude_keywords = ["stupid", "idiot", "shut up", "useless", "dumb"]
+    rude_keywords = personality_data.rude  # compiled from the personality's "rude_keywords" (or the defaults)
     rag_chain = create_rag_chain(client, user_id, documents)
+    upload_logs_to_weaviate(client)
 
     check_weaviate_contents(client)
 
 
-# Set up logging to save chatbot interactions
-logging.basicConfig(
-    filename=f'{current_dir}/Logs/chatbot_logs.txt', #r'./Logs/chatbot_logs.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
 # Chatbot loop
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Demo of boolean flag with argparse.")
     parser.add_argument("--set", metavar="KEY=VALUE", help="Set a configuration value (e.g., user.name=Alice)")
     parser.add_argument("--use_dia",          action="store_true",  help="Enable Dia audio model use and output") # Boolean flag
     parser.add_argument("--local_connection", action="store_true", help="Use Weaviate locally via docker-compose.") # Boolean flag
+    parser.add_argument("--stream",           action="store_true", help="Stream responses token by token.") # Boolean flag
     args = parser.parse_args()
 
+    setup_logging()
+    ensure_input_directory()
+    config = load_config()
+
     if args.use_dia:
        dia_model = Dia.from_pretrained("nari-labs/Dia-1.6B", compute_dtype="float16")
        print("Audio mode is ON")
     else:
        print("Audio mode is OFF")
 
-    if args.local_connection == True:
-        client = weaviate.connect_to_local(additional_config=wvc.init.AdditionalConfig(timeout=wvc.init.Timeout(init=60,query=30, insert=120)))
-    else:
-        client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=weaviate_url,                                    
-       auth_credentials=Auth.api_key(weaviate_api_key),              
-    )
+    client = connect_weaviate(local=args.local_connection)
 
     personality_data  = load_personality_file()
     user_interactions = init_interactions()
+    journal           = init_journal()
     documents         = load_json_as_documents(client, directory)
 
     if not documents:
@@ -260,8 +254,9 @@ if __name__ == "__main__":
     char_name     = personality_data['char_name']
 
     # Rudeness detection keywords
-    rude_keywords = ["stupid", "idiot", "shut up", "useless", "dumb"]
+    rude_keywords = personality_data.rude  # compiled from the personality's "rude_keywords" (or the defaults)
     rag_chain     = create_rag_chain(client, user_id, documents)
+    upload_logs_to_weaviate(client)
 
     if args.set:
         if "=" not in args.set:
@@ -284,11 +279,16 @@ if __name__ == "__main__":
         try:
             user_input = input("You: ")
             if user_input.lower() == 'quit':
+                user_interactions.close()
+                journal.close()
                 print("Goodbye!")
                 break
             if user_input.__contains__('image'):
                 generator.generate_image(user_input, f"newbie_sample_{len(user_interactions)}")
                 break
+            if args.stream:
+                render_llm_stream(stream_once(user_input), title=f"{char_name}")
+                continue
             response = generate_response(user_id, user_interactions, user_input, rude_keywords, personality_data, rag_chain)
             #if(args.use_dia):
                 #output = dia_model.generate(f"[S1] {response}", use_torch_compile=True, verbose=True)